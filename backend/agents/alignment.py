@@ -0,0 +1,96 @@
+import os
+from typing import Dict, Any, List
+
+import numpy as np
+
+from tools.llm_tool import LLMTool
+
+# Assets whose combined brief/strategy similarity falls below this are flagged
+ALIGNMENT_THRESHOLD = float(os.getenv("ALIGNMENT_THRESHOLD", "0.55"))
+
+
+def cosine_similarity_matrix(rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    """Pairwise cosine similarity between every row of `rows` and every row of `columns`"""
+    rows = rows / np.clip(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12, None)
+    columns = columns / np.clip(np.linalg.norm(columns, axis=1, keepdims=True), 1e-12, None)
+    return rows @ columns.T
+
+
+def strategy_text(strategy: Dict[str, Any]) -> str:
+    """Flatten a campaign strategy into one text for embedding"""
+    parts = [
+        strategy.get("core_concept", ""),
+        strategy.get("tagline", ""),
+        strategy.get("target_audience", ""),
+        " ".join(strategy.get("key_messages", [])),
+        strategy.get("tone", ""),
+    ]
+    return "\n".join(part for part in parts if part)
+
+
+class AlignmentScorer:
+    """Scores generated assets against the brief and strategy using stored embeddings"""
+    
+    def __init__(self, llm_tool: LLMTool, threshold: float = ALIGNMENT_THRESHOLD):
+        self.llm_tool = llm_tool
+        self.threshold = threshold
+    
+    async def score_manifest(self, manifest: Dict[str, Any]) -> List[str]:
+        """
+        Write alignment scores into each asset's metadata and return the ids
+        of assets below threshold. The brief and strategy are embedded once
+        and all assets are scored with a single matrix product.
+        """
+        assets = [
+            asset for asset in manifest.get("asset_plan", [])
+            if asset.get("metadata", {}).get("embedding_key")
+        ]
+        if not assets:
+            return []
+            
+        vectors = self.llm_tool.embedding_store.get_many(
+            [asset["metadata"]["embedding_key"] for asset in assets]
+        )
+        assets = [asset for asset in assets if asset["metadata"]["embedding_key"] in vectors]
+        if not assets:
+            return []
+            
+        reference = await self.llm_tool.compute_embeddings_async([
+            manifest.get("brief", ""),
+            strategy_text(manifest.get("strategy", {}))
+        ])
+        if not reference.get("success"):
+            print(f"[WARN] Alignment scoring skipped: {reference.get('error')}")
+            return []
+            
+        asset_matrix = np.stack([vectors[asset["metadata"]["embedding_key"]] for asset in assets])
+        reference_matrix = np.asarray(reference["embeddings"], dtype=np.float32)
+        
+        # Column 0 is the brief, column 1 the strategy
+        similarity = cosine_similarity_matrix(asset_matrix, reference_matrix)
+        combined = similarity.mean(axis=1)
+        
+        flagged = []
+        for asset, (brief_score, strategy_score), score in zip(assets, similarity, combined):
+            passed = bool(score >= self.threshold)
+            asset["metadata"]["alignment"] = {
+                "brief": round(float(brief_score), 4),
+                "strategy": round(float(strategy_score), 4),
+                "score": round(float(score), 4),
+                "threshold": self.threshold,
+                "passed": passed
+            }
+            issues = asset.setdefault("safety", {}).setdefault("issues", [])
+            if not passed:
+                flagged.append(asset["id"])
+                if "alignment_below_threshold" not in issues:
+                    issues.append("alignment_below_threshold")
+            elif "alignment_below_threshold" in issues:
+                issues.remove("alignment_below_threshold")
+                
+        manifest.setdefault("metadata", {})["alignment"] = {
+            "threshold": self.threshold,
+            "mean_score": round(float(combined.mean()), 4),
+            "flagged_assets": flagged
+        }
+        return flagged
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from tools.llm_tool import LLMTool
+from services.locks import FileLock
+
+# Cosine similarity at or above which an earlier brief counts as the same brief
+BRIEF_CACHE_THRESHOLD = float(os.getenv("BRIEF_CACHE_THRESHOLD", "0.92"))
+BRIEF_CACHE_ENABLED = os.getenv("BRIEF_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+class VectorIndex:
+    """
+    Append-only nearest-neighbour index: unit float32 vectors in a
+    memory-mapped file, payloads in a SQLite sidecar. Brute-force cosine
+    search is one matrix-vector product, fine to tens of thousands of rows.
+    Appends take a file lock, so several workers can share one index.
+    """
+    
+    def __init__(self, path_prefix: str):
+        self.vectors_path = Path(f"{path_prefix}.f32")
+        self.vectors_path.parent.mkdir(parents=True, exist_ok=True)
+        self.vectors_path.touch(exist_ok=True)
+        self._file_lock = FileLock(f"{path_prefix}.lock")
+        
+        self._conn = sqlite3.connect(f"{path_prefix}.sqlite3", check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                row INTEGER PRIMARY KEY,
+                text TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._mapped: Optional[np.memmap] = None
+    
+    def _dimensions(self) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dimensions'").fetchone()
+        return int(row[0]) if row else None
+    
+    def _rows(self) -> int:
+        # Only rows with a committed entry; a vector appended by a crashed writer is ignored
+        row = self._conn.execute("SELECT MAX(row) FROM entries").fetchone()
+        return row[0] + 1 if row and row[0] is not None else 0
+    
+    def _matrix(self, rows: int, dimensions: int) -> np.ndarray:
+        """Map the vector file, re-mapping only when other writers have appended"""
+        if self._mapped is None or self._mapped.shape[0] != rows:
+            self._mapped = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, dimensions))
+        return self._mapped
+    
+    def add(self, text: str, vector: np.ndarray, payload: Dict[str, Any]):
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        
+        with self._lock, self._file_lock:
+            dimensions = self._dimensions()
+            if dimensions is None:
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('dimensions', ?)", (str(vector.shape[0]),))
+            elif dimensions != vector.shape[0]:
+                print(f"[WARN] Brief cache expects {dimensions}-d vectors, got {vector.shape[0]}; not cached")
+                return
+                
+            # Rows are placed by file size; a partial vector left by a crashed writer gets overwritten
+            row = self.vectors_path.stat().st_size // (vector.shape[0] * 4)
+            with open(self.vectors_path, "r+b") as f:
+                f.seek(row * vector.shape[0] * 4)
+                f.write(vector.tobytes())
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (row, text, payload, created_at) VALUES (?, ?, ?, ?)",
+                (row, text, json.dumps(payload), time.time())
+            )
+            self._conn.commit()
+    
+    def nearest(self, vector: np.ndarray) -> Optional[Tuple[float, str, Dict[str, Any]]]:
+        """(similarity, text, payload) of the closest stored vector, or None if empty"""
+        with self._lock:
+            dimensions = self._dimensions()
+            rows = self._rows()
+            if dimensions is None or rows == 0 or dimensions != len(vector):
+                return None
+                
+            vector = np.asarray(vector, dtype=np.float32)
+            vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+            similarities = self._matrix(rows, dimensions) @ vector
+            best = int(np.argmax(similarities))
+            entry = self._conn.execute("SELECT text, payload FROM entries WHERE row = ?", (best,)).fetchone()
+            
+        if entry is None:
+            return None
+        return float(similarities[best]), entry[0], json.loads(entry[1])
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class BriefCache:
+    """
+    Reuses work done for near-duplicate briefs. Each kind of output
+    ("plan", "strategy") has its own index; a lookup embeds the brief and
+    returns the stored output of the most similar earlier brief above the
+    threshold. Set BRIEF_CACHE_ENABLED=false to turn it off.
+    """
+    
+    def __init__(self, llm_tool: LLMTool, directory: Optional[str] = None, threshold: float = BRIEF_CACHE_THRESHOLD):
+        self.llm_tool = llm_tool
+        self.directory = directory or os.getenv("BRIEF_CACHE_DIR", "./storage/cache/briefs")
+        self.threshold = threshold
+        self.enabled = BRIEF_CACHE_ENABLED
+        self._indexes: Dict[str, VectorIndex] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+    
+    def _index(self, kind: str) -> VectorIndex:
+        with self._lock:
+            if kind not in self._indexes:
+                self._indexes[kind] = VectorIndex(os.path.join(self.directory, kind))
+            return self._indexes[kind]
+    
+    def _count(self, kind: str, counter: str):
+        with self._lock:
+            counters = self._counters.setdefault(kind, {"lookups": 0, "hits": 0})
+            counters[counter] += 1
+    
+    def _embedding(self, result: Dict[str, Any]) -> Optional[np.ndarray]:
+        if not result.get("success") or not result.get("embeddings"):
+            return None
+        return np.asarray(result["embeddings"][0], dtype=np.float32)
+    
+    def _match(self, kind: str, brief: str, vector: Optional[np.ndarray]) -> Optional[Dict[str, Any]]:
+        self._count(kind, "lookups")
+        if vector is None:
+            return None
+        nearest = self._index(kind).nearest(vector)
+        if nearest is None or nearest[0] < self.threshold:
+            return None
+            
+        self._count(kind, "hits")
+        similarity, matched_brief, payload = nearest
+        return {
+            "payload": payload,
+            "seed": {"source": "brief_cache", "similarity": round(similarity, 4), "matched_brief": matched_brief}
+        }
+    
+    def lookup(self, kind: str, brief: str) -> Optional[Dict[str, Any]]:
+        """{"payload", "seed"} for a near-duplicate brief, or None"""
+        if not self.enabled or not brief.strip():
+            return None
+        return self._match(kind, brief, self._embedding(self.llm_tool.compute_embeddings([brief])))
+    
+    async def lookup_async(self, kind: str, brief: str) -> Optional[Dict[str, Any]]:
+        """Non-blocking variant of lookup"""
+        if not self.enabled or not brief.strip():
+            return None
+        return self._match(kind, brief, self._embedding(await self.llm_tool.compute_embeddings_async([brief])))
+    
+    def store(self, kind: str, brief: str, payload: Dict[str, Any]):
+        """Remember the output produced for a brief (its embedding is already in the embedding store)"""
+        if not self.enabled or not brief.strip():
+            return
+        vector = self._embedding(self.llm_tool.compute_embeddings([brief]))
+        if vector is not None:
+            self._index(kind).add(brief, vector, payload)
+    
+    async def store_async(self, kind: str, brief: str, payload: Dict[str, Any]):
+        """Non-blocking variant of store"""
+        if not self.enabled or not brief.strip():
+            return
+        vector = self._embedding(await self.llm_tool.compute_embeddings_async([brief]))
+        if vector is not None:
+            self._index(kind).add(brief, vector, payload)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {kind: dict(values) for kind, values in self._counters.items()}
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            **{
+                kind: {
+                    **values,
+                    "hit_rate": round(values["hits"] / values["lookups"], 4) if values["lookups"] else 0.0
+                }
+                for kind, values in counters.items()
+            }
+        }
@@ -0,0 +1,227 @@
+import os
+import asyncio
+import weakref
+from typing import Dict, Any, List, Callable, Awaitable, Iterable, Optional
+
+# Tools that produce an asset's content. Every other tool call on the same
+# asset (moderation, embedding, storage) consumes that output and waits for it.
+GENERATION_TOOLS = {"llm_text", "image_generate", "web_search"}
+
+# Upstream provider each tool talks to; concurrency is bounded per provider
+TOOL_PROVIDERS = {
+    "llm_text": "gemini",
+    "moderation": "gemini",
+    "compute_embedding": "gemini",
+    "image_generate": "huggingface",
+    "web_search": "tavily",
+    "store_asset": "local",
+}
+
+DEFAULT_PROVIDER_LIMITS = {
+    "gemini": 8,
+    "huggingface": 4,
+    "tavily": 4,
+    "local": 16,
+}
+
+
+def load_provider_limits() -> Dict[str, int]:
+    """
+    Read per-provider concurrency limits from the environment
+    Format: PROVIDER_CONCURRENCY="gemini=8,huggingface=4,tavily=4"
+    """
+    limits = dict(DEFAULT_PROVIDER_LIMITS)
+    for item in os.getenv("PROVIDER_CONCURRENCY", "").split(","):
+        if "=" not in item:
+            continue
+        provider, value = item.split("=", 1)
+        try:
+            limits[provider.strip()] = max(1, int(value))
+        except ValueError:
+            print(f"[WARN] Ignoring invalid concurrency limit: {item}")
+    return limits
+
+
+class ToolNode:
+    """A single tool_call in the execution graph"""
+
+    def __init__(self, node_id: str, asset: Dict[str, Any], tool_call_data: Dict[str, Any]):
+        self.id = node_id
+        self.asset = asset
+        self.tool_call_data = tool_call_data
+        self.tool = tool_call_data.get("tool")
+        self.provider = TOOL_PROVIDERS.get(self.tool, "local")
+        self.depends_on: List[str] = []
+        # Member nodes when this node runs several tool_calls as one batched request
+        self.batch: List["ToolNode"] = []
+
+
+def build_dag(asset_plan: List[Dict[str, Any]], batch_tools: Iterable[str] = ()) -> Dict[str, ToolNode]:
+    """
+    Build the tool_call graph for an asset plan.
+    Assets are independent of each other; within an asset, moderation,
+    embedding and storage calls depend on the asset's generation calls.
+    Tool calls whose tool is in batch_tools are merged across assets into a
+    single node that waits for all of their dependencies.
+    """
+    nodes: Dict[str, ToolNode] = {}
+    batches: Dict[str, List[ToolNode]] = {tool: [] for tool in batch_tools}
+    
+    for asset_index, asset in enumerate(asset_plan):
+        asset_nodes = []
+        for call_index, tool_call_data in enumerate(asset.get("tool_calls", [])):
+            # Tool call ids are LLM-authored and may collide, so key by position
+            node = ToolNode(f"{asset_index}:{call_index}", asset, tool_call_data)
+            asset_nodes.append(node)
+
+        generation_ids = [n.id for n in asset_nodes if n.tool in GENERATION_TOOLS]
+        for node in asset_nodes:
+            if node.tool not in GENERATION_TOOLS:
+                node.depends_on = list(generation_ids)
+            if node.tool in batches:
+                batches[node.tool].append(node)
+            else:
+                nodes[node.id] = node
+    
+    for tool, members in batches.items():
+        if not members:
+            continue
+        batch_node = ToolNode(f"batch:{tool}", None, {"tool": tool})
+        batch_node.batch = members
+        batch_node.depends_on = sorted({d for member in members for d in member.depends_on})
+        nodes[batch_node.id] = batch_node
+    
+    return nodes
+
+
+def node_event(event: str, node: ToolNode, result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Progress event for a node; batch nodes report every member they cover"""
+    members = [member for member in node.batch or [node] if member.asset is not None]
+    payload = {
+        "event": event,
+        "node_id": node.id,
+        "tool": node.tool,
+        "node_ids": [member.id for member in members],
+        "tool_call_ids": [member.tool_call_data.get("id") for member in members],
+        "asset_ids": list(dict.fromkeys(member.asset["id"] for member in members)),
+    }
+    if result is not None:
+        payload["success"] = bool(result.get("success"))
+        payload["error"] = result.get("error")
+    return payload
+
+
+def _skip(tool_call_data: Dict[str, Any], failed: List[str]) -> Dict[str, Any]:
+    """Record a skipped tool_call; there is nothing to moderate or embed if generation failed"""
+    result = {
+        "success": False,
+        "error": f"Skipped: upstream tool call failed ({', '.join(failed)})"
+    }
+    tool_call_data["result"] = result
+    tool_call_data["error"] = {"code": "skipped", "message": result["error"]}
+    return result
+
+
+class DagExecutor:
+    """Runs tool_call nodes as soon as their dependencies finish, bounded per provider"""
+
+    def __init__(
+        self,
+        run_node: Callable[[ToolNode], Awaitable[Dict[str, Any]]],
+        provider_limits: Optional[Dict[str, int]] = None
+    ):
+        self.run_node = run_node
+        self.provider_limits = provider_limits or load_provider_limits()
+        
+        # Shared across runs so limits hold for all campaigns on an event loop.
+        # asyncio semaphores are loop-bound, so keep one set per loop.
+        self._semaphores = weakref.WeakKeyDictionary()
+    
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        loop_semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if provider not in loop_semaphores:
+            loop_semaphores[provider] = asyncio.Semaphore(self.provider_limits.get(provider, 1))
+        return loop_semaphores[provider]
+    
+    def provider_slot(self, provider: str) -> asyncio.Semaphore:
+        """Concurrency slot for provider calls made outside a graph run, e.g. `async with executor.provider_slot("huggingface")`"""
+        return self._semaphore(provider)
+    
+    async def _run_bounded(self, node: ToolNode) -> Dict[str, Any]:
+        async with self._semaphore(node.provider):
+            return await self.run_node(node)
+    
+    async def run(
+        self,
+        nodes: Dict[str, ToolNode],
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Execute the graph and return results keyed by node id.
+        on_event, if given, is called with tool_call_started, tool_call_finished
+        and tool_call_skipped events as nodes progress.
+        """
+        emit = on_event or (lambda event: None)
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = {node_id: set(node.depends_on) for node_id, node in nodes.items()}
+        dependents: Dict[str, List[str]] = {node_id: [] for node_id in nodes}
+        for node_id, node in nodes.items():
+            for dependency in node.depends_on:
+                dependents[dependency].append(node_id)
+        
+        running: Dict[asyncio.Task, str] = {}
+        
+        def complete(node_id):
+            for dependent in dependents[node_id]:
+                pending[dependent].discard(node_id)
+        
+        def schedule_ready():
+            # Loop because skipping a node can unblock its dependents
+            ready = [node_id for node_id, deps in pending.items() if not deps]
+            while ready:
+                for node_id in ready:
+                    del pending[node_id]
+                    node = nodes[node_id]
+                    
+                    if node.batch:
+                        # Only drop the members whose own upstream failed
+                        runnable = []
+                        for member in node.batch:
+                            failed = [d for d in member.depends_on if not results[d].get("success")]
+                            if failed:
+                                emit(node_event("tool_call_skipped", member, _skip(member.tool_call_data, failed)))
+                            else:
+                                runnable.append(member)
+                        node.batch = runnable
+                        failed = [] if runnable else node.depends_on
+                    else:
+                        failed = [d for d in node.depends_on if not results[d].get("success")]
+                    
+                    if failed:
+                        results[node_id] = _skip(node.tool_call_data, failed)
+                        emit(node_event("tool_call_skipped", node, results[node_id]))
+                        complete(node_id)
+                    else:
+                        emit(node_event("tool_call_started", node))
+                        running[asyncio.create_task(self._run_bounded(node))] = node_id
+                ready = [node_id for node_id, deps in pending.items() if not deps]
+        
+        try:
+            schedule_ready()
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node_id = running.pop(task)
+                    try:
+                        results[node_id] = task.result()
+                    except Exception as e:
+                        results[node_id] = {"success": False, "error": str(e)}
+                    emit(node_event("tool_call_finished", nodes[node_id], results[node_id]))
+                    complete(node_id)
+                schedule_ready()
+        finally:
+            # Don't leave provider calls running if the caller was cancelled
+            for task in running:
+                task.cancel()
+        
+        return results
@@ -1,10 +1,13 @@
 import google.generativeai as genai
 import os
 import json
-from typing import Dict, Any
-from datetime import datetime
+from typing import Dict, Any, List, Callable, Optional
+from datetime import datetime, date
 import uuid
 import random
+import asyncio
+import base64
+import time
 
 from models.schema import (
     CampaignManifestWrapper, CampaignManifest, ToolCall, Asset, AssetSafety
@@ -13,6 +16,56 @@ from tools.llm_tool import LLMTool
 from tools.image_tool import ImageTool
 from tools.search_tool import SearchTool
 from tools.moderation_tool import ModerationTool
+from agents.executor import DagExecutor, ToolNode, build_dag
+from agents.alignment import AlignmentScorer
+from agents.brief_cache import BriefCache
+from agents.resilience import ProviderGuard, estimate_tokens
+from tools.single_flight import SingleFlight, coalesce_key
+from services.asset_store import AssetStore
+from services.derivatives import DerivativePipeline
+
+# Regenerate assets that score below the alignment threshold (once) instead of only flagging them
+AUTO_REGENERATE_MISALIGNED = os.getenv("ALIGNMENT_AUTO_REGENERATE", "false").lower() in ("1", "true", "yes")
+
+# The model only writes a compact plan, so the output budget can stay small
+MANIFEST_GENERATION_CONFIG = {
+    "temperature": 0.3,
+    "max_output_tokens": 3072,
+}
+
+# Tool calls merged across assets into one batched provider request
+BATCHED_TOOLS = {"compute_embedding"}
+
+# Generation settings per asset type, used to expand the compact plan
+ASSET_TEMPLATES = {
+    "caption": {"tool": "llm_text", "temperature": 0.6, "max_tokens": 150},
+    "video_script": {"tool": "llm_text", "temperature": 0.6, "max_tokens": 400},
+    "blog": {"tool": "llm_text", "temperature": 0.6, "max_tokens": 1000},
+    "flyer": {"tool": "llm_text", "temperature": 0.6, "max_tokens": 400},
+    "text": {"tool": "llm_text", "temperature": 0.6, "max_tokens": 500},
+    "image": {"tool": "image_generate"},
+}
+
+def redate_calendar(calendar: List[Dict[str, Any]], start: date) -> List[Dict[str, Any]]:
+    """Shift a posting calendar so its earliest date falls on start, keeping the spacing"""
+    def parse(entry):
+        try:
+            return date.fromisoformat(str(entry.get("date", ""))[:10])
+        except ValueError:
+            return None
+    
+    dates = [parsed for parsed in map(parse, calendar) if parsed]
+    if not dates:
+        return calendar
+    shift = start - min(dates)
+    redated = []
+    for entry in calendar:
+        parsed = parse(entry)
+        if parsed:
+            # Keep any time-of-day suffix the plan gave
+            entry = {**entry, "date": (parsed + shift).isoformat() + str(entry["date"])[10:]}
+        redated.append(entry)
+    return redated
 
 class CampaignOrchestrator:
     def __init__(self):
@@ -30,254 +83,154 @@ class CampaignOrchestrator:
         self.moderation_tool = ModerationTool()
         
         self.assets_dir = os.getenv("ASSETS_DIR", "./storage/assets")
+        self.asset_store = AssetStore(self.assets_dir)
+        self.derivatives = DerivativePipeline(self.asset_store)
+        
+        # Runs independent tool calls concurrently under per-provider limits
+        self.executor = DagExecutor(self._run_node)
+        # Shared rate limits, circuit breakers and backoff for every provider call
+        self.guard = ProviderGuard()
+        self.search_tool.guard = self.guard
+        # Identical concurrent text/search/embedding calls share one upstream request
+        self.single_flight = SingleFlight()
+        self.alignment = AlignmentScorer(self.llm_tool)
+        # Plans (and strategies) of near-duplicate briefs are reused instead of regenerated
+        self.brief_cache = BriefCache(self.llm_tool)
         
-    def generate_campaign_manifest(self, brief: str) -> Dict[str, Any]:
-        """Generate initial campaign manifest from brief"""
+    def _build_manifest_prompt(self, brief: str) -> str:
+        """Build the compact-plan prompt for a brief"""
         
         system_prompt = """You are an autonomous Campaign-Orchestrator LLM running on Gemini-2.0-flash-exp.
 
 Your job:
-Take a short marketing brief and produce a single JSON object whose top-level key is "campaign_manifest". The JSON must exactly follow the schema and rules defined below. Return **only valid JSON** (no explanations, no extra text).
-
-Hard rules (must be followed exactly):
-1. Output JSON only. Top-level key: "campaign_manifest". Any non-JSON output = error.
-2. For each asset that needs generation, include a "tool_calls" array. Every tool_call must include:
-   - "tool": one of ["llm_text","image_generate","web_search","moderation","store_asset","compute_embedding"]
-   - "id": unique string id
-   - "input": tool-specific inputs
-   - "expected_output_schema": object describing expected output keys
-   - "retry_policy": { "max_attempts": 3, "backoff": "exponential" }
-   - "safety_checks": array of checks (e.g., ["moderation_text","moderation_image","alignment_threshold"])
-   - optional "requires_approval": true for any outreach/scheduling drafts
-3. Include the full generator prompt text verbatim in each tool_call.input so the orchestrator can forward it unchanged.
-4. LLM calls (llm_text) must include: model="gemini-2.0-flash-exp", temperature (0.2 for strategic outputs, 0.6 for creative outputs), max_tokens (appropriate value).
-5. Image calls (image_generate) must include: provider="huggingface", prompt, size="1024x1024", seed (int|null), n (variants, default 1).
-6. Web search calls (web_search) must include: q, location (if applicable), max_results.
-7. For every generated asset include a compute_embedding tool_call for alignment embedding.
-8. Include moderation tool_calls for every generated text and image.
-9. Each asset object must include versioning fields: id, version (start at 1), seed, prompt, model/provider, url (null until stored), safety: { moderation_passed: true, issues: [] }.
-10. Keep text outputs compact (captions ≤140 chars; short scripts ≤300 tokens; blog/description ≤800 tokens).
-11. Do NOT include any publish/send tool calls. All outreach or scheduling must be drafts with requires_approval=true.
-12. Use Asia/Kolkata timezone when computing dates if no timezone given.
-
-Campaign Strategy Structure (must be an object under "strategy" key):
-- core_concept: Main campaign theme
-- tagline: Catchy campaign slogan
-- target_audience: Detailed audience description
-- key_messages: Array of 3-5 key messages
-- tone: Brand voice (e.g., "energetic", "professional", "playful")
-- channels: Array of platforms (e.g., ["instagram", "facebook", "twitter"])
-
-Posting Calendar Structure (must be an ARRAY under "posting_calendar" key, NOT an object):
-[
-  {
-    "date": "2025-06-05",
-    "channel": "instagram",
-    "asset_ids": ["caption_1", "image_1"],
-    "caption": "Optional caption override",
-    "requires_approval": true
-  }
-]
-
-Asset Types to Generate:
-- 3-5 social media captions (type: "caption")
-- 2-3 hero images/visuals (type: "image")
-- 1 Instagram Reel script (type: "video_script")
-- 1 blog post/description (type: "blog")
-- 1 promotional flyer design (type: "flyer")
-
-CRITICAL: Each asset in asset_plan MUST use these exact field names:
-- "id": unique string identifier (required)
-- "type": one of ["caption", "image", "video_script", "blog", "flyer"] (required)
-- "prompt": the generation prompt used (required)
-- "version": integer starting at 1
-- "seed": integer or null
-- "model": string or null
-- "provider": string or null
-- "url": null (will be filled after generation)
-- "content": null (will be filled after generation)
-- "safety": { "moderation_passed": true, "issues": [] }
-- "tool_calls": array of tool call objects
-- "metadata": object
-
-WRONG field names to AVOID: "asset_type", "description", "asset_id"
-Use "type" NOT "asset_type"
-Use "id" NOT "asset_id"
-Use "prompt" NOT "description"
+Take a short marketing brief and produce a compact campaign plan as a single JSON object. Return **only valid JSON** (no explanations, no extra text).
+Do NOT write tool calls, retry policies, output schemas or moderation steps - the orchestrator builds those from your plan.
 
-For each asset, create appropriate tool_calls in sequence:
-1. Generation tool (llm_text or image_generate)
-2. Moderation tool
-3. Embedding tool (for alignment checking)
-
-Example complete asset structure:
+Output structure:
 {
-  "id": "caption_1",
-  "type": "caption",
-  "prompt": "Write an Instagram caption for...",
-  "version": 1,
-  "seed": null,
-  "model": null,
-  "provider": null,
-  "url": null,
-  "content": null,
-  "safety": {
-    "moderation_passed": true,
-    "issues": []
+  "strategy": {
+    "core_concept": "Main campaign theme",
+    "tagline": "Catchy campaign slogan",
+    "target_audience": "Detailed audience description",
+    "key_messages": ["3-5 key messages"],
+    "tone": "Brand voice (e.g. energetic, professional, playful)",
+    "channels": ["instagram", "facebook", "twitter"]
   },
-  "tool_calls": [
-    {
-      "tool": "llm_text",
-      "id": "caption_1_gen",
-      "input": {
-        "prompt": "Write an Instagram caption for...",
-        "model": "gemini-2.0-flash-exp",
-        "temperature": 0.6,
-        "max_tokens": 150
-      },
-      "expected_output_schema": {
-        "text": "string"
-      },
-      "retry_policy": {
-        "max_attempts": 3,
-        "backoff": "exponential"
-      },
-      "safety_checks": ["moderation_text"]
-    }
+  "assets": [
+    {"id": "caption_1", "type": "caption", "prompt": "Write an Instagram caption for..."},
+    {"id": "image_1", "type": "image", "prompt": "Hero product shot of..."}
+  ],
+  "posting_calendar": [
+    {"date": "2025-06-05", "channel": "instagram", "asset_ids": ["caption_1", "image_1"], "caption": null}
   ],
-  "metadata": {}
+  "influencers": [
+    {"name": "...", "handle": "@...", "platform": "instagram", "followers": "50K", "outreach_draft": "..."}
+  ]
 }
 
-Example tool_call structure:
-{
-  "tool": "llm_text",
-  "id": "caption_1_gen",
-  "input": {
-    "prompt": "Write an Instagram caption for...",
-    "model": "gemini-2.0-flash-exp",
-    "temperature": 0.6,
-    "max_tokens": 150
-  },
-  "expected_output_schema": {
-    "text": "string"
-  },
-  "retry_policy": {
-    "max_attempts": 3,
-    "backoff": "exponential"
-  },
-  "safety_checks": ["moderation_text"]
-}"""
+Rules:
+1. Asset types to plan:
+   - 3-5 social media captions (type: "caption", ≤140 chars)
+   - 2-3 hero images/visuals (type: "image", prompt is a detailed image-generation prompt)
+   - 1 Instagram Reel script (type: "video_script", ≤300 tokens)
+   - 1 blog post/description (type: "blog", ≤800 tokens)
+   - 1 promotional flyer design (type: "flyer")
+2. Each asset "prompt" is the complete generator prompt for that asset; make it self-contained.
+3. Asset ids must be unique; posting_calendar asset_ids must reference them.
+4. posting_calendar must be an ARRAY. Use Asia/Kolkata timezone when computing dates.
+5. Outreach drafts are drafts only; never plan publishing or sending."""
 
         task_prompt = f"""Brief: {brief}
 
-Generate a complete campaign manifest following all rules. Include strategy, asset_plan with tool_calls, posting_calendar, and influencer search plan."""
+Generate the compact campaign plan."""
 
+        return f"{system_prompt}\n\n{task_prompt}"
+    
+    def generate_campaign_manifest(self, brief: str, reuse_similar: bool = False) -> Dict[str, Any]:
+        """
+        Generate initial campaign manifest from brief. With reuse_similar, a
+        near-duplicate of an earlier brief reuses that brief's plan, re-dated
+        to start today and marked as a draft in metadata.seed.
+        """
+        if reuse_similar:
+            seeded = self._seeded_manifest(self.brief_cache.lookup("plan", brief), brief)
+            if seeded:
+                return seeded
+        
         try:
             response = self.model.generate_content(
-                f"{system_prompt}\n\n{task_prompt}",
-                generation_config={
-                    "temperature": 0.3,
-                    "max_output_tokens": 8192,
-                }
+                self._build_manifest_prompt(brief),
+                generation_config=MANIFEST_GENERATION_CONFIG
             )
-            
-            # Parse JSON response
-            json_text = response.text.strip()
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        result = self._parse_manifest_response(response.text, brief)
+        if result.get("success"):
+            self.brief_cache.store("plan", brief, result["plan"])
+        return result
+    
+    async def generate_campaign_manifest_async(self, brief: str, reuse_similar: bool = False) -> Dict[str, Any]:
+        """Non-blocking variant of generate_campaign_manifest"""
+        if reuse_similar:
+            seeded = self._seeded_manifest(await self.brief_cache.lookup_async("plan", brief), brief)
+            if seeded:
+                return seeded
+        
+        try:
+            response = await self.model.generate_content_async(
+                self._build_manifest_prompt(brief),
+                generation_config=MANIFEST_GENERATION_CONFIG
+            )
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        result = self._parse_manifest_response(response.text, brief)
+        if result.get("success"):
+            await self.brief_cache.store_async("plan", brief, result["plan"])
+        return result
+    
+    def _seeded_manifest(self, cached: Optional[Dict[str, Any]], brief: str) -> Optional[Dict[str, Any]]:
+        """Manifest for a brief built from a similar brief's cached plan, or None"""
+        if not cached:
+            return None
+        result = self._manifest_from_plan(cached["payload"], brief)
+        if not result.get("success"):
+            return None
+        print(f"♻️ Reusing plan of a similar brief (similarity {cached['seed']['similarity']})")
+        manifest = result["manifest"]
+        # The cached dates belong to the earlier campaign
+        manifest["posting_calendar"] = redate_calendar(manifest["posting_calendar"], date.today())
+        # Flagged so the client asks for a review instead of treating it as a fresh plan
+        manifest["metadata"]["seed"] = {**cached["seed"], "draft": True}
+        return result
+    
+    def _parse_manifest_response(self, response_text: str, brief: str) -> Dict[str, Any]:
+        """Parse Gemini's compact plan and expand it into a full manifest"""
+        try:
             # Remove markdown code blocks if present
-            json_text = json_text.replace('```json', '').replace('```', '').strip()
-            
-            manifest_data = json.loads(json_text)
-            
-            # Normalize the manifest structure (handle different field names from Gemini)
-            if "campaign_manifest" in manifest_data:
-                campaign = manifest_data["campaign_manifest"]
-                
-                # Add required fields if missing
-                if "campaign_id" not in campaign:
-                    campaign["campaign_id"] = str(uuid.uuid4())
-                if "brief" not in campaign:
-                    campaign["brief"] = brief
-                if "created_at" not in campaign:
-                    campaign["created_at"] = datetime.now().isoformat()
-                if "timezone" not in campaign:
-                    campaign["timezone"] = "Asia/Kolkata"
-                if "status" not in campaign:
-                    campaign["status"] = "draft"
-                
-                # Normalize field names
-                if "campaign_strategy" in campaign and "strategy" not in campaign:
-                    campaign["strategy"] = campaign.pop("campaign_strategy")
-                if "assets" in campaign and "asset_plan" not in campaign:
-                    campaign["asset_plan"] = campaign.pop("assets")
-                if "calendar" in campaign and "posting_calendar" not in campaign:
-                    campaign["posting_calendar"] = campaign.pop("calendar")
-                
-                # Ensure required lists exist
-                if "asset_plan" not in campaign:
-                    campaign["asset_plan"] = []
-                if "posting_calendar" not in campaign:
-                    campaign["posting_calendar"] = []
-                if "influencers" not in campaign:
-                    campaign["influencers"] = []
-                if "metadata" not in campaign:
-                    campaign["metadata"] = {}
-                
-                # Normalize asset_plan items
-                print(f"[DEBUG] Normalizing {len(campaign.get('asset_plan', []))} assets...")
-                for i, asset in enumerate(campaign.get("asset_plan", [])):
-                    print(f"[DEBUG] Asset {i} before normalization: keys = {list(asset.keys())}")
-                    
-                    # Normalize asset_type -> type
-                    if "asset_type" in asset and "type" not in asset:
-                        asset["type"] = asset.pop("asset_type")
-                        print(f"[DEBUG] Asset {i}: Converted asset_type -> type = {asset['type']}")
-                    
-                    # Add required fields if missing
-                    if "id" not in asset:
-                        asset["id"] = f"asset_{i}_{str(uuid.uuid4())[:8]}"
-                        print(f"[DEBUG] Asset {i}: Generated id = {asset['id']}")
-                    
-                    if "prompt" not in asset:
-                        # Extract prompt from first tool_call if available
-                        tool_calls = asset.get("tool_calls", [])
-                        if tool_calls and len(tool_calls) > 0:
-                            first_call_input = tool_calls[0].get("input", {})
-                            asset["prompt"] = first_call_input.get("prompt", "")
-                            print(f"[DEBUG] Asset {i}: Extracted prompt from tool_calls")
-                        else:
-                            asset["prompt"] = ""
-                            print(f"[DEBUG] Asset {i}: Set empty prompt")
-                    
-                    # Normalize description -> prompt if needed
-                    if "description" in asset and not asset.get("prompt"):
-                        asset["prompt"] = asset.pop("description")
-                        print(f"[DEBUG] Asset {i}: Converted description -> prompt")
-                    
-                    # Ensure safety dict exists
-                    if "safety" not in asset:
-                        asset["safety"] = {"moderation_passed": True, "issues": []}
-                    
-                    print(f"[DEBUG] Asset {i} after normalization: keys = {list(asset.keys())}")
-                
-                # Normalize posting_calendar - ensure it's a list
-                if isinstance(campaign.get("posting_calendar"), dict):
-                    # Convert dict to list if needed
-                    calendar_dict = campaign["posting_calendar"]
-                    campaign["posting_calendar"] = []
-                    # Try to extract items from the dict
-                    if "items" in calendar_dict:
-                        campaign["posting_calendar"] = calendar_dict["items"]
-                    elif "posts" in calendar_dict:
-                        campaign["posting_calendar"] = calendar_dict["posts"]
-                
-                manifest_data["campaign_manifest"] = campaign
+            json_text = response_text.strip().replace('```json', '').replace('```', '').strip()
+            plan = json.loads(json_text)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        
+        return self._manifest_from_plan(plan, brief)
+    
+    def _manifest_from_plan(self, plan: Dict[str, Any], brief: str) -> Dict[str, Any]:
+        """Expand and validate a compact plan; the plan is returned too so it can be cached"""
+        try:
+            manifest = self.expand_plan(plan, brief)
             
             # Validate and create manifest
-            manifest_wrapper = CampaignManifestWrapper(**manifest_data)
+            manifest_wrapper = CampaignManifestWrapper(campaign_manifest=manifest)
             
             return {
                 "success": True,
-                "manifest": manifest_wrapper.campaign_manifest.model_dump()
+                "manifest": manifest_wrapper.campaign_manifest.model_dump(),
+                "plan": plan
             }
             
         except Exception as e:
@@ -286,106 +239,460 @@ Generate a complete campaign manifest following all rules. Include strategy, ass
                 "error": str(e)
             }
     
+    def expand_plan(self, plan: Dict[str, Any], brief: str) -> Dict[str, Any]:
+        """Expand a compact plan into a manifest with templated tool_calls"""
+        asset_plan = []
+        seen_ids = set()
+        
+        for i, planned in enumerate(plan.get("assets", [])):
+            asset_type = planned.get("type")
+            if asset_type not in ASSET_TEMPLATES:
+                asset_type = "text"
+            
+            asset_id = planned.get("id")
+            if not asset_id or asset_id in seen_ids:
+                asset_id = f"{asset_type}_{i + 1}_{str(uuid.uuid4())[:8]}"
+            seen_ids.add(asset_id)
+            
+            prompt = planned.get("prompt", "")
+            asset_plan.append({
+                "id": asset_id,
+                "type": asset_type,
+                "prompt": prompt,
+                "version": 1,
+                "seed": None,
+                "model": None,
+                "provider": None,
+                "url": None,
+                "content": None,
+                "safety": {"moderation_passed": True, "issues": []},
+                "tool_calls": self._build_tool_calls(asset_id, asset_type, prompt),
+                "metadata": {}
+            })
+        
+        posting_calendar = plan.get("posting_calendar") or []
+        if not isinstance(posting_calendar, list):
+            posting_calendar = []
+        
+        return {
+            "campaign_id": str(uuid.uuid4()),
+            "brief": brief,
+            "created_at": datetime.now().isoformat(),
+            "timezone": "Asia/Kolkata",
+            "strategy": plan.get("strategy", {}),
+            "asset_plan": asset_plan,
+            "posting_calendar": posting_calendar,
+            "influencers": plan.get("influencers") or [],
+            "status": "draft",
+            "metadata": {}
+        }
+    
+    def _build_tool_calls(self, asset_id: str, asset_type: str, prompt: str) -> List[Dict[str, Any]]:
+        """Build generation -> moderation -> embedding tool_calls for one asset"""
+        template = ASSET_TEMPLATES[asset_type]
+        
+        if template["tool"] == "image_generate":
+            generation = {
+                "tool": "image_generate",
+                "id": f"{asset_id}_gen",
+                "input": {
+                    "provider": "huggingface",
+                    "prompt": prompt,
+                    "size": "1024x1024",
+                    "seed": None,
+                    "n": 1
+                },
+                "expected_output_schema": {"image_data": "string", "format": "string"},
+                "safety_checks": ["moderation_image"]
+            }
+            moderation_input = {"type": "image"}
+        else:
+            generation = {
+                "tool": "llm_text",
+                "id": f"{asset_id}_gen",
+                "input": {
+                    "prompt": prompt,
+                    "model": "gemini-2.0-flash-exp",
+                    "temperature": template["temperature"],
+                    "max_tokens": template["max_tokens"]
+                },
+                "expected_output_schema": {"text": "string"},
+                "safety_checks": ["moderation_text"]
+            }
+            moderation_input = {"type": "text"}
+        
+        return [
+            generation,
+            {
+                "tool": "moderation",
+                "id": f"{asset_id}_mod",
+                "input": moderation_input,
+                "expected_output_schema": {"moderation_passed": "boolean", "issues": "array"},
+                "safety_checks": []
+            },
+            {
+                "tool": "compute_embedding",
+                "id": f"{asset_id}_embed",
+                "input": {},
+                "expected_output_schema": {"embedding": "array", "dimensions": "integer"},
+                "safety_checks": ["alignment_threshold"]
+            }
+        ]
+    
+    def _dispatch_tool_call(self, tool_call: ToolCall) -> Dict[str, Any]:
+        """Route a tool call to its tool"""
+        if tool_call.tool == "llm_text":
+            return self.llm_tool.generate_text(tool_call.input)
+        elif tool_call.tool == "image_generate":
+            return self.image_tool.generate_image(tool_call.input)
+        elif tool_call.tool == "web_search":
+            return self.search_tool.web_search(tool_call.input)
+        elif tool_call.tool == "moderation":
+            content_type = tool_call.input.get("type", "text")
+            if content_type == "text":
+                return self.moderation_tool.moderate_text(tool_call.input)
+            return self.moderation_tool.moderate_image(tool_call.input)
+        elif tool_call.tool == "compute_embedding" and "texts" in tool_call.input:
+            return self.llm_tool.compute_embeddings(tool_call.input["texts"])
+        elif tool_call.tool == "compute_embedding":
+            return self.llm_tool.compute_embedding(tool_call.input)
+        return {"success": False, "error": f"Unknown tool: {tool_call.tool}"}
+    
+    def _coalesce_key(self, tool_call: ToolCall) -> Optional[str]:
+        """Single-flight key, or None for creative LLM calls the response cache would skip too"""
+        if tool_call.tool == "llm_text" and self.llm_tool._cache_key(tool_call.input) is None:
+            return None
+        return coalesce_key(tool_call.tool, tool_call.input)
+    
     def execute_tool_call(self, tool_call: ToolCall) -> Dict[str, Any]:
-        """Execute a single tool call with retry logic"""
-        max_attempts = tool_call.retry_policy.max_attempts
+        """Execute a single tool call; identical calls already in flight share its result"""
+        key = self._coalesce_key(tool_call)
+        if key is None:
+            return self._execute_guarded(tool_call)
+        return self.single_flight.run(key, lambda: self._execute_guarded(tool_call))
+    
+    def _execute_guarded(self, tool_call: ToolCall) -> Dict[str, Any]:
+        """Run a tool call with rate limiting, circuit breaking and jittered retries"""
+        provider = self.guard.provider_for(tool_call.tool)
+        tokens = estimate_tokens(tool_call.tool, tool_call.input)
+        max_attempts = self.guard.attempts_for(tool_call.tool, tool_call.retry_policy.max_attempts)
         
         for attempt in range(max_attempts):
+            rejected = self.guard.reject(provider)
+            if rejected:
+                return rejected
+            
+            time.sleep(self.guard.acquire(provider, tokens))
             try:
-                if tool_call.tool == "llm_text":
-                    result = self.llm_tool.generate_text(tool_call.input)
-                elif tool_call.tool == "image_generate":
-                    result = self.image_tool.generate_image(tool_call.input)
-                elif tool_call.tool == "web_search":
-                    result = self.search_tool.web_search(tool_call.input)
-                elif tool_call.tool == "moderation":
-                    content_type = tool_call.input.get("type", "text")
-                    if content_type == "text":
-                        result = self.moderation_tool.moderate_text(tool_call.input)
-                    else:
-                        result = self.moderation_tool.moderate_image(tool_call.input)
-                elif tool_call.tool == "compute_embedding":
-                    result = self.llm_tool.compute_embedding(tool_call.input)
-                else:
-                    result = {"success": False, "error": f"Unknown tool: {tool_call.tool}"}
-                
-                if result.get("success"):
-                    return result
-                
-                # If failed and not last attempt, wait before retry
-                if attempt < max_attempts - 1:
-                    import time
-                    wait_time = 2 ** attempt if tool_call.retry_policy.backoff == "exponential" else 2
-                    time.sleep(wait_time)
-                    
+                result = self._dispatch_tool_call(tool_call)
             except Exception as e:
-                if attempt == max_attempts - 1:
-                    return {"success": False, "error": str(e)}
+                result = {"success": False, "error": str(e)}
+            
+            if not self.guard.record(provider, tokens, result) or attempt == max_attempts - 1:
+                return result
+            
+            self.guard.note_retry(provider)
+            time.sleep(self.guard.backoff(tool_call.tool, attempt, tool_call.retry_policy.backoff))
+        
+        return result
+    
+    async def _dispatch_tool_call_async(self, tool_call: ToolCall) -> Dict[str, Any]:
+        """Route a tool call to the async variant of its tool"""
+        if tool_call.tool == "llm_text":
+            return await self.llm_tool.generate_text_async(tool_call.input)
+        elif tool_call.tool == "image_generate":
+            return await self.image_tool.generate_image_async(tool_call.input)
+        elif tool_call.tool == "web_search":
+            return await self.search_tool.web_search_async(tool_call.input)
+        elif tool_call.tool == "moderation":
+            content_type = tool_call.input.get("type", "text")
+            if content_type == "text":
+                return await self.moderation_tool.moderate_text_async(tool_call.input)
+            return await self.moderation_tool.moderate_image_async(tool_call.input)
+        elif tool_call.tool == "compute_embedding" and "texts" in tool_call.input:
+            return await self.llm_tool.compute_embeddings_async(tool_call.input["texts"])
+        elif tool_call.tool == "compute_embedding":
+            return await self.llm_tool.compute_embedding_async(tool_call.input)
+        return {"success": False, "error": f"Unknown tool: {tool_call.tool}"}
+    
+    async def call_tool_async(self, tool: str, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a one-off tool call (workflow-builder agents) with the same coalescing and provider guard"""
+        return await self.execute_tool_call_async(ToolCall(
+            tool=tool,
+            id=f"adhoc_{tool}",
+            input=tool_input,
+            expected_output_schema={}
+        ))
+    
+    async def execute_tool_call_async(self, tool_call: ToolCall) -> Dict[str, Any]:
+        """Non-blocking variant of execute_tool_call"""
+        key = self._coalesce_key(tool_call)
+        if key is None:
+            return await self._execute_guarded_async(tool_call)
+        return await self.single_flight.run_async(key, lambda: self._execute_guarded_async(tool_call))
+    
+    async def _execute_guarded_async(self, tool_call: ToolCall) -> Dict[str, Any]:
+        """Non-blocking variant of _execute_guarded"""
+        provider = self.guard.provider_for(tool_call.tool)
+        tokens = estimate_tokens(tool_call.tool, tool_call.input)
+        max_attempts = self.guard.attempts_for(tool_call.tool, tool_call.retry_policy.max_attempts)
+        
+        for attempt in range(max_attempts):
+            # Fail fast while the provider is known to be down
+            rejected = self.guard.reject(provider)
+            if rejected:
+                return rejected
+            
+            await asyncio.sleep(self.guard.acquire(provider, tokens))
+            try:
+                result = await self._dispatch_tool_call_async(tool_call)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            
+            # Fatal errors (bad request, missing key) are returned without retrying
+            if not self.guard.record(provider, tokens, result) or attempt == max_attempts - 1:
+                return result
+            
+            self.guard.note_retry(provider)
+            await asyncio.sleep(self.guard.backoff(tool_call.tool, attempt, tool_call.retry_policy.backoff))
+        
+        return result
+    
+    def _bind_upstream_output(self, asset: Dict[str, Any], tool_call_data: Dict[str, Any]):
+        """Point moderation/embedding inputs at the asset's generated output"""
+        tool_input = tool_call_data.setdefault("input", {})
+        
+        if tool_call_data["tool"] == "moderation":
+            if asset.get("type") == "image" and asset.get("url"):
+                tool_input["type"] = "image"
+                tool_input["image_url"] = asset["url"]
+            elif asset.get("content"):
+                tool_input["type"] = "text"
+                tool_input["text"] = asset["content"]
+        
+        elif tool_call_data["tool"] == "compute_embedding":
+            # Images are embedded by their prompt since we have no vision embedding
+            tool_input["text"] = asset.get("content") or asset.get("prompt", "")
+    
+    def _apply_tool_result(self, asset: Dict[str, Any], tool_call_data: Dict[str, Any], result: Dict[str, Any]):
+        """Store a tool call result and update the asset based on tool type"""
+        tool = tool_call_data["tool"]
+        
+        if tool == "image_generate" and result.get("success"):
+            # The manifest keeps only a reference into the content-addressed store;
+            # identical images (e.g. a reseeded regeneration that repeats) share one file
+            if result.get("blob"):
+                result = {**result, "blob": self.asset_store.ingest(result["blob"])}
+            elif result.get("image_data"):
+                inline = result
+                result = {key: value for key, value in inline.items() if key != "image_data"}
+                result["blob"] = self.asset_store.put_bytes(
+                    base64.b64decode(inline["image_data"]),
+                    inline.get("format", "png")
+                )
+            if result.get("blob"):
+                # Thumbnails and WebP/AVIF sizes render in the background
+                self.derivatives.schedule(result["blob"])
+        
+        tool_call_data["result"] = result
+        
+        if not result.get("success"):
+            tool_call_data["error"] = {
+                "code": "execution_failed",
+                "message": result.get("error", "Unknown error")
+            }
+            return
+        
+        tool_call_data["error"] = None
+        
+        if tool == "llm_text":
+            asset["content"] = result.get("text")
+            asset["model"] = result.get("model")
+        
+        elif tool == "image_generate" and result.get("blob"):
+            asset["url"] = result["blob"]["url"]
+            asset.update(self.derivatives.describe(result["blob"]))
+            asset["provider"] = result.get("provider")
+            asset["model"] = result.get("model")
+        
+        elif tool == "moderation":
+            asset["safety"]["moderation_passed"] = result.get("moderation_passed", True)
+            asset["safety"]["issues"] = result.get("issues", [])
+        
+        elif tool == "compute_embedding" and result.get("embedding_key"):
+            # The vector itself lives in the embedding store
+            asset.setdefault("metadata", {})["embedding_key"] = result["embedding_key"]
+    
+    async def _run_embedding_batch(self, members: List[ToolNode]) -> Dict[str, Any]:
+        """Embed the outputs of many assets with a single batched request"""
+        for member in members:
+            self._bind_upstream_output(member.asset, member.tool_call_data)
+        
+        tool_call = ToolCall(
+            tool="compute_embedding",
+            id="embedding_batch",
+            input={"texts": [member.tool_call_data["input"].get("text", "") for member in members]},
+            expected_output_schema={"keys": "array", "dimensions": "integer"}
+        )
+        result = await self.execute_tool_call_async(tool_call)
+        
+        for i, member in enumerate(members):
+            if result.get("success"):
+                # Keep manifests small: store a reference, not 768 floats per asset
+                member_result = {
+                    "success": True,
+                    "embedding_key": result["keys"][i],
+                    "dimensions": result["dimensions"]
+                }
+            else:
+                member_result = {"success": False, "error": result.get("error", "Unknown error")}
+            self._apply_tool_result(member.asset, member.tool_call_data, member_result)
+        
+        return {
+            "success": result.get("success", False),
+            "count": len(members),
+            "cached": result.get("cached", 0),
+            "error": result.get("error")
+        }
+    
+    async def _run_node(self, node: ToolNode) -> Dict[str, Any]:
+        """Execute one graph node"""
+        if node.batch:
+            return await self._run_embedding_batch(node.batch)
+        
+        self._bind_upstream_output(node.asset, node.tool_call_data)
+        tool_call = ToolCall(**node.tool_call_data)
+        
+        result = await self.execute_tool_call_async(tool_call)
         
-        return {"success": False, "error": "Max retries exceeded"}
+        self._apply_tool_result(node.asset, node.tool_call_data, result)
+        return result
+    
+    def _run_blocking(self, coro):
+        """asyncio.run a coroutine, closing the HTTP client bound to its short-lived loop"""
+        async def run():
+            try:
+                return await coro
+            finally:
+                await self.image_tool.aclose()
+        return asyncio.run(run())
     
     def execute_asset_generation(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute all tool calls for all assets in the manifest"""
+        """Blocking wrapper around execute_asset_generation_async"""
+        return self._run_blocking(self.execute_asset_generation_async(manifest))
+    
+    async def execute_asset_generation_async(
+        self,
+        manifest: Dict[str, Any],
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute all tool calls for all assets in the manifest.
+        on_event receives the executor's tool_call events plus an asset_ready
+        event once the last tool_call of each asset has finished.
+        """
         
         asset_plan = manifest.get("asset_plan", [])
         
+        # Validate every asset before spending any provider calls
         for asset in asset_plan:
-            asset_obj = Asset(**asset)
-            
-            for tool_call_data in asset.get("tool_calls", []):
-                tool_call = ToolCall(**tool_call_data)
-                
-                # Execute tool call
-                result = self.execute_tool_call(tool_call)
-                
-                # Store result
-                tool_call_data["result"] = result
-                
-                if not result.get("success"):
-                    tool_call_data["error"] = {
-                        "code": "execution_failed",
-                        "message": result.get("error", "Unknown error")
-                    }
-                
-                # Update asset based on tool type
-                if tool_call.tool == "llm_text" and result.get("success"):
-                    asset["content"] = result.get("text")
-                    asset["model"] = result.get("model")
-                
-                elif tool_call.tool == "image_generate" and result.get("success"):
-                    # Save image
-                    image_data = result.get("image_data")
-                    if image_data:
-                        file_path = self.image_tool.save_image(
-                            image_data, 
-                            asset["id"], 
-                            self.assets_dir
-                        )
-                        asset["url"] = file_path
-                        asset["provider"] = result.get("provider")
-                        asset["model"] = result.get("model")
-                
-                elif tool_call.tool == "moderation" and result.get("success"):
-                    asset["safety"]["moderation_passed"] = result.get("moderation_passed", True)
-                    asset["safety"]["issues"] = result.get("issues", [])
-        
-        manifest["status"] = "ready"
+            Asset(**asset)
+        
+        nodes = build_dag(asset_plan, batch_tools=BATCHED_TOOLS)
+        await self.executor.run(nodes, on_event=self._track_asset_progress(nodes, on_event) if on_event else None)
+        await self._check_alignment(manifest)
+        
+        # Plans reused from a similar brief stay drafts until someone reviews them
+        manifest["status"] = "draft" if (manifest.get("metadata") or {}).get("seed") else "ready"
         return manifest
     
+    def _track_asset_progress(
+        self,
+        nodes: Dict[str, ToolNode],
+        on_event: Callable[[Dict[str, Any]], None]
+    ) -> Callable[[Dict[str, Any]], None]:
+        """
+        Wrap on_event so an asset_ready event follows the last of each asset's
+        own tool calls (generation, moderation). Batched calls such as
+        embeddings wait for every asset, so they don't hold an asset back.
+        """
+        # Node ids are "asset_index:call_index", so the prefix identifies the asset
+        remaining: Dict[str, set] = {}
+        assets: Dict[str, Dict[str, Any]] = {}
+        for node in nodes.values():
+            if node.batch:
+                continue
+            asset_index = node.id.split(":")[0]
+            remaining.setdefault(asset_index, set()).add(node.id)
+            assets[asset_index] = node.asset
+        
+        def emit(event: Dict[str, Any]):
+            on_event(event)
+            if event["event"] == "tool_call_started":
+                return
+            for node_id in event["node_ids"]:
+                asset_index = node_id.split(":")[0]
+                pending = remaining.get(asset_index)
+                if pending is None:
+                    continue
+                pending.discard(node_id)
+                if not pending:
+                    del remaining[asset_index]
+                    on_event({"event": "asset_ready", "asset": assets[asset_index]})
+        
+        return emit
+    
+    async def _check_alignment(self, manifest: Dict[str, Any]) -> List[str]:
+        """Score assets against the brief and strategy, optionally regenerating misaligned ones"""
+        flagged = await self.alignment.score_manifest(manifest)
+        
+        if flagged and AUTO_REGENERATE_MISALIGNED:
+            print(f"[INFO] Regenerating {len(flagged)} misaligned assets: {flagged}")
+            strategy = manifest.get("strategy", {})
+            instructions = (
+                f"Stay closer to the campaign brief and strategy. Brief: {manifest.get('brief', '')}. "
+                f"Core concept: {strategy.get('core_concept', '')}. Tagline: {strategy.get('tagline', '')}"
+            )
+            await self.regenerate_assets_async(
+                manifest, {asset_id: instructions for asset_id in flagged}, score_alignment=False
+            )
+            flagged = await self.alignment.score_manifest(manifest)
+        
+        return flagged
+    
     def regenerate_asset(self, manifest: Dict[str, Any], asset_id: str, modify_instructions: str = None) -> Dict[str, Any]:
+        """Blocking wrapper around regenerate_asset_async"""
+        return self._run_blocking(self.regenerate_asset_async(manifest, asset_id, modify_instructions))
+    
+    async def regenerate_asset_async(self, manifest: Dict[str, Any], asset_id: str, modify_instructions: str = None, score_alignment: bool = True) -> Dict[str, Any]:
         """Regenerate a specific asset"""
+        return await self.regenerate_assets_async(manifest, {asset_id: modify_instructions}, score_alignment)
+    
+    async def regenerate_assets_async(self, manifest: Dict[str, Any], instructions: Dict[str, Optional[str]], score_alignment: bool = True) -> Dict[str, Any]:
+        """
+        Regenerate several assets at once. instructions maps asset id to its
+        modify instructions (or None). All tool_calls run as one graph, so
+        they share the provider limits and embeddings are batched.
+        """
+        assets_by_id = {asset["id"]: asset for asset in manifest.get("asset_plan", [])}
+        missing = [asset_id for asset_id in instructions if asset_id not in assets_by_id]
+        if missing:
+            return {"success": False, "error": f"Asset not found: {', '.join(missing)}"}
         
-        asset_plan = manifest.get("asset_plan", [])
-        target_asset = None
+        targets = [assets_by_id[asset_id] for asset_id in instructions]
+        for target_asset in targets:
+            self._prepare_regeneration(target_asset, instructions[target_asset["id"]])
         
-        for asset in asset_plan:
-            if asset["id"] == asset_id:
-                target_asset = asset
-                break
+        # Re-execute tool calls for these assets
+        await self.executor.run(build_dag(targets, batch_tools=BATCHED_TOOLS))
         
-        if not target_asset:
-            return {"success": False, "error": "Asset not found"}
+        if score_alignment:
+            await self.alignment.score_manifest(manifest)
         
+        return {"success": True, "manifest": manifest, "asset_ids": list(instructions)}
+    
+    def _prepare_regeneration(self, target_asset: Dict[str, Any], modify_instructions: Optional[str]):
+        """Bump the version, reseed images and fold modify instructions into the prompts"""
         # Increment version
         target_asset["version"] += 1
         
@@ -399,24 +706,3 @@ Generate a complete campaign manifest following all rules. Include strategy, ass
                 if tool_call["tool"] in ["llm_text", "image_generate"]:
                     original_prompt = tool_call["input"]["prompt"]
                     tool_call["input"]["prompt"] = f"{original_prompt}\n\nModification: {modify_instructions}"
-        
-        # Re-execute tool calls for this asset
-        for tool_call_data in target_asset.get("tool_calls", []):
-            tool_call = ToolCall(**tool_call_data)
-            result = self.execute_tool_call(tool_call)
-            
-            tool_call_data["result"] = result
-            
-            if tool_call.tool == "llm_text" and result.get("success"):
-                target_asset["content"] = result.get("text")
-            elif tool_call.tool == "image_generate" and result.get("success"):
-                image_data = result.get("image_data")
-                if image_data:
-                    file_path = self.image_tool.save_image(
-                        image_data, 
-                        f"{asset_id}_v{target_asset['version']}", 
-                        self.assets_dir
-                    )
-                    target_asset["url"] = file_path
-        
-        return {"success": True, "manifest": manifest}
@@ -0,0 +1,304 @@
+import os
+import re
+import time
+import random
+import threading
+from typing import Dict, Any, Optional, Callable
+
+from agents.executor import TOOL_PROVIDERS
+
+# Requests per minute and tokens per minute each provider accepts from this worker (0 = unlimited)
+DEFAULT_PROVIDER_RPM = {
+    "gemini": 300,
+    "huggingface": 60,
+    "tavily": 100,
+}
+
+DEFAULT_PROVIDER_TPM = {
+    "gemini": 1_000_000,
+}
+
+# Consecutive retryable failures that open a provider's circuit, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+# Backoff base and cap in seconds, per tool type
+DEFAULT_BACKOFF_BASE = {
+    "llm_text": 1.0,
+    "image_generate": 2.0,
+    "web_search": 1.0,
+}
+DEFAULT_BACKOFF_CAP = {
+    "llm_text": 20.0,
+    "image_generate": 60.0,
+    "web_search": 10.0,
+}
+
+CHARS_PER_TOKEN = 4
+
+# HTTP statuses worth retrying; any other 4xx is the caller's fault and won't improve
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# "429 Resource has been exhausted" (Google), "API returned status 503: ..." (image tool)
+STATUS_PATTERN = re.compile(r"(?:^|status |code |error )([45]\d\d)\b")
+RETRYABLE_MARKERS = (
+    "timeout", "timed out", "temporarily", "unavailable", "connection", "reset by peer",
+    "resource exhausted", "resource has been exhausted", "rate limit", "quota", "overloaded", "deadline"
+)
+FATAL_MARKERS = (
+    "unknown tool", "not found in environment", "api key", "permission denied", "invalid argument", "blocked"
+)
+
+
+def parse_env_mapping(name: str, cast: Callable[[str], Any]) -> Dict[str, Any]:
+    """Read a NAME="key=value,key=value" environment variable"""
+    mapping = {}
+    for item in os.getenv(name, "").split(","):
+        if "=" not in item:
+            continue
+        key, value = item.split("=", 1)
+        try:
+            mapping[key.strip()] = cast(value.strip())
+        except ValueError:
+            print(f"[WARN] Ignoring invalid {name} entry: {item}")
+    return mapping
+
+
+def is_retryable(result: Dict[str, Any]) -> bool:
+    """Classify a failed tool result: transient provider trouble vs. an error retrying won't fix"""
+    error = str(result.get("error", "")).lower()
+    match = STATUS_PATTERN.search(error)
+    if match:
+        return int(match.group(1)) in RETRYABLE_STATUSES
+    if any(marker in error for marker in FATAL_MARKERS):
+        return False
+    if any(marker in error for marker in RETRYABLE_MARKERS):
+        return True
+    # Unrecognised failures keep the old retry-everything behaviour
+    return True
+
+
+def estimate_tokens(tool: str, tool_input: Dict[str, Any]) -> int:
+    """Upper-bound token cost of a call, charged against the provider's TPM budget up front"""
+    if tool == "llm_text":
+        return len(tool_input.get("prompt", "")) // CHARS_PER_TOKEN + int(tool_input.get("max_tokens", 1024))
+    if tool == "compute_embedding":
+        texts = tool_input.get("texts") or [tool_input.get("text", "")]
+        return sum(len(text) for text in texts) // CHARS_PER_TOKEN
+    return 0
+
+
+class TokenBucket:
+    """Refills at rate_per_minute; reservations may overdraw and are told how long to wait"""
+    
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def reserve(self, cost: float) -> float:
+        """Take cost now and return the seconds to wait before using it"""
+        with self._lock:
+            self._refill()
+            self.tokens -= min(cost, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+    
+    def refund(self, amount: float):
+        """Give back (or, if negative, additionally charge) tokens after the real cost is known"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+    
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive retryable failures and fails
+    calls fast until reset_seconds pass; then one trial call decides
+    whether it closes again.
+    """
+    
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started = 0.0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open":
+                if now - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = "half_open"
+                self.trial_started = 0.0
+            if self.state == "half_open":
+                # A trial that never reported back (cancelled) doesn't block the circuit forever
+                if self.trial_started and now - self.trial_started < self.reset_seconds:
+                    return False
+                self.trial_started = now
+            return True
+    
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+    
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+
+class ProviderGuard:
+    """
+    Shared view of provider health for every tool call in this worker:
+    request/token budgets, circuit breakers, retry classification and
+    full-jitter backoff. Configure with PROVIDER_RPM, PROVIDER_TPM,
+    TOOL_MAX_ATTEMPTS, TOOL_BACKOFF_BASE and TOOL_BACKOFF_CAP
+    ("name=value,name=value").
+    """
+    
+    def __init__(self):
+        rpm = {**DEFAULT_PROVIDER_RPM, **parse_env_mapping("PROVIDER_RPM", float)}
+        tpm = {**DEFAULT_PROVIDER_TPM, **parse_env_mapping("PROVIDER_TPM", float)}
+        self.request_buckets = {provider: TokenBucket(limit) for provider, limit in rpm.items() if limit > 0}
+        self.token_buckets = {provider: TokenBucket(limit) for provider, limit in tpm.items() if limit > 0}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        
+        self.max_attempts = parse_env_mapping("TOOL_MAX_ATTEMPTS", int)
+        self.backoff_base = {**DEFAULT_BACKOFF_BASE, **parse_env_mapping("TOOL_BACKOFF_BASE", float)}
+        self.backoff_cap = {**DEFAULT_BACKOFF_CAP, **parse_env_mapping("TOOL_BACKOFF_CAP", float)}
+        
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+    
+    def provider_for(self, tool: str) -> str:
+        return TOOL_PROVIDERS.get(tool, "local")
+    
+    def attempts_for(self, tool: str, requested: int) -> int:
+        return max(1, self.max_attempts.get(tool, requested))
+    
+    def _breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            if provider not in self.breakers:
+                self.breakers[provider] = CircuitBreaker()
+            return self.breakers[provider]
+    
+    def _count(self, provider: str, counter: str, amount: float = 1):
+        with self._lock:
+            counters = self._counters.setdefault(provider, {})
+            counters[counter] = counters.get(counter, 0) + amount
+    
+    def reject(self, provider: str) -> Optional[Dict[str, Any]]:
+        """Fail-fast result while the provider's circuit is open, else None"""
+        if provider == "local":
+            return None
+        breaker = self._breaker(provider)
+        if breaker.allow():
+            return None
+        self._count(provider, "rejected")
+        return {
+            "success": False,
+            "error": f"Circuit open for {provider}: failing fast for {breaker.retry_after():.0f}s",
+            "retryable": True
+        }
+    
+    def acquire(self, provider: str, tokens: int) -> float:
+        """Reserve one request and an estimated token cost; returns the seconds to wait first"""
+        wait = 0.0
+        if provider in self.request_buckets:
+            wait = self.request_buckets[provider].reserve(1)
+        if tokens and provider in self.token_buckets:
+            wait = max(wait, self.token_buckets[provider].reserve(tokens))
+        self._count(provider, "calls")
+        if wait:
+            self._count(provider, "throttled_seconds", wait)
+        return wait
+    
+    def record(self, provider: str, estimated_tokens: int, result: Dict[str, Any]) -> bool:
+        """Settle budgets and breaker state for a finished attempt; returns True if it should be retried"""
+        if result.get("cached") is True:
+            # Served from the response cache: the provider was never called
+            if provider in self.request_buckets:
+                self.request_buckets[provider].refund(1)
+            if estimated_tokens and provider in self.token_buckets:
+                self.token_buckets[provider].refund(estimated_tokens)
+        elif estimated_tokens and provider in self.token_buckets and result.get("usage"):
+            usage = result["usage"]
+            actual = usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+            if actual:
+                self.token_buckets[provider].refund(estimated_tokens - actual)
+                
+        if provider == "local":
+            return not result.get("success") and is_retryable(result)
+            
+        breaker = self._breaker(provider)
+        if result.get("success"):
+            breaker.record_success()
+            return False
+            
+        retryable = is_retryable(result)
+        self._count(provider, "failures")
+        if retryable:
+            breaker.record_failure()
+        else:
+            # The provider answered; the request itself was bad
+            breaker.record_success()
+        return retryable
+    
+    def backoff(self, tool: str, attempt: int, strategy: str = "exponential") -> float:
+        """Full-jitter delay: uniform between 0 and the capped exponential (or linear) step"""
+        base = self.backoff_base.get(tool, 1.0)
+        step = base * (2 ** attempt) if strategy == "exponential" else base * (attempt + 1)
+        return random.uniform(0, min(self.backoff_cap.get(tool, 30.0), step))
+    
+    def note_retry(self, provider: str):
+        self._count(provider, "retries")
+    
+    def stats(self) -> Dict[str, Any]:
+        providers = set(self.request_buckets) | set(self.token_buckets) | set(self.breakers) | set(self._counters)
+        stats = {}
+        for provider in sorted(providers):
+            breaker = self.breakers.get(provider)
+            with self._lock:
+                counters = dict(self._counters.get(provider, {}))
+            stats[provider] = {
+                "circuit": breaker.state if breaker else "closed",
+                "times_opened": breaker.times_opened if breaker else 0,
+                "consecutive_failures": breaker.failures if breaker else 0,
+                "rpm_limit": self.request_buckets[provider].capacity if provider in self.request_buckets else None,
+                "requests_available": round(self.request_buckets[provider].available(), 1) if provider in self.request_buckets else None,
+                "tpm_limit": self.token_buckets[provider].capacity if provider in self.token_buckets else None,
+                "tokens_available": round(self.token_buckets[provider].available()) if provider in self.token_buckets else None,
+                "calls": int(counters.get("calls", 0)),
+                "retries": int(counters.get("retries", 0)),
+                "failures": int(counters.get("failures", 0)),
+                "rejected": int(counters.get("rejected", 0)),
+                "throttled_seconds": round(counters.get("throttled_seconds", 0), 2)
+            }
+        return stats
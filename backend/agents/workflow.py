@@ -0,0 +1,141 @@
+import json
+import time
+import asyncio
+from typing import Dict, Any, List, Callable, Awaitable, Optional, Iterable
+
+# Same joins the workflow builder uses when it passes outputs between nodes itself
+OUTPUT_SEPARATOR = "\n\n---\n\n"
+INPUT_SEPARATOR = "\n\n"
+
+
+class WorkflowError(ValueError):
+    """The submitted graph can't be run: unknown agent, dangling edge or a cycle"""
+
+
+def format_output(output: Any) -> str:
+    """Render an upstream output as downstream input text (objects as indented JSON)"""
+    if isinstance(output, (dict, list)):
+        return json.dumps(output, indent=2, default=str)
+    return str(output)
+
+
+def combine_inputs(own_input: str, upstream_outputs: Iterable[Any]) -> str:
+    """Upstream outputs first, separated by rules, then the node's own input"""
+    parts = [format_output(output) for output in upstream_outputs if output]
+    if not parts:
+        return own_input
+    return OUTPUT_SEPARATOR.join(parts) + (INPUT_SEPARATOR + own_input if own_input else "")
+
+
+def parse_workflow(workflow: Dict[str, Any], agent_types: Iterable[str]):
+    """
+    Validate a builder graph ({"nodes": [{"id", "data": {"agentType", "input"}}],
+    "edges": [{"source", "target"}]}) and return (nodes, upstream, order):
+    node specs by id, upstream ids per node in edge order, and a topological order.
+    """
+    agent_types = set(agent_types)
+    nodes: Dict[str, Dict[str, Any]] = {}
+    for node in workflow.get("nodes") or []:
+        node_id = str(node.get("id", ""))
+        data = node.get("data") or {}
+        agent_type = data.get("agentType") or node.get("agentType") or node.get("agent_type")
+        if not node_id:
+            raise WorkflowError("Every node needs an id")
+        if node_id in nodes:
+            raise WorkflowError(f"Duplicate node id: {node_id}")
+        if agent_type not in agent_types:
+            raise WorkflowError(f"Node {node_id} has unknown agent type: {agent_type}")
+        nodes[node_id] = {
+            "id": node_id,
+            "agent_type": agent_type,
+            "label": data.get("label") or node_id,
+            "input": str(data.get("input", node.get("input")) or "")
+        }
+    if not nodes:
+        raise WorkflowError("Workflow has no nodes")
+        
+    upstream: Dict[str, List[str]] = {node_id: [] for node_id in nodes}
+    for edge in workflow.get("edges") or []:
+        source, target = str(edge.get("source", "")), str(edge.get("target", ""))
+        if source not in nodes or target not in nodes:
+            raise WorkflowError(f"Edge {source} -> {target} references an unknown node")
+        if source not in upstream[target]:
+            upstream[target].append(source)
+            
+    # Kahn's algorithm; anything left over sits on a cycle
+    remaining = {node_id: len(sources) for node_id, sources in upstream.items()}
+    ready = [node_id for node_id, count in remaining.items() if count == 0]
+    order = []
+    while ready:
+        node_id = ready.pop(0)
+        order.append(node_id)
+        for target, sources in upstream.items():
+            if node_id in sources:
+                remaining[target] -= 1
+                if remaining[target] == 0:
+                    ready.append(target)
+    if len(order) != len(nodes):
+        cyclic = sorted(set(nodes) - set(order))
+        raise WorkflowError(f"Workflow has a cycle through: {', '.join(cyclic)}")
+        
+    return nodes, upstream, order
+
+
+async def run_workflow(
+    nodes: Dict[str, Dict[str, Any]],
+    upstream: Dict[str, List[str]],
+    order: List[str],
+    run_agent: Callable[[str, str], Awaitable[Dict[str, Any]]],
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run every node as soon as all of its upstream nodes have finished, so
+    independent branches run concurrently. run_agent(agent_type, input)
+    returns an agent endpoint response or raises. Nodes downstream of a
+    failure are skipped. Emits node_started, node_finished, node_failed
+    and node_skipped; returns the per-node results.
+    """
+    
+    def emit(event: str, node: Dict[str, Any], **data):
+        if on_event:
+            on_event({"event": event, "node_id": node["id"], "agent_type": node["agent_type"], **data})
+            
+    tasks: Dict[str, asyncio.Task] = {}
+    
+    async def run_node(node: Dict[str, Any]) -> Dict[str, Any]:
+        sources = [await tasks[source] for source in upstream[node["id"]]]
+        blocked = [source["node_id"] for source in sources if source["status"] != "success"]
+        if blocked:
+            emit("node_skipped", node, reason=f"Upstream node(s) did not succeed: {', '.join(blocked)}")
+            return {"node_id": node["id"], "status": "skipped"}
+            
+        user_input = combine_inputs(node["input"], [source.get("output") for source in sources])
+        emit("node_started", node, input_chars=len(user_input))
+        started = time.time()
+        try:
+            response = await run_agent(node["agent_type"], user_input)
+            if not response or not response.get("success"):
+                raise RuntimeError((response or {}).get("error") or "Agent returned no output")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = getattr(e, "detail", None) or str(e)
+            print(f"❌ Workflow node {node['id']} ({node['agent_type']}) failed: {error}")
+            emit("node_failed", node, error=error)
+            return {"node_id": node["id"], "status": "error", "error": error}
+            
+        duration = round(time.time() - started, 2)
+        extra = {key: value for key, value in response.items() if key not in ("success", "output")}
+        emit("node_finished", node, output=response.get("output"), duration=duration, **extra)
+        return {"node_id": node["id"], "status": "success", "output": response.get("output"), "duration": duration, **extra}
+        
+    # Created in topological order, so every upstream task exists before its dependants await it
+    for node_id in order:
+        tasks[node_id] = asyncio.create_task(run_node(nodes[node_id]))
+    try:
+        results = await asyncio.gather(*tasks.values())
+    finally:
+        # Caller cancelled (client disconnected): stop the agents still running
+        for task in tasks.values():
+            task.cancel()
+    return {result["node_id"]: result for result in results}
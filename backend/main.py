@@ -1,19 +1,29 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse, Response
 from dotenv import load_dotenv
 import os
 import json
+import copy
 import shutil
+import asyncio
 from pathlib import Path
 from datetime import datetime
+from typing import Optional, Callable, Awaitable
 import uuid
 import hashlib
 import secrets
 
-from models.schema import BriefRequest, RegenerateRequest, CampaignManifest
+from models.schema import BriefRequest, RegenerateRequest, BatchRegenerateRequest, CampaignManifest, ToolCall
 from agents.orchestrator import CampaignOrchestrator
+from agents.workflow import WorkflowError, parse_workflow, run_workflow
+from services.blobs import migrate_campaigns_dir
+from services.jobs import JobQueue, JobStore, QueueFullError
+from services.campaign_index import CampaignIndex
+from services.storage import create_storage, metadata_changes
+from services.export import export_cache_path, iter_campaign_zip
+from services.http_cache import CompressionMiddleware, etag_matches
+from tools.response_cache import make_cache_key
 
 # Load environment variables from parent directory or current directory
 env_path = Path(__file__).parent.parent / '.env'
@@ -48,8 +58,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# gzip/brotli for JSON responses over COMPRESS_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
+
 # Initialize orchestrator
 orchestrator = CampaignOrchestrator()
 
@@ -57,14 +71,37 @@ orchestrator = CampaignOrchestrator()
 STORAGE_DIR = Path("./storage")
 ASSETS_DIR = STORAGE_DIR / "assets"
 CAMPAIGNS_DIR = STORAGE_DIR / "campaigns"
+EXPORTS_DIR = STORAGE_DIR / "exports"
 
 STORAGE_DIR.mkdir(exist_ok=True)
 ASSETS_DIR.mkdir(exist_ok=True)
 CAMPAIGNS_DIR.mkdir(exist_ok=True)
 
-# Users directory for simple auth storage
-USERS_DIR = STORAGE_DIR / "users"
-USERS_DIR.mkdir(exist_ok=True)
+# One-time migration: move inline base64 images out of older manifests into the asset store
+scanned, rewritten = migrate_campaigns_dir(str(CAMPAIGNS_DIR), orchestrator.asset_store)
+if rewritten:
+    print(f"Migrated {rewritten}/{scanned} campaign manifests to blob references")
+
+# Campaign and user persistence (STORAGE_BACKEND=json|sqlite)
+storage = create_storage(str(STORAGE_DIR))
+compacted = storage.compact()
+if compacted:
+    print(f"Compacted {compacted} campaign change logs")
+
+# Summary/ownership index so list and regenerate never scan manifests.
+# Rebuilt when it has drifted from storage (first run, files copied in by hand);
+# manifests a rebuild had to skip are remembered so they don't force one every start
+campaign_index = CampaignIndex()
+stored_campaigns = storage.count_campaigns()
+if not campaign_index.in_sync(stored_campaigns):
+    print(f"Rebuilt campaign index: {campaign_index.rebuild(storage.iter_campaigns(), stored_campaigns)} campaigns")
+
+# Content-addressed image files, deduplicated and reference counted by campaign.
+# Run `python -m services.asset_store gc` to delete blobs no campaign references
+asset_store = orchestrator.asset_store
+derivatives = orchestrator.derivatives
+
+MAX_CAMPAIGN_PAGE_SIZE = 200
 
 # ============================================
 # Authentication Endpoints
@@ -97,8 +134,7 @@ async def register(request: dict):
             raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
         
         # Check if user already exists
-        user_file = USERS_DIR / f"{email.replace('@', '_at_').replace('.', '_')}.json"
-        if user_file.exists():
+        if storage.get_user(email):
             raise HTTPException(status_code=400, detail="Email already registered")
         
         # Create user
@@ -111,8 +147,8 @@ async def register(request: dict):
             "campaigns": []
         }
         
-        with open(user_file, "w") as f:
-            json.dump(user_data, f, indent=2)
+        if not storage.create_user(user_data):
+            raise HTTPException(status_code=400, detail="Email already registered")
         
         return {
             "success": True,
@@ -141,13 +177,10 @@ async def login(request: dict):
             raise HTTPException(status_code=400, detail="Email and password required")
         
         # Find user
-        user_file = USERS_DIR / f"{email.replace('@', '_at_').replace('.', '_')}.json"
-        if not user_file.exists():
+        user_data = storage.get_user(email)
+        if not user_data:
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        with open(user_file, "r") as f:
-            user_data = json.load(f)
-        
         # Verify password
         if user_data["password_hash"] != hash_password(password):
             raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -175,11 +208,19 @@ async def login(request: dict):
 # Workflow Builder Agent Endpoints
 # ============================================
 
+MAX_VISUAL_VARIANTS = 6
+
 @app.post("/api/agents/strategy")
 async def run_strategy_agent(request: dict):
-    """Execute Strategy Agent"""
+    """Execute Strategy Agent ("reuse_similar": true reuses the strategy of a near-duplicate brief)"""
     try:
         user_input = request.get("input", "")
+        reuse_similar = request.get("reuse_similar", False)
+        
+        if reuse_similar:
+            cached = await orchestrator.brief_cache.lookup_async("strategy", user_input)
+            if cached:
+                return {"success": True, "output": cached["payload"], "seed": cached["seed"]}
         
         prompt = f"""As a brand strategy expert, analyze this brief and create a strategic foundation:
 
@@ -195,7 +236,7 @@ Provide a strategic analysis including:
 
 Return as JSON with keys: core_concept, tagline, target_audience, key_messages (array), tone, channels (array)"""
 
-        result = orchestrator.llm_tool.generate_text({
+        result = await orchestrator.call_tool_async("llm_text", {
             "prompt": prompt,
             "model": "gemini-2.0-flash-exp",
             "temperature": 0.3,
@@ -213,6 +254,7 @@ Return as JSON with keys: core_concept, tagline, target_audience, key_messages (
                     content = content.split("```")[1].split("```")[0].strip()
                 
                 strategy_data = json.loads(content)
+                await orchestrator.brief_cache.store_async("strategy", user_input, strategy_data)
                 return {"success": True, "output": strategy_data}
             except:
                 # If parsing fails, return raw text
@@ -241,7 +283,7 @@ Generate:
 
 Return as JSON with keys: captions (array of 3 strings), cta (string), hashtags (string)"""
 
-        result = orchestrator.llm_tool.generate_text({
+        result = await orchestrator.call_tool_async("llm_text", {
             "prompt": prompt,
             "model": "gemini-2.0-flash-exp",
             "temperature": 0.7,
@@ -272,6 +314,8 @@ async def run_visual_agent(request: dict):
     """Execute Visual Design Agent - Generate Images"""
     try:
         user_input = request.get("input", "")
+        inline = bool(request.get("inline", False))
+        variant_count = max(1, min(int(request.get("variants", 3)), MAX_VISUAL_VARIANTS))
         
         # Create a prompt for image generation
         image_prompt = f"Professional marketing visual: {user_input}. High quality, modern, clean design, commercial photography style"
@@ -279,38 +323,50 @@ async def run_visual_agent(request: dict):
         print(f"\n🎨 Visual Agent - Generating images for: {user_input}")
         print(f"📝 Image prompt: {image_prompt}")
         
-        # Generate 3 image variations
+        async def generate_variant(i: int):
+            # Bounded by the same per-provider limit as campaign generation
+            async with orchestrator.executor.provider_slot("huggingface"):
+                print(f"🖼️ Generating image {i+1}/{variant_count}...")
+                # Through the orchestrator so rate limits, circuit breaker and retries apply
+                return await orchestrator.execute_tool_call_async(ToolCall(
+                    tool="image_generate",
+                    id=f"visual_variant_{i}",
+                    input={
+                        "prompt": image_prompt,
+                        "size": "1024x1024",
+                        "seed": None,
+                        "n": 1
+                    },
+                    expected_output_schema={"blob": "object"}
+                ))
+        
+        # Generate all variations concurrently; a cold model is waited out once for all of them
+        results = await asyncio.gather(*(
+            generate_variant(i) for i in range(variant_count)
+        ))
+        
         images = []
-        for i in range(3):
-            print(f"🖼️ Generating image {i+1}/3...")
-            result = orchestrator.image_tool.generate_image({
-                "prompt": image_prompt,
-                "size": "1024x1024",
-                "seed": None,
-                "n": 1
-            })
-            
+        for result in results:
             if result.get("success"):
-                # Save image and get URL
-                image_id = f"img_{uuid.uuid4().hex[:8]}"
-                image_data = result.get("image_data")
-                
-                # Save to file
-                image_path = ASSETS_DIR / f"{image_id}.png"
-                import base64
-                with open(image_path, "wb") as f:
-                    f.write(base64.b64decode(image_data))
+                # The image tool already streamed the image to disk; file it by content hash.
+                # Variants no campaign references are removed by asset GC after its grace period
+                blob = asset_store.ingest(result["blob"])
+                derivatives.schedule(blob)
+                print(f"✅ Image saved: {blob['path']}")
                 
-                print(f"✅ Image saved: {image_path}")
+                image_url = blob["url"]
+                sizes = derivatives.describe(blob)
                 
-                # Create URL
-                image_url = f"http://localhost:8000/assets/{image_id}.png"
-                
-                images.append({
+                image = {
                     "url": image_url,
-                    "thumbnail": image_url,  # Same for now
-                    "selected": i == 0  # First one selected by default
-                })
+                    "thumbnail": sizes.get("thumbnail_url", image_url),
+                    "variants": sizes.get("variants", []),
+                    "selected": not images  # First one selected by default
+                }
+                if inline:
+                    # Base64 only for clients that explicitly ask for it
+                    image["image_data"] = orchestrator.image_tool.load_inline(blob)
+                images.append(image)
             else:
                 print(f"❌ Image generation failed: {result.get('error')}")
         
@@ -341,7 +397,7 @@ async def run_research_agent(request: dict):
         
         # Use search tool if available
         search_query = user_input
-        search_result = orchestrator.search_tool.web_search({
+        search_result = await orchestrator.call_tool_async("web_search", {
             "q": search_query,
             "max_results": 5
         })
@@ -363,7 +419,7 @@ Provide:
 
 Return as JSON with keys: trends (array), audience_insights (string), competitive_landscape (string), opportunities (array)"""
 
-            llm_result = orchestrator.llm_tool.generate_text({
+            llm_result = await orchestrator.call_tool_async("llm_text", {
                 "prompt": prompt,
                 "model": "gemini-2.0-flash-exp",
                 "temperature": 0.3,
@@ -411,7 +467,7 @@ Create:
 
 Return as JSON with keys: calendar (array of objects with date, channel, time, content_type), summary (string)"""
 
-        result = orchestrator.llm_tool.generate_text({
+        result = await orchestrator.call_tool_async("llm_text", {
             "prompt": prompt,
             "model": "gemini-2.0-flash-exp",
             "temperature": 0.4,
@@ -437,19 +493,60 @@ Return as JSON with keys: calendar (array of objects with date, channel, time, c
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# Mount assets directory (after agent endpoints to avoid route conflicts)
-app.mount("/assets", StaticFiles(directory=str(ASSETS_DIR)), name="assets")
+# Content-addressed names never change bytes, so clients may cache them forever.
+# Legacy per-asset names (asset_1.png) can be overwritten and must be revalidated
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@app.get("/assets/{name}")
+async def get_asset(name: str, if_none_match: Optional[str] = Header(None)):
+    """Serve an image file from the asset store (ranges and conditional GETs supported)"""
+    asset_path = asset_store.resolve_name(name)
+    if asset_path is None:
+        # Thumbnails and variants are rendered on first request if they don't exist yet
+        asset_path = await derivatives.ensure(name)
+    if asset_path is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    
+    if not asset_store.is_immutable(name):
+        # Mutable files are validated by mtime and size, as FileResponse would
+        stat = asset_path.stat()
+        etag = hashlib.md5(f"{stat.st_mtime}-{stat.st_size}".encode()).hexdigest()
+        headers = {"Cache-Control": "no-cache", "ETag": f'"{etag}"'}
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(asset_path, headers=headers, stat_result=stat)
+    
+    # The name is the content hash, so it is a strong validator as-is
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": f'"{asset_path.stem}"'}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(asset_path, headers=headers)
 
 @app.get("/")
 def read_root():
     return {"message": "Campaign Generator API", "status": "running"}
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Cache and provider statistics for this worker"""
+    return {
+        "success": True,
+        "metrics": {
+            "llm_cache": orchestrator.llm_tool.cache.stats(),
+            "search_cache": orchestrator.search_tool.cache_stats(),
+            "brief_cache": orchestrator.brief_cache.stats(),
+            "providers": orchestrator.guard.stats(),
+            "single_flight": orchestrator.single_flight.stats(),
+            "jobs": await asyncio.to_thread(job_queue.store.counts)
+        }
+    }
+
 @app.post("/api/generate-campaign")
 async def generate_campaign(request: BriefRequest):
     """Generate campaign from brief"""
     try:
         # Generate manifest
-        result = orchestrator.generate_campaign_manifest(request.brief)
+        result = await orchestrator.generate_campaign_manifest_async(request.brief, request.reuse_similar)
         
         if not result.get("success"):
             raise HTTPException(status_code=500, detail=result.get("error"))
@@ -457,120 +554,395 @@ async def generate_campaign(request: BriefRequest):
         manifest = result["manifest"]
         
         # Execute asset generation
-        manifest = orchestrator.execute_asset_generation(manifest)
+        manifest = await orchestrator.execute_asset_generation_async(manifest)
         
         # Save campaign
-        campaign_id = manifest["campaign_id"]
-        campaign_file = CAMPAIGNS_DIR / f"{campaign_id}.json"
-        
-        with open(campaign_file, "w") as f:
-            json.dump(manifest, f, indent=2)
+        await asyncio.to_thread(save_campaign, manifest)
         
         return {"success": True, "campaign": manifest}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def save_campaign(manifest: dict):
+    """Persist a campaign manifest and index it"""
+    storage.save_campaign(manifest)
+    index_campaign(manifest)
+
+def index_campaign(manifest: dict):
+    """Refresh the summary index and the asset references of a stored manifest"""
+    campaign_index.upsert(manifest)
+    asset_store.set_refs(manifest["campaign_id"], manifest)
+
+# Seconds between keep-alive comments on idle progress streams
+SSE_KEEPALIVE_SECONDS = 15
+
+def format_sse(event: str, data: dict) -> str:
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _sse_response(producer: Callable[[Callable[[str, dict], None]], Awaitable[None]]) -> StreamingResponse:
+    """
+    Stream a producer's events as Server-Sent Events. producer(emit) calls
+    emit(event, data) as it goes; an exception becomes an error event, and
+    the producer is cancelled if the client disconnects.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    
+    def emit(event: str, data: dict):
+        events.put_nowait((event, data))
+    
+    async def produce():
+        try:
+            await producer(emit)
+        except Exception as e:
+            emit("error", {"detail": str(e)})
+        finally:
+            events.put_nowait(None)
+    
+    async def stream():
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(events.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from timing out during long tool calls
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    break
+                yield format_sse(*item)
+        finally:
+            # Client went away: stop spending provider calls on it
+            task.cancel()
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/generate-campaign/stream")
+async def generate_campaign_stream(request: BriefRequest):
+    """
+    Generate campaign from brief, streaming progress as Server-Sent Events:
+    manifest, tool_call_started, tool_call_finished, tool_call_skipped,
+    asset_ready, complete (or error)
+    """
+    
+    async def produce(emit):
+        result = await orchestrator.generate_campaign_manifest_async(request.brief, request.reuse_similar)
+        if not result.get("success"):
+            emit("error", {"detail": result.get("error")})
+            return
+        
+        manifest = result["manifest"]
+        emit("manifest", {"campaign": manifest})
+        
+        manifest = await orchestrator.execute_asset_generation_async(
+            manifest,
+            on_event=lambda event: emit(event["event"], event)
+        )
+        await asyncio.to_thread(save_campaign, manifest)
+        
+        emit("complete", {"campaign": manifest})
+    
+    return _sse_response(produce)
+
+# ============================================
+# Workflow Pipeline
+# ============================================
+
+# Agent endpoints the workflow builder's nodes map to
+WORKFLOW_AGENTS = {
+    "strategy": run_strategy_agent,
+    "copywriting": run_copywriting_agent,
+    "visual": run_visual_agent,
+    "research": run_research_agent,
+    "media": run_media_agent,
+}
+
+@app.post("/api/workflow/run")
+async def run_workflow_pipeline(request: dict):
+    """
+    Run a workflow builder graph ({"nodes": [...], "edges": [...]}) server-side.
+    Independent nodes run concurrently and each node gets its upstream outputs
+    as input, without a client round trip per node. Streams Server-Sent Events:
+    node_started, node_finished, node_failed, node_skipped, complete (or error)
+    """
+    try:
+        nodes, upstream, order = parse_workflow(request, WORKFLOW_AGENTS)
+    except WorkflowError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+        
+    async def run_agent(agent_type: str, user_input: str) -> dict:
+        return await WORKFLOW_AGENTS[agent_type]({"input": user_input})
+    
+    async def produce(emit):
+        started = datetime.now()
+        print(f"\n🔀 Workflow pipeline - {len(nodes)} node(s): {' -> '.join(order)}")
+        results = await run_workflow(
+            nodes, upstream, order, run_agent,
+            on_event=lambda event: emit(event["event"], event)
+        )
+        emit("complete", {
+            "success": all(result["status"] == "success" for result in results.values()),
+            "results": results,
+            "duration": round((datetime.now() - started).total_seconds(), 2)
+        })
+    
+    return _sse_response(produce)
+
+# ============================================
+# Background Jobs
+# ============================================
+
+job_queue = JobQueue(JobStore())
+
+async def run_campaign_job(payload: dict, report) -> dict:
+    """Job handler: generate, execute and save a campaign from a brief"""
+    report({"stage": "manifest"})
+    result = await orchestrator.generate_campaign_manifest_async(payload["brief"], payload.get("reuse_similar", False))
+    if not result.get("success"):
+        raise RuntimeError(result.get("error"))
+    
+    manifest = result["manifest"]
+    progress = {
+        "stage": "assets",
+        "campaign_id": manifest["campaign_id"],
+        "assets_total": len(manifest.get("asset_plan", [])),
+        "assets_ready": 0
+    }
+    report(progress)
+    
+    def on_event(event: dict):
+        if event["event"] == "asset_ready":
+            progress["assets_ready"] += 1
+            report(progress)
+    
+    manifest = await orchestrator.execute_asset_generation_async(manifest, on_event=on_event)
+    
+    report({**progress, "stage": "saving"})
+    await asyncio.to_thread(save_campaign, manifest)
+    
+    return {"campaign_id": manifest["campaign_id"]}
+
+job_queue.register("campaign", run_campaign_job)
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_queue.stop()
+    derivatives.shutdown()
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    await orchestrator.image_tool.aclose()
+
+@app.post("/api/jobs/campaign", status_code=202)
+async def submit_campaign_job(request: BriefRequest):
+    """Queue campaign generation and return the job immediately"""
+    try:
+        job = await job_queue.submit("campaign", {"brief": request.brief, "reuse_similar": request.reuse_similar})
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    
+    return {"success": True, "job": job}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status, progress and result"""
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {"success": True, "job": job}
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued job, or ask a running one to stop"""
+    job = await asyncio.to_thread(job_queue.cancel, job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {"success": True, "job": job}
+
 @app.get("/api/campaign/{campaign_id}")
-async def get_campaign(campaign_id: str):
-    """Get campaign by ID"""
-    campaign_file = CAMPAIGNS_DIR / f"{campaign_id}.json"
+async def get_campaign(campaign_id: str, if_none_match: Optional[str] = Header(None)):
+    """Get campaign by ID; 304 when the client's copy is still current"""
+    # Off the event loop: the read may wait for a writer's lock on the manifest
+    campaign = await asyncio.to_thread(storage.get_campaign, campaign_id)
     
-    if not campaign_file.exists():
+    if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    with open(campaign_file, "r") as f:
-        campaign = json.load(f)
+    # The manifest hash changes with every saved change, so it versions the response
+    headers = {"ETag": f'"{make_cache_key(campaign)}"', "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
     
-    return {"success": True, "campaign": campaign}
+    return JSONResponse({"success": True, "campaign": campaign}, headers=headers)
 
 @app.post("/api/regenerate-asset")
 async def regenerate_asset(request: RegenerateRequest):
     """Regenerate a specific asset"""
     try:
-        # Find campaign containing this asset
-        for campaign_file in CAMPAIGNS_DIR.glob("*.json"):
-            with open(campaign_file, "r") as f:
-                manifest = json.load(f)
-            
-            # Check if asset exists in this campaign
-            asset_ids = [a["id"] for a in manifest.get("asset_plan", [])]
-            if request.asset_id in asset_ids:
-                # Regenerate
-                result = orchestrator.regenerate_asset(
-                    manifest, 
-                    request.asset_id, 
-                    request.modify_instructions
-                )
-                
-                if not result.get("success"):
-                    raise HTTPException(status_code=500, detail=result.get("error"))
-                
-                # Save updated manifest
-                with open(campaign_file, "w") as f:
-                    json.dump(result["manifest"], f, indent=2)
-                
-                return {"success": True, "campaign": result["manifest"]}
+        # Find campaign containing this asset from the index
+        if request.campaign_id:
+            campaign_id = request.campaign_id if campaign_index.has_asset(request.campaign_id, request.asset_id) else None
+        else:
+            campaign_id = campaign_index.find_campaign(request.asset_id)
         
-        raise HTTPException(status_code=404, detail="Asset not found")
+        manifest = await asyncio.to_thread(storage.get_campaign, campaign_id) if campaign_id else None
+        if not manifest:
+            raise HTTPException(status_code=404, detail="Asset not found")
+        metadata_before = copy.deepcopy(manifest.get("metadata", {}))
+        
+        # Regenerate
+        result = await orchestrator.regenerate_asset_async(
+            manifest, 
+            request.asset_id, 
+            request.modify_instructions
+        )
+        
+        if not result.get("success"):
+            raise HTTPException(status_code=500, detail=result.get("error"))
+        
+        # Merge just this asset and the metadata keys it changed into the latest stored
+        # manifest, under the campaign lock, so concurrent updates aren't overwritten
+        asset = next(a for a in result["manifest"]["asset_plan"] if a["id"] == request.asset_id)
+        manifest = await asyncio.to_thread(
+            storage.update_asset,
+            campaign_id,
+            asset,
+            None,
+            metadata_changes(metadata_before, result["manifest"].get("metadata", {}))
+        )
+        if not manifest:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        await asyncio.to_thread(index_campaign, manifest)
+        
+        return {"success": True, "campaign": manifest}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/regenerate-assets")
+async def regenerate_assets(request: BatchRegenerateRequest):
+    """Regenerate several assets of one campaign concurrently and save them in one commit"""
+    try:
+        manifest = await asyncio.to_thread(storage.get_campaign, request.campaign_id)
+        if not manifest:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        metadata_before = copy.deepcopy(manifest.get("metadata", {}))
+        
+        asset_plan = manifest.get("asset_plan", [])
+        if request.asset_ids is not None:
+            asset_ids = list(dict.fromkeys(request.asset_ids))
+        elif request.asset_type:
+            asset_ids = [a["id"] for a in asset_plan if a["type"] == request.asset_type]
+        else:
+            raise HTTPException(status_code=400, detail="Provide asset_ids or asset_type")
+        
+        known_ids = {a["id"] for a in asset_plan}
+        missing = [asset_id for asset_id in asset_ids if asset_id not in known_ids]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Asset not found: {', '.join(missing)}")
+        if not asset_ids:
+            return {"success": True, "campaign": manifest, "regenerated": []}
+        
+        result = await orchestrator.regenerate_assets_async(
+            manifest,
+            {
+                asset_id: request.instructions.get(asset_id, request.modify_instructions)
+                for asset_id in asset_ids
+            }
+        )
+        
+        if not result.get("success"):
+            raise HTTPException(status_code=500, detail=result.get("error"))
         
+        # One commit for the whole batch, merged into the latest stored manifest
+        regenerated = [a for a in result["manifest"]["asset_plan"] if a["id"] in set(asset_ids)]
+        manifest = await asyncio.to_thread(
+            storage.update_assets,
+            request.campaign_id,
+            regenerated,
+            None,
+            metadata_changes(metadata_before, result["manifest"].get("metadata", {}))
+        )
+        if not manifest:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        await asyncio.to_thread(index_campaign, manifest)
+        
+        return {"success": True, "campaign": manifest, "regenerated": asset_ids}
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/campaigns")
-async def list_campaigns():
-    """List all campaigns"""
-    campaigns = []
-    for campaign_file in CAMPAIGNS_DIR.glob("*.json"):
-        with open(campaign_file, "r") as f:
-            campaign = json.load(f)
-            campaigns.append({
-                "campaign_id": campaign["campaign_id"],
-                "brief": campaign["brief"],
-                "created_at": campaign["created_at"],
-                "status": campaign["status"]
-            })
+async def list_campaigns(
+    limit: int = Query(50, ge=1, le=MAX_CAMPAIGN_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    status: Optional[str] = None,
+    q: Optional[str] = None,
+    fields: str = "campaign_id,brief,created_at,status"
+):
+    """
+    List campaigns from the summary index, sorted by created_at.
+    Pass next_cursor back as cursor for the following page (null on the
+    last one). The first page also carries total, the number of matches.
+    Filter with status and q (brief substring); choose columns with fields.
+    """
+    try:
+        campaigns, next_cursor = campaign_index.page(
+            limit,
+            cursor=cursor,
+            order=order,
+            status=status,
+            brief_contains=q,
+            fields=[field.strip() for field in fields.split(",") if field.strip()]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {"success": True, "campaigns": campaigns}
+    response = {"success": True, "campaigns": campaigns, "next_cursor": next_cursor}
+    if cursor is None:
+        # Counting every match is a full scan, so only the first page pays for it
+        response["total"] = await asyncio.to_thread(campaign_index.count, status=status, brief_contains=q)
+    return response
 
 @app.post("/api/export-campaign/{campaign_id}")
 async def export_campaign(campaign_id: str):
-    """Export campaign as ZIP"""
-    import zipfile
-    from io import BytesIO
-    
-    campaign_file = CAMPAIGNS_DIR / f"{campaign_id}.json"
+    """Export campaign as ZIP, streamed and cached on disk by manifest hash"""
+    # Off the event loop: the read may wait for a writer's lock on the manifest
+    campaign = await asyncio.to_thread(storage.get_campaign, campaign_id)
     
-    if not campaign_file.exists():
+    if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    with open(campaign_file, "r") as f:
-        campaign = json.load(f)
-    
-    # Create ZIP in memory
-    zip_buffer = BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        # Add manifest
-        zip_file.writestr("campaign_manifest.json", json.dumps(campaign, indent=2))
-        
-        # Add assets
-        for asset in campaign.get("asset_plan", []):
-            if asset.get("url"):
-                asset_path = Path(asset["url"])
-                if asset_path.exists():
-                    zip_file.write(asset_path, f"assets/{asset_path.name}")
-            
-            if asset.get("content"):
-                filename = f"assets/{asset['id']}.txt"
-                zip_file.writestr(filename, asset["content"])
+    filename = f"campaign_{campaign_id}.zip"
+    cache_path = export_cache_path(str(EXPORTS_DIR), campaign)
     
-    zip_buffer.seek(0)
+    # Unchanged campaign: serve the archive built last time
+    if cache_path.exists():
+        return FileResponse(cache_path, media_type="application/zip", filename=filename)
     
     return StreamingResponse(
-        zip_buffer,
+        iter_campaign_zip(campaign, asset_store, cache_path),
         media_type="application/zip",
-        headers={"Content-Disposition": f"attachment; filename=campaign_{campaign_id}.zip"}
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
 if __name__ == "__main__":
@@ -30,6 +30,8 @@ class Asset(BaseModel):
     model: Optional[str] = None
     provider: Optional[str] = None
     url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    variants: List[Dict[str, Any]] = Field(default_factory=list)
     content: Optional[str] = None
     safety: AssetSafety = Field(default_factory=AssetSafety)
     tool_calls: List[ToolCall] = Field(default_factory=list)
@@ -76,7 +78,20 @@ class CampaignManifestWrapper(BaseModel):
 
 class BriefRequest(BaseModel):
     brief: str
+    # Reuse the plan of a near-duplicate earlier brief (as a draft) instead of generating one
+    reuse_similar: bool = False
 
 class RegenerateRequest(BaseModel):
     asset_id: str
     modify_instructions: Optional[str] = None
+    # Asset ids are only unique within a campaign; without this the newest owner is used
+    campaign_id: Optional[str] = None
+
+class BatchRegenerateRequest(BaseModel):
+    campaign_id: str
+    # Select by id, or every asset of a type (e.g. "caption", "image")
+    asset_ids: Optional[List[str]] = None
+    asset_type: Optional[str] = None
+    # Applied to every selected asset unless overridden per asset in `instructions`
+    modify_instructions: Optional[str] = None
+    instructions: Dict[str, str] = Field(default_factory=dict)
@@ -0,0 +1,291 @@
+import os
+import re
+import sys
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterable, Optional, Set, Tuple
+from urllib.parse import urlparse, unquote
+
+from services.blobs import MIME_TYPES
+
+# Unreferenced blobs younger than this survive GC (in-flight generations, workflow-builder images)
+ASSET_GC_GRACE_SECONDS = float(os.getenv("ASSET_GC_GRACE_SECONDS", str(7 * 24 * 3600)))
+
+# "<sha256>.<ext>": names that identify their bytes, so they can be cached forever
+CONTENT_ADDRESSED_NAME = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]+)$")
+
+# "<sha256>_w<width>.<ext>": a resized/re-encoded derivative of the blob with that hash
+DERIVATIVE_NAME = re.compile(r"^([0-9a-f]{64})_w([0-9]+)\.([a-z0-9]+)$")
+
+
+def blob_hashes(manifest: Dict[str, Any]) -> Set[str]:
+    """Every content hash a manifest references, from asset urls and tool_call blob refs"""
+    hashes = set()
+    for asset in manifest.get("asset_plan", []):
+        match = CONTENT_ADDRESSED_NAME.match(Path(urlparse(asset.get("url") or "").path).name)
+        if match:
+            hashes.add(match.group(1))
+        for tool_call in asset.get("tool_calls", []):
+            result = tool_call.get("result")
+            if isinstance(result, dict) and isinstance(result.get("blob"), dict) and result["blob"].get("sha256"):
+                hashes.add(result["blob"]["sha256"])
+    return hashes
+
+
+class AssetStore:
+    """
+    Content-addressed asset files: <root>/cas/<ab>/<sha256>.<ext>.
+    Identical bytes are stored once. Manifests register the hashes they
+    reference; gc() deletes blobs nothing references.
+    """
+    
+    def __init__(self, root: Optional[str] = None, refs_path: Optional[str] = None):
+        self.root = Path(root or os.getenv("ASSETS_DIR", "./storage/assets"))
+        self.cas_dir = self.root / "cas"
+        self.cas_dir.mkdir(parents=True, exist_ok=True)
+        
+        refs_path = refs_path or os.getenv("ASSET_REFS_PATH", str(self.root.parent / "asset_refs.sqlite3"))
+        self._conn = sqlite3.connect(refs_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS refs (
+                owner TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                PRIMARY KEY (owner, sha256)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS refs_sha256 ON refs (sha256)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+    
+    def path_for(self, sha256: str, extension: str) -> Path:
+        return self.cas_dir / sha256[:2] / f"{sha256}.{extension}"
+    
+    def url_for(self, sha256: str, extension: str) -> str:
+        # Origin-relative, so stored manifests survive a host or port change; clients add their API origin
+        return f"/assets/{sha256}.{extension}"
+    
+    def derivative_path(self, sha256: str, width: int, extension: str) -> Path:
+        """Derivatives sit next to their source so GC can collect them together"""
+        return self.cas_dir / sha256[:2] / f"{sha256}_w{width}.{extension}"
+    
+    def derivative_url(self, sha256: str, width: int, extension: str) -> str:
+        return f"/assets/{sha256}_w{width}.{extension}"
+    
+    def source_path(self, sha256: str) -> Optional[Path]:
+        """Stored original for a content hash, whatever its extension"""
+        for candidate in (self.cas_dir / sha256[:2]).glob(f"{sha256}.*"):
+            if CONTENT_ADDRESSED_NAME.match(candidate.name):
+                return candidate
+        return None
+    
+    def ingest(self, blob: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Move a blob file into the store and return its reference with the
+        store path and URL. If the same bytes are already stored, the
+        incoming file is dropped.
+        """
+        source = Path(blob["path"])
+        extension = source.suffix.lstrip(".").lower() or "png"
+        sha256 = blob.get("sha256") or self._hash_file(source)
+        target = self.path_for(sha256, extension)
+        
+        if source.resolve() != target.resolve():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if target.exists():
+                source.unlink(missing_ok=True)
+                # Fresh mtime restarts the GC grace period for a re-used blob
+                os.utime(target)
+            else:
+                os.replace(source, target)
+                
+        return {
+            **blob,
+            "path": str(target),
+            "sha256": sha256,
+            "size": target.stat().st_size,
+            "mime": blob.get("mime") or MIME_TYPES.get(extension, "application/octet-stream"),
+            "url": self.url_for(sha256, extension)
+        }
+    
+    def put_bytes(self, data: bytes, extension: str = "png") -> Dict[str, Any]:
+        sha256 = hashlib.sha256(data).hexdigest()
+        target = self.path_for(sha256, extension)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, target)
+        else:
+            os.utime(target)
+            
+        return {
+            "path": str(target),
+            "size": len(data),
+            "sha256": sha256,
+            "mime": MIME_TYPES.get(extension, "application/octet-stream"),
+            "url": self.url_for(sha256, extension)
+        }
+    
+    def _hash_file(self, path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def resolve_name(self, name: str) -> Optional[Path]:
+        """File for a name under /assets: a content hash, or a legacy file in the assets root"""
+        name = Path(name).name
+        match = CONTENT_ADDRESSED_NAME.match(name)
+        derivative = DERIVATIVE_NAME.match(name)
+        if match:
+            candidate = self.path_for(match.group(1), match.group(2))
+        elif derivative:
+            candidate = self.derivative_path(derivative.group(1), int(derivative.group(2)), derivative.group(3))
+        else:
+            candidate = self.root / name
+        return candidate if candidate.is_file() else None
+    
+    def resolve(self, url: Optional[str]) -> Optional[Path]:
+        """Map an asset url (http://host/assets/<name>, /assets/<name>) or a plain file path to a file"""
+        if not url:
+            return None
+        path = urlparse(url).path if url.startswith(("http://", "https://")) else url
+        if path.startswith("/assets/"):
+            return self.resolve_name(unquote(path[len("/assets/"):]))
+        candidate = Path(path)
+        return candidate if candidate.is_file() else None
+    
+    @staticmethod
+    def is_immutable(name: str) -> bool:
+        return CONTENT_ADDRESSED_NAME.match(name) is not None or DERIVATIVE_NAME.match(name) is not None
+    
+    def set_refs(self, owner: str, manifest: Dict[str, Any]):
+        """Replace the hashes referenced by one owner (a campaign) with those in its manifest"""
+        hashes = blob_hashes(manifest)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM refs WHERE owner = ?", (owner,))
+            self._conn.executemany(
+                "INSERT INTO refs (owner, sha256) VALUES (?, ?)", [(owner, sha256) for sha256 in hashes]
+            )
+    
+    def drop_refs(self, owner: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM refs WHERE owner = ?", (owner,))
+    
+    def rebuild_refs(self, manifests: Iterable[Dict[str, Any]]) -> int:
+        """Re-register the references of every stored manifest; returns the number registered"""
+        registered = 0
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM refs")
+            for manifest in manifests:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO refs (owner, sha256) VALUES (?, ?)",
+                    [(manifest["campaign_id"], sha256) for sha256 in blob_hashes(manifest)]
+                )
+                registered += 1
+        return registered
+    
+    def refcount(self, sha256: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM refs WHERE sha256 = ?", (sha256,)).fetchone()[0]
+    
+    def gc(self, grace_seconds: Optional[float] = None, dry_run: bool = False) -> Tuple[int, int]:
+        """
+        Delete unreferenced blobs (and their derivatives) older than the
+        grace period; returns (files, bytes) reclaimed
+        """
+        grace_seconds = ASSET_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+        cutoff = time.time() - grace_seconds
+        with self._lock:
+            referenced = {row[0] for row in self._conn.execute("SELECT DISTINCT sha256 FROM refs")}
+            
+        files = reclaimed = 0
+        for blob_path in self.cas_dir.glob("*/*"):
+            match = CONTENT_ADDRESSED_NAME.match(blob_path.name) or DERIVATIVE_NAME.match(blob_path.name)
+            if not match or match.group(1) in referenced:
+                continue
+            stat = blob_path.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                blob_path.unlink(missing_ok=True)
+            files += 1
+            reclaimed += stat.st_size
+        return files, reclaimed
+
+
+def relative_asset_url(url: Optional[str]) -> Optional[str]:
+    """http://host:port/assets/<name> -> /assets/<name>; anything else unchanged"""
+    if url and url.startswith(("http://", "https://")):
+        path = urlparse(url).path
+        if path.startswith("/assets/"):
+            return path
+    return url
+
+
+def migrate_manifest_assets(manifest: Dict[str, Any], asset_store: AssetStore) -> bool:
+    """
+    Move a manifest's legacy per-name image files into the store and make
+    absolute asset URLs origin-relative; returns True if anything changed
+    """
+    changed = False
+    for asset in manifest.get("asset_plan", []):
+        for key in ("url", "thumbnail_url"):
+            if asset.get(key) and relative_asset_url(asset[key]) != asset[key]:
+                asset[key] = relative_asset_url(asset[key])
+                changed = True
+        for variant in asset.get("variants") or []:
+            if variant.get("url") and relative_asset_url(variant["url"]) != variant["url"]:
+                variant["url"] = relative_asset_url(variant["url"])
+                changed = True
+                
+        url = asset.get("url")
+        if not url or asset_store.is_immutable(Path(urlparse(url).path).name):
+            continue
+        legacy_path = asset_store.resolve(url)
+        if legacy_path is None:
+            continue
+            
+        blob = asset_store.ingest({"path": str(legacy_path)})
+        asset["url"] = blob["url"]
+        for tool_call in asset.get("tool_calls", []):
+            result = tool_call.get("result")
+            if isinstance(result, dict) and isinstance(result.get("blob"), dict):
+                result["blob"] = {**result["blob"], **blob}
+        changed = True
+    return changed
+
+
+if __name__ == "__main__":
+    # Usage: python -m services.asset_store gc [storage_dir] [--dry-run] | migrate [storage_dir]
+    from services.storage import create_storage
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    args = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+    storage_dir = args[0] if args else "./storage"
+    asset_store = AssetStore()
+    
+    if command == "gc":
+        # Manifests are the source of truth; re-read them so a lost or stale refs db can't cause deletions
+        asset_store.rebuild_refs(create_storage(storage_dir).iter_campaigns())
+        dry_run = "--dry-run" in sys.argv
+        files, reclaimed = asset_store.gc(dry_run=dry_run)
+        print(f"{'Would delete' if dry_run else 'Deleted'} {files} unreferenced blobs ({reclaimed} bytes)")
+    elif command == "migrate":
+        storage = create_storage(storage_dir)
+        migrated = 0
+        for manifest in storage.iter_campaigns():
+            if migrate_manifest_assets(manifest, asset_store):
+                storage.save_campaign(manifest)
+                migrated += 1
+            asset_store.set_refs(manifest["campaign_id"], manifest)
+        print(f"Migrated assets of {migrated} campaigns to the content-addressed store and relative URLs")
+    else:
+        print("Usage: python -m services.asset_store gc [storage_dir] [--dry-run] | migrate [storage_dir]")
+        sys.exit(1)
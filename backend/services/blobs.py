@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import base64
+from pathlib import Path
+from typing import Dict, Any, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # asset_store imports MIME_TYPES from here
+    from services.asset_store import AssetStore
+
+MIME_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+# Marker written once every manifest in a directory has been migrated
+MIGRATION_MARKER = ".blobs_migrated"
+
+
+def migrate_manifest(manifest: Dict[str, Any], asset_store: "AssetStore") -> bool:
+    """
+    Move inline base64 payloads from a stored manifest into the content-addressed
+    asset store; returns True if anything changed
+    """
+    changed = False
+    
+    for asset in manifest.get("asset_plan", []):
+        for tool_call in asset.get("tool_calls", []):
+            result = tool_call.get("result")
+            if not isinstance(result, dict) or not result.get("image_data"):
+                continue
+            
+            existing = asset_store.resolve(asset.get("url"))
+            if existing is not None:
+                # The orchestrator already saved these bytes as the asset file
+                blob = asset_store.ingest({"path": str(existing)})
+            else:
+                blob = asset_store.put_bytes(base64.b64decode(result["image_data"]), result.get("format", "png"))
+            
+            offloaded = {key: value for key, value in result.items() if key != "image_data"}
+            offloaded["blob"] = blob
+            tool_call["result"] = offloaded
+            # Store URLs are origin-relative /assets/<sha256>.<ext>
+            asset["url"] = blob["url"]
+            changed = True
+    
+    return changed
+
+
+def migrate_campaigns_dir(campaigns_dir: str, asset_store: "AssetStore") -> Tuple[int, int]:
+    """
+    Migrate every campaign manifest in place.
+    Returns (files scanned, files rewritten); skipped entirely once the marker exists.
+    """
+    marker = Path(campaigns_dir) / MIGRATION_MARKER
+    if marker.exists():
+        return 0, 0
+    
+    scanned = rewritten = 0
+    for campaign_file in Path(campaigns_dir).glob("*.json"):
+        scanned += 1
+        with open(campaign_file, "r") as f:
+            manifest = json.load(f)
+        
+        if migrate_manifest(manifest, asset_store):
+            tmp_path = campaign_file.with_suffix(".json.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_path, campaign_file)
+            rewritten += 1
+    
+    marker.touch()
+    return scanned, rewritten
+
+
+if __name__ == "__main__":
+    # Usage: python -m services.blobs [campaigns_dir] [assets_dir]
+    from services.asset_store import AssetStore
+    
+    campaigns_dir = sys.argv[1] if len(sys.argv) > 1 else "./storage/campaigns"
+    assets_dir = sys.argv[2] if len(sys.argv) > 2 else "./storage/assets"
+    (Path(campaigns_dir) / MIGRATION_MARKER).unlink(missing_ok=True)
+    scanned, rewritten = migrate_campaigns_dir(campaigns_dir, AssetStore(assets_dir))
+    print(f"Scanned {scanned} manifests, migrated {rewritten}")
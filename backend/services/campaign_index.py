@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import base64
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+# Columns a listing can project; the full manifest is never read for a list
+SUMMARY_FIELDS = ("campaign_id", "brief", "created_at", "status", "asset_count")
+
+
+def encode_cursor(created_at: str, campaign_id: str) -> str:
+    """Opaque keyset cursor: the sort key of the last row returned"""
+    return base64.urlsafe_b64encode(json.dumps([created_at, campaign_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, campaign_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(created_at), str(campaign_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class CampaignIndex:
+    """
+    Persistent index over stored campaigns: a summary row per campaign and
+    asset_id -> campaign_id ownership, so listing and asset lookups never
+    open manifests. Kept current by upsert() on every write; rebuild()
+    recreates it from the manifests on disk.
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        path = path or os.getenv("CAMPAIGN_INDEX_PATH", "./storage/campaign_index.sqlite3")
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS campaigns (
+                campaign_id TEXT PRIMARY KEY,
+                brief TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                status TEXT NOT NULL,
+                asset_count INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS campaign_assets (
+                asset_id TEXT NOT NULL,
+                campaign_id TEXT NOT NULL,
+                PRIMARY KEY (asset_id, campaign_id)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS campaigns_created_at ON campaigns (created_at, campaign_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS campaigns_status_created_at ON campaigns (status, created_at, campaign_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS campaign_assets_campaign ON campaign_assets (campaign_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+    
+    def upsert(self, manifest: Dict[str, Any]):
+        """Index (or re-index) one campaign manifest"""
+        with self._lock:
+            self._upsert(manifest)
+            self._conn.commit()
+    
+    def _upsert(self, manifest: Dict[str, Any]):
+        campaign_id = manifest["campaign_id"]
+        asset_ids = list(dict.fromkeys(asset["id"] for asset in manifest.get("asset_plan", [])))
+        
+        self._conn.execute(
+            "INSERT OR REPLACE INTO campaigns (campaign_id, brief, created_at, status, asset_count) VALUES (?, ?, ?, ?, ?)",
+            (campaign_id, manifest.get("brief", ""), manifest.get("created_at", ""), manifest.get("status", "draft"), len(asset_ids))
+        )
+        self._conn.execute("DELETE FROM campaign_assets WHERE campaign_id = ?", (campaign_id,))
+        self._conn.executemany(
+            "INSERT INTO campaign_assets (asset_id, campaign_id) VALUES (?, ?)",
+            [(asset_id, campaign_id) for asset_id in asset_ids]
+        )
+    
+    def remove(self, campaign_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM campaigns WHERE campaign_id = ?", (campaign_id,))
+            self._conn.execute("DELETE FROM campaign_assets WHERE campaign_id = ?", (campaign_id,))
+            self._conn.commit()
+    
+    def find_campaign(self, asset_id: str) -> Optional[str]:
+        """
+        Campaign that owns an asset. Asset ids are only unique within a
+        campaign, so the most recently created owner wins.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT c.campaign_id FROM campaign_assets a
+                JOIN campaigns c ON c.campaign_id = a.campaign_id
+                WHERE a.asset_id = ?
+                ORDER BY c.created_at DESC LIMIT 1
+                """,
+                (asset_id,)
+            ).fetchone()
+        return row["campaign_id"] if row else None
+    
+    def has_asset(self, campaign_id: str, asset_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM campaign_assets WHERE campaign_id = ? AND asset_id = ?", (campaign_id, asset_id)
+            ).fetchone()
+        return row is not None
+    
+    def page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        order: str = "desc",
+        status: Optional[str] = None,
+        brief_contains: Optional[str] = None,
+        fields: Iterable[str] = SUMMARY_FIELDS
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of campaign summaries sorted by created_at, plus the cursor
+        for the next page (None on the last page). Keyset pagination, so
+        cost stays flat however deep the page is.
+        """
+        fields = list(dict.fromkeys(fields))
+        unknown = [field for field in fields if field not in SUMMARY_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+        
+        clauses, params = self._filters(status, brief_contains)
+        if cursor:
+            created_at, campaign_id = decode_cursor(cursor)
+            comparison = "<" if order == "desc" else ">"
+            clauses.append(f"(created_at {comparison} ? OR (created_at = ? AND campaign_id {comparison} ?))")
+            params.extend([created_at, created_at, campaign_id])
+        
+        # The sort key is always selected so the next cursor can be built
+        columns = list(dict.fromkeys(fields + ["created_at", "campaign_id"]))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        direction = "DESC" if order == "desc" else "ASC"
+        
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(columns)} FROM campaigns {where} "
+                f"ORDER BY created_at {direction}, campaign_id {direction} LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["campaign_id"])
+        
+        return [{field: row[field] for field in fields} for row in rows], next_cursor
+    
+    def _filters(self, status: Optional[str], brief_contains: Optional[str]) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if brief_contains:
+            escaped = brief_contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("brief LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        return clauses, params
+    
+    def count(self, status: Optional[str] = None, brief_contains: Optional[str] = None) -> int:
+        """Number of campaigns matching the same filters as page()"""
+        clauses, params = self._filters(status, brief_contains)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM campaigns {where}", params).fetchone()[0]
+    
+    def rebuild(self, manifests: Iterable[Dict[str, Any]], stored_count: Optional[int] = None) -> int:
+        """
+        Drop the index and re-index every manifest from storage; returns the
+        number indexed. stored_count is how many campaigns storage holds, so
+        manifests that couldn't be indexed are remembered as skipped.
+        """
+        indexed = 0
+        with self._lock:
+            self._conn.execute("DELETE FROM campaigns")
+            self._conn.execute("DELETE FROM campaign_assets")
+            for manifest in manifests:
+                try:
+                    self._upsert(manifest)
+                    indexed += 1
+                except KeyError as e:
+                    print(f"[WARN] Skipping manifest without {e}")
+            skipped = max(0, stored_count - indexed) if stored_count is not None else 0
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('skipped', ?)", (str(skipped),))
+            self._conn.commit()
+        return indexed
+    
+    def skipped(self) -> int:
+        """Stored campaigns the last rebuild couldn't index (unreadable or incomplete manifests)"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'skipped'").fetchone()
+        return int(row[0]) if row else 0
+    
+    def in_sync(self, stored_count: int) -> bool:
+        """Whether the index accounts for every stored campaign, indexed or known to be skipped"""
+        return len(self) + self.skipped() == stored_count
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM campaigns").fetchone()[0]
+
+
+if __name__ == "__main__":
+    # Usage: python -m services.campaign_index [storage_dir]
+    from services.storage import create_storage
+    
+    storage = create_storage(sys.argv[1] if len(sys.argv) > 1 else "./storage")
+    indexed = CampaignIndex().rebuild(storage.iter_campaigns(), storage.count_campaigns())
+    print(f"Indexed {indexed} campaigns")
@@ -0,0 +1,135 @@
+import os
+import asyncio
+import threading
+from pathlib import Path
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from PIL import Image, features
+
+from services.asset_store import AssetStore, DERIVATIVE_NAME
+
+# Widths produced for every stored image; the smallest doubles as the thumbnail
+DERIVATIVE_WIDTHS = sorted(int(width) for width in os.getenv("DERIVATIVE_WIDTHS", "256,512").split(",") if width.strip())
+
+# AVIF needs a Pillow built with libavif, so formats the build can't encode are dropped
+DERIVATIVE_FORMATS = [
+    fmt.strip() for fmt in os.getenv("DERIVATIVE_FORMATS", "webp,avif").split(",")
+    if fmt.strip() and features.check(fmt.strip())
+]
+
+DERIVATIVE_WORKERS = int(os.getenv("DERIVATIVE_WORKERS", "2"))
+
+ENCODER_OPTIONS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "avif": {"format": "AVIF", "quality": 60}
+}
+
+IMAGE_MIME_PREFIX = "image/"
+
+
+def render_derivative(source_path: str, target_path: str, width: int, fmt: str) -> str:
+    """Resize and re-encode one image (runs in a worker process)"""
+    with Image.open(source_path) as image:
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+            
+        tmp_path = f"{target_path}.{os.getpid()}.tmp"
+        image.save(tmp_path, **ENCODER_OPTIONS.get(fmt, {"format": fmt.upper()}))
+        os.replace(tmp_path, target_path)
+    return target_path
+
+
+class DerivativePipeline:
+    """
+    Thumbnails and WebP/AVIF variants of stored images. Rendering happens in
+    a process pool: eagerly when an image is stored, or on first request
+    for a derivative that is missing.
+    """
+    
+    def __init__(self, asset_store: AssetStore, widths: Optional[List[int]] = None, formats: Optional[List[str]] = None):
+        self.asset_store = asset_store
+        self.widths = widths or DERIVATIVE_WIDTHS
+        self.formats = formats if formats is not None else DERIVATIVE_FORMATS
+        self._pool = None
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+    
+    def describe(self, blob: Dict[str, Any]) -> Dict[str, Any]:
+        """thumbnail_url and variant URLs for a stored blob; empty for non-images"""
+        if not self.formats or not blob.get("mime", "").startswith(IMAGE_MIME_PREFIX):
+            return {}
+            
+        sha256 = blob["sha256"]
+        return {
+            "thumbnail_url": self.asset_store.derivative_url(sha256, self.widths[0], self.formats[0]),
+            "variants": [
+                {"width": width, "format": fmt, "url": self.asset_store.derivative_url(sha256, width, fmt)}
+                for fmt in self.formats
+                for width in self.widths
+            ]
+        }
+    
+    def schedule(self, blob: Dict[str, Any]):
+        """Queue every missing derivative of a blob without waiting for it"""
+        if not self.formats or not blob.get("mime", "").startswith(IMAGE_MIME_PREFIX):
+            return
+        for fmt in self.formats:
+            for width in self.widths:
+                self._submit(blob["sha256"], Path(blob["path"]), width, fmt)
+    
+    async def ensure(self, name: str) -> Optional[Path]:
+        """File for a derivative name, rendering it first if it hasn't been yet"""
+        match = DERIVATIVE_NAME.match(name)
+        # Only configured sizes, so arbitrary widths can't be used to burn CPU
+        if not match or int(match.group(2)) not in self.widths or match.group(3) not in self.formats:
+            return None
+            
+        sha256, width, fmt = match.group(1), int(match.group(2)), match.group(3)
+        target = self.asset_store.derivative_path(sha256, width, fmt)
+        if target.is_file():
+            return target
+            
+        source = self.asset_store.source_path(sha256)
+        if source is None:
+            return None
+            
+        try:
+            await asyncio.wrap_future(self._submit(sha256, source, width, fmt))
+        except Exception as e:
+            print(f"[WARN] Could not render {name}: {e}")
+            return None
+        return target if target.is_file() else None
+    
+    def _submit(self, sha256: str, source: Path, width: int, fmt: str) -> Future:
+        target = self.asset_store.derivative_path(sha256, width, fmt)
+        with self._lock:
+            # One render per derivative, however many requests ask for it meanwhile
+            future = self._in_flight.get(target.name)
+            if future is not None:
+                return future
+            if target.is_file():
+                future = Future()
+                future.set_result(str(target))
+                return future
+                
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=DERIVATIVE_WORKERS)
+            future = self._pool.submit(render_derivative, str(source), str(target), width, fmt)
+            self._in_flight[target.name] = future
+            
+        future.add_done_callback(lambda _: self._forget(target.name))
+        return future
+    
+    def _forget(self, name: str):
+        with self._lock:
+            self._in_flight.pop(name, None)
+    
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional
+
+from tools.response_cache import make_cache_key
+from services.asset_store import AssetStore
+
+# Already-compressed formats are STORED; deflating them only burns CPU
+STORED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".avif", ".mp4", ".zip"}
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def export_cache_path(exports_dir: str, manifest: Dict[str, Any]) -> Path:
+    """Cached archive location; the manifest hash changes whenever any asset does"""
+    return Path(exports_dir) / f"{manifest['campaign_id']}-{make_cache_key(manifest)[:16]}.zip"
+
+
+class _ChunkBuffer:
+    """Write-only sink for ZipFile that hands written bytes back out as chunks"""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_campaign_zip(manifest: Dict[str, Any], asset_store: AssetStore, cache_path: Optional[Path] = None) -> Iterator[bytes]:
+    """
+    Stream a campaign export as ZIP chunks, reading asset files piecewise so
+    memory stays flat. With cache_path, the archive is also written there
+    (via a temp file) for later requests to serve directly.
+    """
+    buffer = _ChunkBuffer()
+    cache_file = None
+    tmp_path = None
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.{id(buffer)}.tmp")
+        cache_file = open(tmp_path, "wb")
+    
+    def drain() -> bytes:
+        data = buffer.take()
+        if cache_file is not None and data:
+            cache_file.write(data)
+        return data
+        
+    try:
+        with zipfile.ZipFile(buffer, "w") as zip_file:
+            # Add manifest
+            zip_file.writestr(
+                zipfile.ZipInfo("campaign_manifest.json", time.localtime()[:6]),
+                json.dumps(manifest, indent=2),
+                compress_type=zipfile.ZIP_DEFLATED
+            )
+            yield drain()
+            
+            # Add assets
+            written = set()
+            for asset in manifest.get("asset_plan", []):
+                asset_path = asset_store.resolve(asset.get("url"))
+                # Stored files are named by content hash; the archive uses the asset id
+                entry_name = f"assets/{asset['id']}{asset_path.suffix}" if asset_path else None
+                if entry_name and entry_name not in written:
+                    written.add(entry_name)
+                    info = zipfile.ZipInfo.from_file(asset_path, entry_name)
+                    info.compress_type = (
+                        zipfile.ZIP_STORED if asset_path.suffix.lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                    )
+                    with open(asset_path, "rb") as src, zip_file.open(info, "w") as dest:
+                        while True:
+                            chunk = src.read(READ_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            dest.write(chunk)
+                            data = drain()
+                            if data:
+                                yield data
+                    yield drain()
+                    
+                if asset.get("content"):
+                    zip_file.writestr(
+                        zipfile.ZipInfo(f"assets/{asset['id']}.txt", time.localtime()[:6]),
+                        asset["content"],
+                        compress_type=zipfile.ZIP_DEFLATED
+                    )
+                    yield drain()
+                    
+        # Central directory
+        yield drain()
+        
+        if cache_file is not None:
+            cache_file.close()
+            os.replace(tmp_path, cache_path)
+            # Older exports of this campaign are superseded
+            for stale in cache_path.parent.glob(f"{manifest['campaign_id']}-*.zip"):
+                if stale != cache_path:
+                    stale.unlink(missing_ok=True)
+    finally:
+        # Client disconnected or a read failed: never leave a partial archive behind
+        if cache_file is not None and not cache_file.closed:
+            cache_file.close()
+        if tmp_path is not None and tmp_path.exists():
+            tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,115 @@
+import os
+import gzip
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Responses smaller than this aren't worth compressing
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+# Images are already compressed and SSE must not be buffered, so only JSON is compressed
+COMPRESSIBLE_TYPES = ("application/json",)
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best encoding the client accepts: brotli if installed, else gzip"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+        
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compress JSON responses above a size threshold with brotli or gzip,
+    per the request's Accept-Encoding. Other responses pass through
+    untouched and unbuffered.
+    """
+    
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+            
+        request_headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+            
+        start_message = None
+        body_parts = []
+        
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in message.get("headers", [])}
+                media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+                if media_type in COMPRESSIBLE_TYPES and "content-encoding" not in headers:
+                    start_message = message
+                    return
+                await send(message)
+                return
+                
+            if start_message is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+                
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+                
+            body = b"".join(body_parts)
+            headers = [(key, value) for key, value in start_message.get("headers", []) if key.lower() != b"content-length"]
+            headers.append((b"vary", b"Accept-Encoding"))
+            if len(body) >= self.minimum_size:
+                body = brotli.compress(body, quality=BROTLI_QUALITY) if encoding == "br" else gzip.compress(body, GZIP_LEVEL)
+                headers = [(key, value) for key, value in headers if key.lower() != b"etag"] + [
+                    (b"content-encoding", encoding.encode("latin-1"))
+                ] + [
+                    # The encoded bytes differ from the identity ones, so a strong validator becomes weak
+                    (b"etag", (value if value.startswith(b"W/") else b"W/" + value))
+                    for key, value in start_message.get("headers", []) if key.lower() == b"etag"
+                ]
+            headers.append((b"content-length", str(len(body)).encode("latin-1")))
+            
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            
+        await self.app(scope, receive, send_compressed)
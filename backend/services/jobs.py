@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+# Job states; queued and running jobs count against the queue bound
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# A running job whose worker hasn't checked in for this long is assumed dead and requeued
+STALE_AFTER_SECONDS = 120
+
+# A job whose worker has died this many times is failed instead of being requeued again
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+class QueueFullError(Exception):
+    """Raised when the queue is at capacity; callers should retry later"""
+
+
+class JobStore:
+    """SQLite-backed job table shared by every worker process on the host"""
+    
+    def __init__(self, path: Optional[str] = None):
+        path = path or os.getenv("JOBS_DB_PATH", "./storage/jobs.sqlite3")
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        
+        # Autocommit mode so claims can use explicit BEGIN IMMEDIATE transactions
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._lock = threading.Lock()
+    
+    def submit(self, kind: str, payload: Dict[str, Any], max_pending: int) -> Dict[str, Any]:
+        """Insert a queued job, or raise QueueFullError if max_pending jobs are already waiting or running"""
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                pending = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+                ).fetchone()[0]
+                if pending >= max_pending:
+                    raise QueueFullError(f"Job queue is full ({pending} pending)")
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, kind, QUEUED, json.dumps(payload), time.time())
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(job_id)
+    
+    def claim(self, max_attempts: int = JOB_MAX_ATTEMPTS) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest queued job (or a running job whose worker died).
+        Blocking; async callers run it in a thread.
+        """
+        now = time.time()
+        with self._lock:
+            # Plain read first, so idle workers don't take the write lock on every poll
+            candidate = self._conn.execute(
+                "SELECT 1 FROM jobs WHERE status = ? OR (status = ? AND heartbeat_at < ?) LIMIT 1",
+                (QUEUED, RUNNING, now - STALE_AFTER_SECONDS)
+            ).fetchone()
+            if candidate is None:
+                return None
+                
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Dead workers' jobs that were asked to stop are simply closed out
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ? WHERE status = ? AND cancel_requested = 1 AND heartbeat_at < ?",
+                    (CANCELLED, now, RUNNING, now - STALE_AFTER_SECONDS)
+                )
+                # A job that keeps taking its worker down with it is given up on
+                self._conn.execute(
+                    """
+                    UPDATE jobs SET status = ?, finished_at = ?,
+                        error = 'Worker stopped responding on each of ' || attempts || ' attempts'
+                    WHERE status = ? AND heartbeat_at < ? AND attempts >= ?
+                    """,
+                    (FAILED, now, RUNNING, now - STALE_AFTER_SECONDS, max_attempts)
+                )
+                row = self._conn.execute(
+                    """
+                    SELECT id FROM jobs
+                    WHERE cancel_requested = 0
+                      AND (status = ? OR (status = ? AND heartbeat_at < ?))
+                    ORDER BY created_at LIMIT 1
+                    """,
+                    (QUEUED, RUNNING, now - STALE_AFTER_SECONDS)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    """
+                    UPDATE jobs SET status = ?, attempts = attempts + 1,
+                        started_at = ?, heartbeat_at = ?
+                    WHERE id = ?
+                    """,
+                    (RUNNING, now, now, row["id"])
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"])
+    
+    def heartbeat(self, job_id: str, progress: Optional[Dict[str, Any]] = None) -> bool:
+        """Record liveness (and progress); returns True if cancellation was requested. Blocking"""
+        with self._lock:
+            if progress is None:
+                self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET heartbeat_at = ?, progress = ? WHERE id = ?",
+                    (time.time(), json.dumps(progress), job_id)
+                )
+            row = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+    
+    def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+    
+    def requeue(self, job_id: str):
+        """Hand a running job back to the queue, e.g. when its worker shuts down"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL WHERE id = ? AND status = ?",
+                (QUEUED, job_id, RUNNING)
+            )
+    
+    def request_cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job immediately; flag a running one for its worker to stop"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?",
+                (job_id, RUNNING)
+            )
+        return self.get(job_id)
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for field in ("payload", "progress", "result"):
+            job[field] = json.loads(job[field]) if job[field] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+    
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+class JobQueue:
+    """
+    Pool of asyncio workers pulling jobs from a JobStore.
+    Handlers are registered per job kind as `async handler(payload, report)`;
+    they call report(progress) as they go and return the job's result dict.
+    """
+    
+    def __init__(
+        self,
+        store: JobStore,
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        poll_interval: float = 1.0,
+        max_poll_interval: float = 10.0
+    ):
+        self.store = store
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "2"))
+        self.max_pending = max_pending or int(os.getenv("JOB_QUEUE_MAX_PENDING", "50"))
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_attempts = JOB_MAX_ATTEMPTS
+        self.handlers: Dict[str, Callable[..., Awaitable[Dict[str, Any]]]] = {}
+        self._tasks = []
+        self._wakeup: Optional[asyncio.Event] = None
+    
+    def register(self, kind: str, handler: Callable[..., Awaitable[Dict[str, Any]]]):
+        self.handlers[kind] = handler
+    
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a job; the insert can wait on another process's write lock, so it runs in a thread"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = await asyncio.to_thread(self.store.submit, kind, payload, self.max_pending)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+    
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.request_cancel(job_id)
+    
+    def start(self):
+        """Start the worker tasks on the running event loop"""
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+    
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def _worker(self, index: int):
+        idle_wait = self.poll_interval
+        while True:
+            # SQLite calls can wait on another process's write lock, so keep them off the event loop
+            job = await asyncio.to_thread(self.store.claim, self.max_attempts)
+            if job is None:
+                # Woken early by local submits; other processes' submits are picked up by
+                # polling, which backs off while the queue stays empty
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=idle_wait)
+                    idle_wait = self.poll_interval
+                except asyncio.TimeoutError:
+                    idle_wait = min(idle_wait * 2, self.max_poll_interval)
+                self._wakeup.clear()
+                continue
+                
+            idle_wait = self.poll_interval
+            print(f"[INFO] Worker {index} running job {job['id']} ({job['kind']})")
+            await self._run(job)
+    
+    async def _run(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        cancel_requested = False
+        progress = None
+        
+        def report(latest: Dict[str, Any]):
+            # Written with the next heartbeat rather than blocking the handler on SQLite
+            nonlocal progress
+            progress = latest
+            
+        task = asyncio.create_task(self.handlers[job["kind"]](job["payload"], report))
+        try:
+            # Heartbeat while the handler runs, and stop it once cancellation is requested
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.poll_interval)
+                if not task.done():
+                    reported, progress = progress, None
+                    cancel_requested = await asyncio.to_thread(self.store.heartbeat, job_id, reported) or cancel_requested
+                    if cancel_requested:
+                        task.cancel()
+                        await asyncio.gather(task, return_exceptions=True)
+                        
+            if task.cancelled():
+                await asyncio.to_thread(self.store.finish, job_id, CANCELLED, None, "Cancelled")
+            elif task.exception() is not None:
+                await asyncio.to_thread(self.store.finish, job_id, FAILED, None, str(task.exception()))
+            else:
+                await asyncio.to_thread(self.store.finish, job_id, SUCCEEDED, task.result())
+        except asyncio.CancelledError:
+            # Worker shutdown: another worker (or the next start) picks the job up again
+            task.cancel()
+            # Shielded so the requeue still lands while the worker is being torn down
+            await asyncio.shield(asyncio.to_thread(self.store.requeue, job_id))
+            raise
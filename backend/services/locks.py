@@ -0,0 +1,76 @@
+import os
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Lock files older than this are assumed to belong to a crashed process (fallback locks only)
+STALE_LOCK_SECONDS = 60
+
+
+class FileLock:
+    """
+    Lock on a path, held across processes (e.g. several uvicorn workers).
+    Exclusive by default; shared=True lets readers hold it together while
+    still excluding writers. Uses flock where available; elsewhere falls
+    back to an O_EXCL lock file (always exclusive) that is broken once it
+    goes stale.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0, shared: bool = False):
+        self.path = path
+        self.timeout = timeout
+        self.shared = shared
+        self._fd = None
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        if fcntl is not None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            while True:
+                try:
+                    fcntl.flock(self._fd, (fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+                    return
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        os.close(self._fd)
+                        self._fd = None
+                        raise TimeoutError(f"Timed out waiting for lock {self.path}")
+                    time.sleep(0.01)
+
+        while True:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+                return
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > STALE_LOCK_SECONDS:
+                        os.remove(self.path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out waiting for lock {self.path}")
+                time.sleep(0.01)
+
+    def release(self):
+        if self._fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        else:
+            os.close(self._fd)
+            os.remove(self.path)
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,478 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterator, List
+
+from services.locks import FileLock
+
+# Change-log entries a campaign may accumulate before it is folded back into the manifest
+CHANGE_LOG_COMPACT_EVERY = int(os.getenv("CHANGE_LOG_COMPACT_EVERY", "20"))
+
+
+def user_filename(email: str) -> str:
+    """File name used for a user in the JSON layout"""
+    return f"{email.replace('@', '_at_').replace('.', '_')}.json"
+
+
+def atomic_write_json(path: Path, data: Dict[str, Any]):
+    """Write to a temp file in the same directory, fsync, then rename over the target"""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def bump_past(asset: Dict[str, Any], stored_version: Optional[int]) -> Dict[str, Any]:
+    """
+    Keep asset versions monotonic: two regenerations started from the same
+    snapshot both arrive as version N+1, so the later one becomes N+2.
+    """
+    if stored_version is not None and asset.get("version") is not None and asset["version"] <= stored_version:
+        return {**asset, "version": stored_version + 1}
+    return asset
+
+
+def metadata_changes(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadata keys a regeneration added or changed, so only those are written back"""
+    return {key: value for key, value in after.items() if before.get(key) != value}
+
+
+def apply_change(manifest: Dict[str, Any], change: Dict[str, Any]):
+    """Apply one change-log entry (replaced assets, top-level fields, metadata keys) to a manifest"""
+    asset_plan = manifest.setdefault("asset_plan", [])
+    # Entries from before batch updates carry a single "asset"
+    assets = change.get("assets") or ([change["asset"]] if change.get("asset") else [])
+    for asset in assets:
+        for i, existing in enumerate(asset_plan):
+            if existing["id"] == asset["id"]:
+                asset_plan[i] = asset
+                break
+        else:
+            asset_plan.append(asset)
+    manifest.update(change.get("fields") or {})
+    if change.get("metadata"):
+        manifest.setdefault("metadata", {}).update(change["metadata"])
+
+
+class JSONDirectoryStorage:
+    """
+    The original layout: one JSON file per campaign and per user under the
+    storage root. Manifests are replaced atomically under a per-campaign
+    file lock; single-asset updates are appended to <campaign_id>.changes.jsonl
+    and folded back into the manifest every CHANGE_LOG_COMPACT_EVERY entries.
+    """
+    
+    def __init__(self, root: str):
+        self.campaigns_dir = Path(root) / "campaigns"
+        self.users_dir = Path(root) / "users"
+        self.campaigns_dir.mkdir(parents=True, exist_ok=True)
+        self.users_dir.mkdir(parents=True, exist_ok=True)
+    
+    def lock(self, campaign_id: str, shared: bool = False) -> FileLock:
+        """Cross-process lock for one campaign's manifest and change log; readers share it"""
+        return FileLock(str(self.campaigns_dir / ".locks" / f"{campaign_id}.lock"), shared=shared)
+    
+    def _log_path(self, campaign_id: str) -> Path:
+        return self.campaigns_dir / f"{campaign_id}.changes.jsonl"
+    
+    def _read_log(self, campaign_id: str) -> List[Dict[str, Any]]:
+        log_path = self._log_path(campaign_id)
+        if not log_path.exists():
+            return []
+        changes = []
+        with open(log_path, "r") as f:
+            for line in f:
+                try:
+                    changes.append(json.loads(line))
+                except ValueError:
+                    # Torn final line from a crash mid-append; the entry never committed
+                    break
+        return changes
+    
+    def get_campaign(self, campaign_id: str) -> Optional[Dict[str, Any]]:
+        campaign_file = self.campaigns_dir / f"{campaign_id}.json"
+        if not campaign_file.exists():
+            return None
+        # Locked so a compaction can't land between reading the manifest and its log.
+        # Shared, so readers only wait for writers, not for each other
+        with self.lock(campaign_id, shared=True):
+            return self._load(campaign_id)
+    
+    def _load(self, campaign_id: str) -> Optional[Dict[str, Any]]:
+        """Manifest with its change log replayed; caller holds the campaign lock"""
+        campaign_file = self.campaigns_dir / f"{campaign_id}.json"
+        if not campaign_file.exists():
+            return None
+        with open(campaign_file, "r") as f:
+            manifest = json.load(f)
+        for change in self._read_log(campaign_id):
+            apply_change(manifest, change)
+        return manifest
+    
+    def save_campaign(self, manifest: Dict[str, Any]) -> int:
+        """Write the whole manifest; returns the number of asset records written"""
+        campaign_id = manifest["campaign_id"]
+        with self.lock(campaign_id):
+            atomic_write_json(self.campaigns_dir / f"{campaign_id}.json", manifest)
+            # The full manifest supersedes any pending changes
+            self._log_path(campaign_id).unlink(missing_ok=True)
+        return len(manifest.get("asset_plan", []))
+    
+    def update_asset(self, campaign_id: str, asset: Dict[str, Any], fields: Optional[Dict[str, Any]] = None, metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        return self.update_assets(campaign_id, [asset], fields, metadata)
+    
+    def update_assets(self, campaign_id: str, assets: List[Dict[str, Any]], fields: Optional[Dict[str, Any]] = None, metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Replace assets (and optionally top-level fields) on the latest stored
+        manifest with a single change-log entry; metadata keys are merged into
+        the stored metadata. Returns the merged manifest, or None if the
+        campaign doesn't exist.
+        """
+        with self.lock(campaign_id):
+            manifest = self._load(campaign_id)
+            if manifest is None:
+                return None
+            
+            stored = {a["id"]: a.get("version") for a in manifest.get("asset_plan", [])}
+            assets = [bump_past(asset, stored.get(asset["id"])) for asset in assets]
+            change = {
+                "at": time.time(),
+                "versions": {asset["id"]: asset.get("version") for asset in assets},
+                "assets": assets,
+                "fields": fields or {},
+                "metadata": metadata or {}
+            }
+            with open(self._log_path(campaign_id), "a") as f:
+                f.write(json.dumps(change) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            apply_change(manifest, change)
+            
+            if len(self._read_log(campaign_id)) >= CHANGE_LOG_COMPACT_EVERY:
+                self._compact_locked(campaign_id, manifest)
+        return manifest
+    
+    def _compact_locked(self, campaign_id: str, manifest: Dict[str, Any]):
+        atomic_write_json(self.campaigns_dir / f"{campaign_id}.json", manifest)
+        self._log_path(campaign_id).unlink(missing_ok=True)
+    
+    def compact(self) -> int:
+        """Fold every pending change log into its manifest; returns the number compacted"""
+        compacted = 0
+        for log_path in self.campaigns_dir.glob("*.changes.jsonl"):
+            campaign_id = log_path.name[:-len(".changes.jsonl")]
+            with self.lock(campaign_id):
+                manifest = self._load(campaign_id)
+                if manifest is None:
+                    log_path.unlink(missing_ok=True)
+                    continue
+                self._compact_locked(campaign_id, manifest)
+                compacted += 1
+        return compacted
+    
+    def delete_campaign(self, campaign_id: str):
+        with self.lock(campaign_id):
+            (self.campaigns_dir / f"{campaign_id}.json").unlink(missing_ok=True)
+            self._log_path(campaign_id).unlink(missing_ok=True)
+    
+    def iter_campaigns(self) -> Iterator[Dict[str, Any]]:
+        for campaign_file in self.campaigns_dir.glob("*.json"):
+            try:
+                manifest = self.get_campaign(campaign_file.stem)
+            except ValueError as e:
+                print(f"[WARN] Skipping unreadable manifest {campaign_file.name}: {e}")
+                continue
+            if manifest is not None:
+                yield manifest
+    
+    def count_campaigns(self) -> int:
+        return sum(1 for _ in self.campaigns_dir.glob("*.json"))
+    
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        user_file = self.users_dir / user_filename(email)
+        if not user_file.exists():
+            return None
+        with open(user_file, "r") as f:
+            return json.load(f)
+    
+    def create_user(self, user: Dict[str, Any]) -> bool:
+        """Store a new user; False if the email is already registered"""
+        try:
+            # "x" fails if the file exists, so two registrations can't both win
+            with open(self.users_dir / user_filename(user["email"]), "x") as f:
+                json.dump(user, f, indent=2)
+        except FileExistsError:
+            return False
+        return True
+    
+    def save_user(self, user: Dict[str, Any]):
+        """Create or replace a user record"""
+        atomic_write_json(self.users_dir / user_filename(user["email"]), user)
+    
+    def iter_users(self) -> Iterator[Dict[str, Any]]:
+        for user_file in self.users_dir.glob("*.json"):
+            with open(user_file, "r") as f:
+                yield json.load(f)
+
+
+class SQLiteStorage:
+    """
+    SQLite (WAL) storage. Campaign-level fields and each asset are separate
+    rows, and saves only rewrite the asset rows whose content changed, so
+    regenerating one asset touches one row.
+    """
+    
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS campaigns (
+                campaign_id TEXT PRIMARY KEY,
+                brief TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                status TEXT NOT NULL,
+                body TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS assets (
+                campaign_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                asset_id TEXT NOT NULL,
+                type TEXT,
+                version INTEGER,
+                body TEXT NOT NULL,
+                body_hash TEXT NOT NULL,
+                PRIMARY KEY (campaign_id, position)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS assets_asset_id ON assets (asset_id)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                email TEXT PRIMARY KEY,
+                id TEXT NOT NULL,
+                created_at TEXT,
+                body TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._lock = threading.Lock()
+    
+    def get_campaign(self, campaign_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM campaigns WHERE campaign_id = ?", (campaign_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            assets = self._conn.execute(
+                "SELECT body FROM assets WHERE campaign_id = ? ORDER BY position", (campaign_id,)
+            ).fetchall()
+            
+        manifest = json.loads(row[0])
+        manifest["asset_plan"] = [json.loads(asset[0]) for asset in assets]
+        return manifest
+    
+    def save_campaign(self, manifest: Dict[str, Any]) -> int:
+        """Upsert the campaign row and any changed asset rows; returns the number of asset rows written"""
+        campaign_id = manifest["campaign_id"]
+        assets = manifest.get("asset_plan", [])
+        # Placeholder keeps asset_plan's key position when the manifest is reassembled
+        body = json.dumps({**manifest, "asset_plan": None})
+        
+        written = 0
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO campaigns (campaign_id, brief, created_at, status, body) VALUES (?, ?, ?, ?, ?)",
+                (campaign_id, manifest.get("brief", ""), manifest.get("created_at", ""), manifest.get("status", "draft"), body)
+            )
+            stored = dict(self._conn.execute(
+                "SELECT position, body_hash FROM assets WHERE campaign_id = ?", (campaign_id,)
+            ).fetchall())
+            
+            for position, asset in enumerate(assets):
+                asset_body = json.dumps(asset)
+                body_hash = hashlib.sha256(asset_body.encode("utf-8")).hexdigest()
+                if stored.get(position) == body_hash:
+                    continue
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO assets (campaign_id, position, asset_id, type, version, body, body_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (campaign_id, position, asset["id"], asset.get("type"), asset.get("version"), asset_body, body_hash)
+                )
+                written += 1
+                
+            self._conn.execute(
+                "DELETE FROM assets WHERE campaign_id = ? AND position >= ?", (campaign_id, len(assets))
+            )
+        return written
+    
+    def update_asset(self, campaign_id: str, asset: Dict[str, Any], fields: Optional[Dict[str, Any]] = None, metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        return self.update_assets(campaign_id, [asset], fields, metadata)
+    
+    def update_assets(self, campaign_id: str, assets: List[Dict[str, Any]], fields: Optional[Dict[str, Any]] = None, metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Replace asset rows (and optionally top-level fields, merging metadata
+        keys) in a single write transaction. Returns the merged manifest, or
+        None if the campaign doesn't exist.
+        """
+        with self._lock:
+            # IMMEDIATE takes the write lock up front so other processes can't interleave
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT body FROM campaigns WHERE campaign_id = ?", (campaign_id,)
+                ).fetchone()
+                if row is None:
+                    self._conn.rollback()
+                    return None
+                
+                if fields or metadata:
+                    body = json.loads(row[0])
+                    body.update({key: value for key, value in (fields or {}).items() if key != "asset_plan"})
+                    if metadata:
+                        body["metadata"] = {**(body.get("metadata") or {}), **metadata}
+                    self._conn.execute(
+                        "UPDATE campaigns SET status = ?, body = ? WHERE campaign_id = ?",
+                        (body.get("status", "draft"), json.dumps(body), campaign_id)
+                    )
+                
+                for asset in assets:
+                    position = self._conn.execute(
+                        "SELECT position, version FROM assets WHERE campaign_id = ? AND asset_id = ? ORDER BY position LIMIT 1",
+                        (campaign_id, asset["id"])
+                    ).fetchone()
+                    if position is None:
+                        position = self._conn.execute(
+                            "SELECT COALESCE(MAX(position) + 1, 0), NULL FROM assets WHERE campaign_id = ?", (campaign_id,)
+                        ).fetchone()
+                    
+                    asset = bump_past(asset, position[1])
+                    asset_body = json.dumps(asset)
+                    body_hash = hashlib.sha256(asset_body.encode("utf-8")).hexdigest()
+                    self._conn.execute(
+                        """
+                        INSERT OR REPLACE INTO assets (campaign_id, position, asset_id, type, version, body, body_hash)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (campaign_id, position[0], asset["id"], asset.get("type"), asset.get("version"), asset_body, body_hash)
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        
+        return self.get_campaign(campaign_id)
+    
+    def compact(self) -> int:
+        """Checkpoint the WAL back into the database file"""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return 0
+    
+    def delete_campaign(self, campaign_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM campaigns WHERE campaign_id = ?", (campaign_id,))
+            self._conn.execute("DELETE FROM assets WHERE campaign_id = ?", (campaign_id,))
+    
+    def iter_campaigns(self) -> Iterator[Dict[str, Any]]:
+        # One manifest in memory at a time
+        with self._lock:
+            campaign_ids = [row[0] for row in self._conn.execute("SELECT campaign_id FROM campaigns").fetchall()]
+        for campaign_id in campaign_ids:
+            manifest = self.get_campaign(campaign_id)
+            if manifest is not None:
+                yield manifest
+    
+    def count_campaigns(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM campaigns").fetchone()[0]
+    
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM users WHERE email = ?", (email,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def create_user(self, user: Dict[str, Any]) -> bool:
+        """Store a new user; False if the email is already registered"""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO users (email, id, created_at, body) VALUES (?, ?, ?, ?)",
+                    (user["email"], user["id"], user.get("created_at"), json.dumps(user))
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+    
+    def save_user(self, user: Dict[str, Any]):
+        """Create or replace a user record"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO users (email, id, created_at, body) VALUES (?, ?, ?, ?)",
+                (user["email"], user["id"], user.get("created_at"), json.dumps(user))
+            )
+    
+    def iter_users(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT body FROM users").fetchall()
+        for row in rows:
+            yield json.loads(row[0])
+
+
+def create_storage(root: str = "./storage"):
+    """
+    Build the storage backend from the environment
+    STORAGE_BACKEND: "json" (default, one file per campaign/user) or "sqlite"
+    STORAGE_DB_PATH: SQLite database path (default <root>/campaigns.sqlite3)
+    """
+    backend_name = os.getenv("STORAGE_BACKEND", "json").lower()
+    
+    if backend_name == "sqlite":
+        return SQLiteStorage(os.getenv("STORAGE_DB_PATH", os.path.join(root, "campaigns.sqlite3")))
+    return JSONDirectoryStorage(root)
+
+
+def import_json_tree(root: str, target: SQLiteStorage):
+    """Copy every campaign and user from a JSON storage tree into SQLite; safe to re-run"""
+    source = JSONDirectoryStorage(root)
+    
+    campaigns = 0
+    for manifest in source.iter_campaigns():
+        target.save_campaign(manifest)
+        campaigns += 1
+        
+    users = 0
+    for user in source.iter_users():
+        target.save_user(user)
+        users += 1
+        
+    return campaigns, users
+
+
+if __name__ == "__main__":
+    # Usage: python -m services.storage migrate [storage_dir] [db_path]
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python -m services.storage migrate [storage_dir] [db_path]")
+        sys.exit(1)
+    root = sys.argv[2] if len(sys.argv) > 2 else "./storage"
+    db_path = sys.argv[3] if len(sys.argv) > 3 else os.getenv("STORAGE_DB_PATH", os.path.join(root, "campaigns.sqlite3"))
+    campaigns, users = import_json_tree(root, SQLiteStorage(db_path))
+    print(f"Imported {campaigns} campaigns and {users} users into {db_path}")
+    print("Set STORAGE_BACKEND=sqlite to serve from it")
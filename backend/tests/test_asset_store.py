@@ -0,0 +1,97 @@
+import os
+import time
+import base64
+import hashlib
+
+import pytest
+
+from services.asset_store import AssetStore
+from services.blobs import migrate_manifest
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AssetStore(str(tmp_path / "assets"), str(tmp_path / "refs.sqlite3"))
+
+
+def age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def manifest_with(campaign_id, blob):
+    return {"campaign_id": campaign_id, "asset_plan": [{"id": "image_1", "url": blob["url"]}]}
+
+
+def test_identical_bytes_are_stored_once(store):
+    first = store.put_bytes(b"same", "png")
+    second = store.put_bytes(b"same", "png")
+    
+    assert first["path"] == second["path"]
+    assert first["url"] == f"/assets/{first['sha256']}.png"
+    assert store.resolve(first["url"]).read_bytes() == b"same"
+
+
+def test_gc_deletes_old_unreferenced_blobs_and_their_derivatives(store):
+    kept = store.put_bytes(b"kept", "png")
+    dropped = store.put_bytes(b"dropped", "png")
+    derivative = store.derivative_path(dropped["sha256"], 256, "webp")
+    derivative.write_bytes(b"thumb")
+    for path in (kept["path"], dropped["path"], derivative):
+        age(path, 3600)
+    store.set_refs("c1", manifest_with("c1", kept))
+    
+    files, reclaimed = store.gc(grace_seconds=60)
+    
+    assert (files, reclaimed) == (2, len(b"dropped") + len(b"thumb"))
+    assert os.path.exists(kept["path"])
+    assert not os.path.exists(dropped["path"])
+    assert not derivative.exists()
+
+
+def test_gc_keeps_blobs_inside_the_grace_period(store):
+    young = store.put_bytes(b"young", "png")
+    
+    assert store.gc(grace_seconds=60) == (0, 0)
+    assert os.path.exists(young["path"])
+
+
+def test_dry_run_only_counts(store):
+    blob = store.put_bytes(b"orphan", "png")
+    age(blob["path"], 3600)
+    
+    assert store.gc(grace_seconds=60, dry_run=True) == (1, len(b"orphan"))
+    assert os.path.exists(blob["path"])
+
+
+def test_dropping_the_last_reference_makes_a_blob_collectable(store):
+    blob = store.put_bytes(b"shared", "png")
+    age(blob["path"], 3600)
+    store.set_refs("c1", manifest_with("c1", blob))
+    store.set_refs("c2", manifest_with("c2", blob))
+    
+    store.drop_refs("c1")
+    assert store.refcount(blob["sha256"]) == 1
+    assert store.gc(grace_seconds=60) == (0, 0)
+    
+    store.drop_refs("c2")
+    assert store.gc(grace_seconds=60)[0] == 1
+
+
+def test_migration_moves_inline_and_legacy_images_into_the_store(store):
+    legacy = store.root / "image_1.png"
+    legacy.write_bytes(b"on disk")
+    manifest = {"asset_plan": [
+        {"id": "image_1", "url": str(legacy), "tool_calls": [{"result": {"success": True, "image_data": base64.b64encode(b"on disk").decode()}}]},
+        {"id": "image_2", "url": None, "tool_calls": [{"result": {"success": True, "format": "png", "image_data": base64.b64encode(b"inline").decode()}}]},
+    ]}
+    
+    assert migrate_manifest(manifest, store)
+    
+    for asset, data in zip(manifest["asset_plan"], (b"on disk", b"inline")):
+        result = asset["tool_calls"][0]["result"]
+        assert "image_data" not in result
+        assert asset["url"] == result["blob"]["url"] == f"/assets/{hashlib.sha256(data).hexdigest()}.png"
+        assert store.resolve(asset["url"]).read_bytes() == data
+    assert not legacy.exists()
+    assert not migrate_manifest(manifest, store)
@@ -0,0 +1,74 @@
+import pytest
+
+from services.campaign_index import CampaignIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = CampaignIndex(str(tmp_path / "index.sqlite3"))
+    # c2 and c3 share a timestamp, so paging has to break the tie on campaign_id
+    for campaign_id, created_at, status in [
+        ("c1", "2026-01-01", "ready"),
+        ("c2", "2026-01-02", "draft"),
+        ("c3", "2026-01-02", "ready"),
+        ("c4", "2026-01-03", "ready"),
+        ("c5", "2026-01-04", "draft"),
+    ]:
+        index.upsert({
+            "campaign_id": campaign_id,
+            "brief": f"brief {campaign_id}",
+            "created_at": created_at,
+            "status": status,
+            "asset_plan": [{"id": "caption_1"}]
+        })
+    return index
+
+
+def all_pages(index, **kwargs):
+    ids, cursor, pages = [], None, 0
+    while True:
+        campaigns, cursor = index.page(limit=2, cursor=cursor, **kwargs)
+        ids.extend(campaign["campaign_id"] for campaign in campaigns)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_pages_cover_every_campaign_once_newest_first(index):
+    ids, pages = all_pages(index)
+    
+    assert ids == ["c5", "c4", "c3", "c2", "c1"]
+    assert pages == 3
+
+
+def test_ascending_pages(index):
+    assert all_pages(index, order="asc")[0] == ["c1", "c2", "c3", "c4", "c5"]
+
+
+def test_filters_apply_to_every_page(index):
+    assert all_pages(index, status="ready")[0] == ["c4", "c3", "c1"]
+    assert index.count(status="ready") == 3
+    assert index.count(brief_contains="c2") == 1
+
+
+def test_rows_inserted_after_a_cursor_do_not_shift_later_pages(index):
+    first, cursor = index.page(limit=2)
+    index.upsert({"campaign_id": "c6", "brief": "", "created_at": "2026-01-05", "status": "ready"})
+    
+    second, _ = index.page(limit=2, cursor=cursor)
+    
+    assert [c["campaign_id"] for c in first] == ["c5", "c4"]
+    assert [c["campaign_id"] for c in second] == ["c3", "c2"]
+
+
+def test_page_projects_requested_fields(index):
+    campaigns, _ = index.page(limit=1, fields=["campaign_id", "status"])
+    
+    assert campaigns == [{"campaign_id": "c5", "status": "draft"}]
+
+
+def test_invalid_cursor_and_fields_are_rejected(index):
+    with pytest.raises(ValueError):
+        index.page(limit=2, cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        index.page(limit=2, fields=["payload"])
@@ -0,0 +1,103 @@
+import asyncio
+
+from agents.executor import DagExecutor, build_dag
+
+
+def tool_call(call_id, tool, **input):
+    return {"id": call_id, "tool": tool, "input": input}
+
+
+def asset(asset_id, generation="llm_text"):
+    return {
+        "id": asset_id,
+        "tool_calls": [
+            tool_call(f"{asset_id}_gen", generation),
+            tool_call(f"{asset_id}_mod", "moderation"),
+            tool_call(f"{asset_id}_emb", "compute_embedding"),
+        ]
+    }
+
+
+def test_build_dag_orders_within_an_asset_and_batches_across_assets():
+    nodes = build_dag([asset("a"), asset("b", "image_generate")], batch_tools={"compute_embedding"})
+    
+    assert set(nodes) == {"0:0", "0:1", "1:0", "1:1", "batch:compute_embedding"}
+    assert nodes["0:0"].depends_on == []
+    assert nodes["0:1"].depends_on == ["0:0"]
+    assert nodes["1:1"].depends_on == ["1:0"]
+    assert nodes["1:0"].provider == "huggingface"
+    batch = nodes["batch:compute_embedding"]
+    assert [member.id for member in batch.batch] == ["0:2", "1:2"]
+    assert batch.depends_on == ["0:0", "1:0"]
+
+
+def test_executor_runs_nodes_after_their_dependencies():
+    finished = []
+    
+    async def run_node(node):
+        await asyncio.sleep(0.01)
+        finished.append(node.id)
+        return {"success": True}
+        
+    nodes = build_dag([asset("a"), asset("b")])
+    results = asyncio.run(DagExecutor(run_node).run(nodes))
+    
+    assert all(result["success"] for result in results.values())
+    for node in nodes.values():
+        for dependency in node.depends_on:
+            assert finished.index(dependency) < finished.index(node.id)
+
+
+def test_executor_skips_dependents_of_a_failed_node():
+    events = []
+    
+    async def run_node(node):
+        return {"success": node.id != "0:0", "error": "boom"}
+        
+    nodes = build_dag([asset("a"), asset("b")])
+    results = asyncio.run(DagExecutor(run_node).run(nodes, on_event=events.append))
+    
+    assert results["0:1"]["error"].startswith("Skipped")
+    assert results["0:2"]["error"].startswith("Skipped")
+    assert results["1:1"]["success"] and results["1:2"]["success"]
+    skipped = [event["node_id"] for event in events if event["event"] == "tool_call_skipped"]
+    assert sorted(skipped) == ["0:1", "0:2"]
+
+
+def test_executor_bounds_concurrency_per_provider():
+    running = {"now": 0, "peak": 0}
+    
+    async def run_node(node):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        return {"success": True}
+        
+    nodes = build_dag([asset(str(i)) for i in range(6)])
+    asyncio.run(DagExecutor(run_node, provider_limits={"gemini": 2}).run(nodes))
+    
+    assert running["peak"] == 2
+
+
+def test_cancelling_a_run_cancels_its_running_nodes():
+    cancelled = []
+    
+    async def run_node(node):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(node.id)
+            raise
+        return {"success": True}
+    
+    async def main():
+        run = asyncio.create_task(DagExecutor(run_node).run(build_dag([asset("a"), asset("b")])))
+        await asyncio.sleep(0.05)
+        run.cancel()
+        await asyncio.gather(run, return_exceptions=True)
+        # Let the cancelled node tasks unwind
+        await asyncio.sleep(0)
+        
+    asyncio.run(main())
+    assert sorted(cancelled) == ["0:0", "1:0"]
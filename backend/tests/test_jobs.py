@@ -0,0 +1,87 @@
+import pytest
+
+from services import jobs
+from services.jobs import JobStore, QueueFullError
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_claim_takes_the_oldest_queued_job(store):
+    first = store.submit("campaign", {"brief": "one"}, max_pending=10)
+    store.submit("campaign", {"brief": "two"}, max_pending=10)
+    
+    claimed = store.claim()
+    
+    assert claimed["id"] == first["id"]
+    assert claimed["status"] == jobs.RUNNING
+    assert claimed["attempts"] == 1
+    assert claimed["payload"] == {"brief": "one"}
+
+
+def test_claim_returns_none_when_nothing_is_queued(store):
+    assert store.claim() is None
+
+
+def test_submit_rejects_jobs_past_the_bound(store):
+    store.submit("campaign", {}, max_pending=1)
+    with pytest.raises(QueueFullError):
+        store.submit("campaign", {}, max_pending=1)
+
+
+def test_heartbeat_records_progress_and_reports_cancellation(store):
+    job = store.submit("campaign", {}, max_pending=10)
+    store.claim()
+    
+    assert store.heartbeat(job["id"], {"stage": "assets"}) is False
+    assert store.get(job["id"])["progress"] == {"stage": "assets"}
+    
+    store.request_cancel(job["id"])
+    assert store.heartbeat(job["id"]) is True
+    # A running job is only flagged; its worker finishes it
+    assert store.get(job["id"])["status"] == jobs.RUNNING
+
+
+def test_cancelling_a_queued_job_closes_it(store):
+    job = store.submit("campaign", {}, max_pending=10)
+    
+    assert store.request_cancel(job["id"])["status"] == jobs.CANCELLED
+    assert store.claim() is None
+
+
+def test_requeue_hands_a_running_job_back(store):
+    job = store.submit("campaign", {}, max_pending=10)
+    store.claim()
+    
+    store.requeue(job["id"])
+    
+    assert store.get(job["id"])["status"] == jobs.QUEUED
+    assert store.claim()["attempts"] == 2
+
+
+def test_stale_running_job_is_reclaimed_then_failed(store, monkeypatch):
+    # Every running job counts as stale, as if its worker had died
+    monkeypatch.setattr(jobs, "STALE_AFTER_SECONDS", -1)
+    job = store.submit("campaign", {}, max_pending=10)
+    
+    assert store.claim(max_attempts=2)["attempts"] == 1
+    assert store.claim(max_attempts=2)["attempts"] == 2
+    assert store.claim(max_attempts=2) is None
+    
+    failed = store.get(job["id"])
+    assert failed["status"] == jobs.FAILED
+    assert "2 attempts" in failed["error"]
+
+
+def test_finish_stores_the_result(store):
+    job = store.submit("campaign", {}, max_pending=10)
+    store.claim()
+    
+    store.finish(job["id"], jobs.SUCCEEDED, {"campaign_id": "c1"})
+    
+    finished = store.get(job["id"])
+    assert finished["status"] == jobs.SUCCEEDED
+    assert finished["result"] == {"campaign_id": "c1"}
+    assert store.counts() == {jobs.SUCCEEDED: 1}
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from agents.resilience import CircuitBreaker, TokenBucket
+from tools.single_flight import SingleFlight, coalesce_key
+
+
+def test_token_bucket_makes_overdrawn_callers_wait():
+    bucket = TokenBucket(60)
+    
+    assert bucket.reserve(60) == 0.0
+    # One token per second refill, so the next request waits about a second
+    assert 0.9 < bucket.reserve(1) <= 1.0
+    
+    bucket.refund(1)
+    assert bucket.reserve(1) < 1.0
+
+
+def test_circuit_breaker_opens_then_allows_one_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    
+    time.sleep(0.06)
+    assert breaker.allow()
+    # Only the one trial call gets through while half open
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    
+    assert breaker.allow()
+    breaker.record_failure()
+    
+    assert breaker.state == "open"
+    assert breaker.times_opened == 2
+
+
+def test_single_flight_shares_one_call_between_concurrent_callers():
+    flights = SingleFlight()
+    calls = []
+    
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"success": True, "text": "shared"}
+    
+    async def main():
+        return await asyncio.gather(*[flights.run_async("key", call) for _ in range(3)])
+        
+    results = asyncio.run(main())
+    
+    assert len(calls) == 1
+    assert results == [{"success": True, "text": "shared"}] * 3
+    # Copies, so one caller mutating its result doesn't affect the others
+    assert results[0] is not results[1]
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 2}
+
+
+def test_images_and_uncached_calls_are_never_coalesced():
+    assert coalesce_key("image_generate", {"prompt": "p"}) is None
+    assert coalesce_key("web_search", {"q": "x", "cache": False}) is None
+    assert coalesce_key("web_search", {"q": "x"}) == coalesce_key("web_search", {"q": "x"})
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from services import storage
+from services.storage import JSONDirectoryStorage, SQLiteStorage
+
+
+def manifest(campaign_id="c1"):
+    return {
+        "campaign_id": campaign_id,
+        "brief": "brief",
+        "created_at": "2026-01-01T00:00:00",
+        "status": "ready",
+        "asset_plan": [
+            {"id": "caption_1", "type": "caption", "version": 1, "content": "old"},
+            {"id": "image_1", "type": "image", "version": 1, "url": None},
+        ],
+        "metadata": {"alignment": {"mean_score": 0.5}}
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JSONDirectoryStorage(str(tmp_path))
+
+
+def stored_file(store, campaign_id="c1"):
+    with open(store.campaigns_dir / f"{campaign_id}.json") as f:
+        return json.load(f)
+
+
+def test_update_asset_is_replayed_from_the_change_log(store):
+    store.save_campaign(manifest())
+    
+    store.update_asset("c1", {"id": "caption_1", "type": "caption", "version": 1, "content": "new"}, metadata={"seed": "s"})
+    
+    loaded = store.get_campaign("c1")
+    assert loaded["asset_plan"][0]["content"] == "new"
+    # The stored version was 1, so the update is written past it
+    assert loaded["asset_plan"][0]["version"] == 2
+    assert loaded["metadata"] == {"alignment": {"mean_score": 0.5}, "seed": "s"}
+    # Only the log has the change until it is compacted
+    assert stored_file(store)["asset_plan"][0]["content"] == "old"
+
+
+def test_compact_folds_the_log_into_the_manifest(store):
+    store.save_campaign(manifest())
+    store.update_asset("c1", {"id": "caption_1", "type": "caption", "version": 1, "content": "first"})
+    store.update_assets("c1", [{"id": "image_1", "type": "image", "version": 1, "url": "/assets/x.png"}], {"status": "draft"})
+    before = store.get_campaign("c1")
+    
+    assert store.compact() == 1
+    
+    assert not store._log_path("c1").exists()
+    assert stored_file(store) == before
+    assert store.get_campaign("c1") == before
+    assert store.compact() == 0
+
+
+def test_updates_after_compaction_replay_on_the_new_base(store):
+    store.save_campaign(manifest())
+    store.update_asset("c1", {"id": "caption_1", "type": "caption", "version": 1, "content": "first"})
+    store.compact()
+    
+    store.update_asset("c1", {"id": "caption_1", "type": "caption", "version": 1, "content": "second"})
+    
+    caption = store.get_campaign("c1")["asset_plan"][0]
+    assert caption["content"] == "second"
+    assert caption["version"] == 3
+
+
+def test_log_is_compacted_automatically(store, monkeypatch):
+    monkeypatch.setattr(storage, "CHANGE_LOG_COMPACT_EVERY", 2)
+    store.save_campaign(manifest())
+    
+    store.update_asset("c1", {"id": "caption_1", "type": "caption", "content": "a"})
+    assert store._log_path("c1").exists()
+    store.update_asset("c1", {"id": "caption_1", "type": "caption", "content": "b"})
+    
+    assert not store._log_path("c1").exists()
+    assert stored_file(store)["asset_plan"][0]["content"] == "b"
+
+
+def test_torn_final_log_line_is_ignored(store):
+    store.save_campaign(manifest())
+    store.update_asset("c1", {"id": "caption_1", "type": "caption", "version": 1, "content": "kept"})
+    with open(store._log_path("c1"), "a") as f:
+        f.write('{"assets": [')
+        
+    assert store.get_campaign("c1")["asset_plan"][0]["content"] == "kept"
+
+
+def test_save_campaign_supersedes_pending_changes(store):
+    store.save_campaign(manifest())
+    store.update_asset("c1", {"id": "caption_1", "type": "caption", "version": 1, "content": "logged"})
+    
+    store.save_campaign(manifest())
+    
+    assert not store._log_path("c1").exists()
+    assert store.get_campaign("c1")["asset_plan"][0]["content"] == "old"
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_both_backends_create_and_save_users(tmp_path, backend):
+    users = JSONDirectoryStorage(str(tmp_path)) if backend == "json" else SQLiteStorage(str(tmp_path / "db.sqlite3"))
+    user = {"id": "u1", "email": "a@b.co", "name": "A", "created_at": "2026-01-01"}
+    
+    assert users.create_user(user)
+    assert not users.create_user(user)
+    
+    users.save_user({**user, "name": "B"})
+    
+    assert users.get_user("a@b.co")["name"] == "B"
+    assert [u["id"] for u in users.iter_users()] == ["u1"]
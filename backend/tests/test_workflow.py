@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from agents.workflow import WorkflowError, parse_workflow, run_workflow
+
+AGENT_TYPES = ["strategy", "copywriting", "visual"]
+
+
+def graph(edges, nodes=("a", "b", "c")):
+    return {
+        "nodes": [{"id": node_id, "data": {"agentType": "strategy", "input": node_id}} for node_id in nodes],
+        "edges": [{"source": source, "target": target} for source, target in edges]
+    }
+
+
+def test_parse_workflow_orders_nodes_topologically():
+    nodes, upstream, order = parse_workflow(graph([("b", "c"), ("a", "b")]), AGENT_TYPES)
+    
+    assert order == ["a", "b", "c"]
+    assert upstream == {"a": [], "b": ["a"], "c": ["b"]}
+    assert nodes["a"]["agent_type"] == "strategy"
+
+
+def test_parse_workflow_rejects_a_cycle():
+    with pytest.raises(WorkflowError, match="cycle through: b, c"):
+        parse_workflow(graph([("a", "b"), ("b", "c"), ("c", "b")]), AGENT_TYPES)
+
+
+def test_parse_workflow_rejects_a_self_loop():
+    with pytest.raises(WorkflowError, match="cycle"):
+        parse_workflow(graph([("a", "a")]), AGENT_TYPES)
+
+
+def test_parse_workflow_rejects_bad_graphs():
+    with pytest.raises(WorkflowError, match="unknown node"):
+        parse_workflow(graph([("a", "z")]), AGENT_TYPES)
+    with pytest.raises(WorkflowError, match="unknown agent type"):
+        parse_workflow({"nodes": [{"id": "a", "data": {"agentType": "nope"}}]}, AGENT_TYPES)
+    with pytest.raises(WorkflowError, match="no nodes"):
+        parse_workflow({"nodes": []}, AGENT_TYPES)
+
+
+def test_run_workflow_passes_outputs_downstream_and_skips_after_failure():
+    nodes, upstream, order = parse_workflow(graph([("a", "b"), ("b", "c")], nodes=("a", "b", "c", "d")), AGENT_TYPES)
+    inputs = {}
+    
+    async def run_agent(agent_type, user_input):
+        node_input = user_input.rsplit("\n\n", 1)[-1]
+        inputs[node_input] = user_input
+        if node_input == "b":
+            raise RuntimeError("agent down")
+        return {"success": True, "output": f"out-{node_input}"}
+        
+    results = asyncio.run(run_workflow(nodes, upstream, order, run_agent))
+    
+    assert inputs["b"].startswith("out-a")
+    assert results["b"] == {"node_id": "b", "status": "error", "error": "agent down"}
+    assert results["c"]["status"] == "skipped"
+    assert results["d"]["status"] == "success"
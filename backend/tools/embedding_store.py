@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def embedding_key(model: str, text: str) -> str:
+    """Stable key for an embedding: hash of the model name and the exact text"""
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Persistent embedding store keyed by text hash, vectors kept as raw float32 blobs"""
+    
+    def __init__(self, path: Optional[str] = None):
+        path = path or os.getenv("EMBEDDING_STORE_PATH", "./storage/cache/embeddings.sqlite3")
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                dimensions INTEGER NOT NULL,
+                vector BLOB NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._lock = threading.Lock()
+    
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return the stored vectors for whichever keys are present"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        return self.get_many([key]).get(key)
+    
+    def put_many(self, vectors: Dict[str, np.ndarray]):
+        rows = []
+        for key, vector in vectors.items():
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((key, int(vector.shape[0]), vector.tobytes()))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dimensions, vector) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+    
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
@@ -1,10 +1,58 @@
 import requests
+import httpx
+import aiofiles
+import asyncio
+import weakref
 import os
+import json
 from typing import Dict, Any
 import time
+import uuid
 import base64
+import hashlib
 from pathlib import Path
 
+# Response bodies are written to disk in chunks of this size, never held whole in memory
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Give up on a cold model after this many seconds of warm-up waits
+MAX_WARMUP_WAIT = float(os.getenv("HF_MAX_WARMUP_WAIT", "120"))
+
+IMAGE_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/webp": "webp",
+}
+
+class ModelReadiness:
+    """
+    Shared warm-up state for the inference model. The first 503 records the
+    provider's estimated_time; every concurrent request then waits out the
+    same window instead of each hitting the API and sleeping blindly.
+    """
+    
+    def __init__(self):
+        self.loading_until = 0.0
+    
+    def mark_loading(self, body: str) -> float:
+        """Record a 503 "model loading" response; returns the estimated seconds left"""
+        try:
+            estimated = float(json.loads(body).get("estimated_time", 20))
+        except (ValueError, TypeError, AttributeError):
+            estimated = 20.0
+        self.loading_until = max(self.loading_until, time.monotonic() + estimated)
+        return estimated
+    
+    def mark_ready(self):
+        self.loading_until = 0.0
+    
+    def remaining(self) -> float:
+        return max(0.0, self.loading_until - time.monotonic())
+    
+    def wait_until(self, deadline: float) -> float:
+        """Seconds to wait before the next attempt, never past the caller's deadline"""
+        return max(0.0, min(self.remaining(), deadline - time.monotonic()))
+
 class ImageTool:
     def __init__(self):
         self.api_token = os.getenv("HUGGINGFACE_API_TOKEN")
@@ -14,10 +62,16 @@ class ImageTool:
         # Using Stable Diffusion XL on Hugging Face
         self.api_url = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0"
         self.headers = {"Authorization": f"Bearer {self.api_token}"}
+        self.assets_dir = os.getenv("ASSETS_DIR", "./storage/assets")
+        # One pooled client per event loop: httpx connections belong to the loop that opened them
+        self._async_clients = weakref.WeakKeyDictionary()
+        self.readiness = ModelReadiness()
         
     def generate_image(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Generate image using Hugging Face Inference API
+        Generate image using Hugging Face Inference API.
+        The image is streamed straight to a file in the asset store and the
+        result carries a blob reference {path, size, sha256, mime}.
         Expected input: {
             "prompt": str,
             "size": str (e.g., "1024x1024"),
@@ -26,55 +80,59 @@ class ImageTool:
         }
         """
         try:
-            prompt = tool_input.get("prompt", "")
-            seed = tool_input.get("seed")
-            n = tool_input.get("n", 1)
+            payload = self._build_payload(tool_input)
             
-            # Hugging Face API payload
-            payload = {
-                "inputs": prompt,
-                "parameters": {
-                    "num_inference_steps": 30,
-                }
-            }
-            
-            if seed is not None:
-                payload["parameters"]["seed"] = seed
-            
-            # Make request
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json=payload,
-                timeout=60
-            )
+            deadline = time.monotonic() + MAX_WARMUP_WAIT
             
-            if response.status_code == 503:
-                # Model is loading, wait and retry
-                time.sleep(20)
-                response = requests.post(
+            while True:
+                # Wait out a warm-up another request already reported
+                time.sleep(self.readiness.wait_until(deadline))
+                
+                # Make request
+                with requests.post(
                     self.api_url,
                     headers=self.headers,
                     json=payload,
-                    timeout=60
-                )
+                    timeout=60,
+                    stream=True
+                ) as response:
+                    if response.status_code == 200:
+                        self.readiness.mark_ready()
+                        return self._stream_to_file(response)
+                    if response.status_code != 503 or time.monotonic() >= deadline:
+                        return self._error_response(response.status_code, response.text)
+                    
+                    # Model is loading, retry after the provider's estimate
+                    self.readiness.mark_loading(response.text)
+                
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    async def generate_image_async(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Non-blocking variant of generate_image"""
+        try:
+            payload = self._build_payload(tool_input)
+            client = self._get_async_client()
+            
+            deadline = time.monotonic() + MAX_WARMUP_WAIT
             
-            if response.status_code == 200:
-                # Save image
-                image_data = response.content
+            while True:
+                # Wait out a warm-up another request already reported, without blocking the event loop
+                await asyncio.sleep(self.readiness.wait_until(deadline))
                 
-                return {
-                    "success": True,
-                    "image_data": base64.b64encode(image_data).decode('utf-8'),
-                    "format": "png",
-                    "provider": "huggingface",
-                    "model": "stable-diffusion-xl-base-1.0"
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"API returned status {response.status_code}: {response.text}"
-                }
+                async with client.stream("POST", self.api_url, headers=self.headers, json=payload) as response:
+                    if response.status_code == 200:
+                        self.readiness.mark_ready()
+                        return await self._stream_to_file_async(response)
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    if response.status_code != 503 or time.monotonic() >= deadline:
+                        return self._error_response(response.status_code, body)
+                    
+                    # Model is loading, retry after the provider's estimate
+                    self.readiness.mark_loading(body)
                 
         except Exception as e:
             return {
@@ -82,17 +140,106 @@ class ImageTool:
                 "error": str(e)
             }
     
-    def save_image(self, image_data: str, asset_id: str, assets_dir: str) -> str:
-        """Save base64 image data to file"""
-        try:
-            Path(assets_dir).mkdir(parents=True, exist_ok=True)
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Shared HTTP client so connections are pooled across requests on this event loop"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(timeout=60)
+            self._async_clients[loop] = client
+        return client
+    
+    async def aclose(self):
+        """Close this event loop's HTTP client (app shutdown, end of a blocking call)"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+    
+    def _build_payload(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the Hugging Face inference payload for a generate_image input"""
+        prompt = tool_input.get("prompt", "")
+        seed = tool_input.get("seed")
+        
+        payload = {
+            "inputs": prompt,
+            "parameters": {
+                "num_inference_steps": 30,
+            }
+        }
+        
+        if seed is not None:
+            payload["parameters"]["seed"] = seed
             
-            image_bytes = base64.b64decode(image_data)
-            file_path = os.path.join(assets_dir, f"{asset_id}.png")
+        return payload
+    
+    def _temp_paths(self, content_type: str):
+        """Pick a unique final path in the asset store and its in-progress temp path"""
+        Path(self.assets_dir).mkdir(parents=True, exist_ok=True)
+        mime = content_type.split(";")[0].strip() or "image/png"
+        extension = IMAGE_EXTENSIONS.get(mime, "png")
+        final_path = os.path.join(self.assets_dir, f"img_{uuid.uuid4().hex}.{extension}")
+        return f"{final_path}.part", final_path, mime, extension
+    
+    def _stream_to_file(self, response) -> Dict[str, Any]:
+        tmp_path, final_path, mime, extension = self._temp_paths(response.headers.get("content-type", ""))
+        digest = hashlib.sha256()
+        size = 0
+        
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            # Atomic: readers never see a half-written image
+            os.replace(tmp_path, final_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
             
-            with open(file_path, "wb") as f:
-                f.write(image_bytes)
+        return self._success_response(final_path, size, digest.hexdigest(), mime, extension)
+    
+    async def _stream_to_file_async(self, response: httpx.Response) -> Dict[str, Any]:
+        tmp_path, final_path, mime, extension = self._temp_paths(response.headers.get("content-type", ""))
+        digest = hashlib.sha256()
+        size = 0
+        
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                    await f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
             
-            return file_path
-        except Exception as e:
-            raise Exception(f"Failed to save image: {str(e)}")
+        return self._success_response(final_path, size, digest.hexdigest(), mime, extension)
+    
+    def _success_response(self, path: str, size: int, sha256: str, mime: str, extension: str) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "blob": {
+                "path": path,
+                "size": size,
+                "sha256": sha256,
+                "mime": mime
+            },
+            "format": extension,
+            "provider": "huggingface",
+            "model": "stable-diffusion-xl-base-1.0"
+        }
+    
+    def _error_response(self, status_code: int, text: str) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": f"API returned status {status_code}: {text}"
+        }
+    
+    def load_inline(self, blob: Dict[str, Any]) -> str:
+        """Base64 payload for a stored image, only for clients that ask for inline data"""
+        with open(blob["path"], "rb") as f:
+            return base64.b64encode(f.read()).decode('utf-8')
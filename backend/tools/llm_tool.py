@@ -1,7 +1,18 @@
 import google.generativeai as genai
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import json
+import numpy as np
+
+from tools.response_cache import create_response_cache, make_cache_key
+from tools.embedding_store import EmbeddingStore, embedding_key
+
+# Calls at or below this temperature are treated as deterministic and cached
+CACHEABLE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+# Gemini accepts at most 100 texts per batch embedding request
+EMBEDDING_BATCH_SIZE = 100
 
 class LLMTool:
     def __init__(self):
@@ -9,7 +20,61 @@ class LLMTool:
         if not api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
         genai.configure(api_key=api_key)
+        self.cache = create_response_cache("llm_text")
+        self.embedding_store = EmbeddingStore()
+    
+    def _cache_key(self, tool_input: Dict[str, Any]) -> Optional[str]:
+        """
+        Cache key for a generate_text input, or None if the call shouldn't be cached.
+        Set "cache": False in the input to force fresh output, or True to cache a creative call.
+        """
+        cache = tool_input.get("cache")
+        temperature = tool_input.get("temperature", 0.7)
+        if cache is False or (cache is None and temperature > CACHEABLE_MAX_TEMPERATURE):
+            return None
+        
+        return make_cache_key(
+            tool_input.get("model", "gemini-2.0-flash-exp"),
+            tool_input.get("prompt", ""),
+            {"temperature": temperature, "max_output_tokens": tool_input.get("max_tokens", 1024)}
+        )
+    
+    def _cached_response(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if cache_key is None:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            cached["cached"] = True
+        return cached
+    
+    def _build_model(self, tool_input: Dict[str, Any]):
+        """Create the Gemini model for a generate_text input"""
+        model_name = tool_input.get("model", "gemini-2.0-flash-exp")
+        temperature = tool_input.get("temperature", 0.7)
+        max_tokens = tool_input.get("max_tokens", 1024)
+        
+        generation_config = {
+            "temperature": temperature,
+            "max_output_tokens": max_tokens,
+        }
         
+        model = genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=generation_config
+        )
+        return model, model_name
+    
+    def _format_response(self, response, model_name: str) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "text": response.text,
+            "model": model_name,
+            "usage": {
+                "prompt_tokens": response.usage_metadata.prompt_token_count if hasattr(response, 'usage_metadata') else 0,
+                "completion_tokens": response.usage_metadata.candidates_token_count if hasattr(response, 'usage_metadata') else 0,
+            }
+        }
+    
     def generate_text(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate text using Gemini API
@@ -17,36 +82,42 @@ class LLMTool:
             "prompt": str,
             "model": str (default: "gemini-2.0-flash-exp"),
             "temperature": float,
-            "max_tokens": int
+            "max_tokens": int,
+            "cache": bool (optional, overrides temperature-based caching)
         }
         """
+        cache_key = self._cache_key(tool_input)
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            model_name = tool_input.get("model", "gemini-2.0-flash-exp")
-            prompt = tool_input.get("prompt", "")
-            temperature = tool_input.get("temperature", 0.7)
-            max_tokens = tool_input.get("max_tokens", 1024)
-            
-            generation_config = {
-                "temperature": temperature,
-                "max_output_tokens": max_tokens,
-            }
-            
-            model = genai.GenerativeModel(
-                model_name=model_name,
-                generation_config=generation_config
-            )
-            
-            response = model.generate_content(prompt)
-            
+            model, model_name = self._build_model(tool_input)
+            response = model.generate_content(tool_input.get("prompt", ""))
+            result = self._format_response(response, model_name)
+            if cache_key is not None:
+                self.cache.set(cache_key, result)
+            return result
+        except Exception as e:
             return {
-                "success": True,
-                "text": response.text,
-                "model": model_name,
-                "usage": {
-                    "prompt_tokens": response.usage_metadata.prompt_token_count if hasattr(response, 'usage_metadata') else 0,
-                    "completion_tokens": response.usage_metadata.candidates_token_count if hasattr(response, 'usage_metadata') else 0,
-                }
+                "success": False,
+                "error": str(e)
             }
+    
+    async def generate_text_async(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Non-blocking variant of generate_text"""
+        cache_key = self._cache_key(tool_input)
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            model, model_name = self._build_model(tool_input)
+            response = await model.generate_content_async(tool_input.get("prompt", ""))
+            result = self._format_response(response, model_name)
+            if cache_key is not None:
+                self.cache.set(cache_key, result)
+            return result
         except Exception as e:
             return {
                 "success": False,
@@ -60,20 +131,84 @@ class LLMTool:
             "text": str
         }
         """
+        return self._single_embedding(self.compute_embeddings([tool_input.get("text", "")]))
+    
+    async def compute_embedding_async(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Non-blocking variant of compute_embedding"""
+        return self._single_embedding(await self.compute_embeddings_async([tool_input.get("text", "")]))
+    
+    def compute_embeddings(self, texts: List[str]) -> Dict[str, Any]:
+        """
+        Compute embeddings for many texts with one batched Gemini request per
+        EMBEDDING_BATCH_SIZE texts. Texts seen before are served from the embedding store.
+        """
         try:
-            text = tool_input.get("text", "")
-            result = genai.embed_content(
-                model="models/text-embedding-004",
-                content=text
-            )
+            keys, vectors, missing = self._lookup_embeddings(texts)
+            missing_keys = list(missing)
             
+            for start in range(0, len(missing_keys), EMBEDDING_BATCH_SIZE):
+                batch_keys = missing_keys[start:start + EMBEDDING_BATCH_SIZE]
+                result = genai.embed_content(
+                    model=EMBEDDING_MODEL,
+                    content=[missing[key] for key in batch_keys]
+                )
+                vectors.update(self._store_embeddings(batch_keys, result['embedding']))
+            
+            return self._format_embeddings(keys, vectors, len(missing_keys))
+        except Exception as e:
             return {
-                "success": True,
-                "embedding": result['embedding'],
-                "dimensions": len(result['embedding'])
+                "success": False,
+                "error": str(e)
             }
+    
+    async def compute_embeddings_async(self, texts: List[str]) -> Dict[str, Any]:
+        """Non-blocking variant of compute_embeddings"""
+        try:
+            keys, vectors, missing = self._lookup_embeddings(texts)
+            missing_keys = list(missing)
+            
+            for start in range(0, len(missing_keys), EMBEDDING_BATCH_SIZE):
+                batch_keys = missing_keys[start:start + EMBEDDING_BATCH_SIZE]
+                result = await genai.embed_content_async(
+                    model=EMBEDDING_MODEL,
+                    content=[missing[key] for key in batch_keys]
+                )
+                vectors.update(self._store_embeddings(batch_keys, result['embedding']))
+            
+            return self._format_embeddings(keys, vectors, len(missing_keys))
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e)
             }
+    
+    def _lookup_embeddings(self, texts: List[str]):
+        """Split texts into stored vectors and the unique texts still to embed"""
+        keys = [embedding_key(EMBEDDING_MODEL, text) for text in texts]
+        vectors = self.embedding_store.get_many(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        return keys, vectors, missing
+    
+    def _store_embeddings(self, keys: List[str], embeddings: List[List[float]]) -> Dict[str, np.ndarray]:
+        fetched = {key: np.asarray(embedding, dtype=np.float32) for key, embedding in zip(keys, embeddings)}
+        self.embedding_store.put_many(fetched)
+        return fetched
+    
+    def _format_embeddings(self, keys: List[str], vectors: Dict[str, np.ndarray], fetched: int) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "keys": keys,
+            "embeddings": [vectors[key].tolist() for key in keys],
+            "dimensions": int(vectors[keys[0]].shape[0]) if keys else 0,
+            "cached": len(set(keys)) - fetched
+        }
+    
+    def _single_embedding(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        if not result.get("success"):
+            return result
+        return {
+            "success": True,
+            "embedding": result["embeddings"][0],
+            "dimensions": result["dimensions"],
+            "key": result["keys"][0]
+        }
\ No newline at end of file
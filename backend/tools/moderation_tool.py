@@ -1,5 +1,6 @@
 import google.generativeai as genai
 import os
+import json
 from typing import Dict, Any
 
 class ModerationTool:
@@ -17,13 +18,40 @@ class ModerationTool:
         }
         """
         try:
-            text = tool_input.get("text", "")
-            
-            # Use Gemini to check for safety issues
             model = genai.GenerativeModel('gemini-2.0-flash-exp')
+            response = model.generate_content(self._build_prompt(tool_input))
+            return self._parse_response(response.text)
+                
+        except Exception as e:
+            # On error, assume safe but log error
+            return {
+                "success": True,
+                "moderation_passed": True,
+                "issues": [],
+                "error": str(e)
+            }
+    
+    async def moderate_text_async(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Non-blocking variant of moderate_text"""
+        try:
+            model = genai.GenerativeModel('gemini-2.0-flash-exp')
+            response = await model.generate_content_async(self._build_prompt(tool_input))
+            return self._parse_response(response.text)
             
-            # Simple safety check prompt
-            prompt = f"""Analyze this content for safety issues (hate speech, violence, explicit content, harmful content).
+        except Exception as e:
+            # On error, assume safe but log error
+            return {
+                "success": True,
+                "moderation_passed": True,
+                "issues": [],
+                "error": str(e)
+            }
+    
+    def _build_prompt(self, tool_input: Dict[str, Any]) -> str:
+        text = tool_input.get("text", "")
+        
+        # Simple safety check prompt
+        return f"""Analyze this content for safety issues (hate speech, violence, explicit content, harmful content).
             
 Content: {text}
 
@@ -32,33 +60,22 @@ Respond with JSON only:
     "safe": true/false,
     "issues": ["issue1", "issue2"] or []
 }}"""
-            
-            response = model.generate_content(prompt)
-            
-            # Parse response
-            import json
-            try:
-                result = json.loads(response.text.strip().replace('```json', '').replace('```', ''))
-                return {
-                    "success": True,
-                    "moderation_passed": result.get("safe", True),
-                    "issues": result.get("issues", [])
-                }
-            except:
-                # If parsing fails, assume safe
-                return {
-                    "success": True,
-                    "moderation_passed": True,
-                    "issues": []
-                }
-                
-        except Exception as e:
-            # On error, assume safe but log error
+    
+    def _parse_response(self, response_text: str) -> Dict[str, Any]:
+        # Parse response
+        try:
+            result = json.loads(response_text.strip().replace('```json', '').replace('```', ''))
+            return {
+                "success": True,
+                "moderation_passed": result.get("safe", True),
+                "issues": result.get("issues", [])
+            }
+        except:
+            # If parsing fails, assume safe
             return {
                 "success": True,
                 "moderation_passed": True,
-                "issues": [],
-                "error": str(e)
+                "issues": []
             }
     
     def moderate_image(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
@@ -75,3 +92,7 @@ Respond with JSON only:
             "moderation_passed": True,
             "issues": []
         }
+    
+    async def moderate_image_async(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Non-blocking variant of moderate_image"""
+        return self.moderate_image(tool_input)
\ No newline at end of file
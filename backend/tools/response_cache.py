@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+# A cached value plus the timestamps needed for TTL decisions
+CacheEntry = namedtuple("CacheEntry", ["value", "stored_at", "expires_at"])
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Content-addressed key: SHA-256 over a canonical JSON encoding of the parts"""
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry TTL"""
+    
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at is not None and entry.expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return CacheEntry(json.loads(entry.value), entry.stored_at, entry.expires_at)
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        # Stored serialized so callers can't mutate cached results in place
+        entry = CacheEntry(json.dumps(value), now, now + ttl if ttl else None)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """On-disk cache shared by every worker process on the host"""
+    
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.max_entries = max_entries
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[CacheEntry]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[2] is not None and row[2] <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return CacheEntry(json.loads(row[0]), row[1], row[2])
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value), now, now + ttl if ttl else None, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+    
+    def _evict(self, now: float):
+        """Drop expired rows, then least-recently-used rows over the size limit"""
+        self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_access LIMIT ?)",
+                (overflow,)
+            )
+    
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+    
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+    
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class ResponseCache:
+    """Cache front-end with a default TTL and hit/miss counters"""
+    
+    def __init__(self, backend, ttl: Optional[float] = None):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+    
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        entry = self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+    
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_entry(key)
+        return entry.value if entry else None
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.backend.set(key, value, ttl if ttl is not None else self.ttl)
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def create_response_cache(name: str, backend_name: Optional[str] = None, ttl: Optional[float] = None) -> ResponseCache:
+    """
+    Build a cache from the environment
+    RESPONSE_CACHE_BACKEND: "memory" (default) or "sqlite"
+    RESPONSE_CACHE_DIR: directory for SQLite cache files (default ./storage/cache)
+    RESPONSE_CACHE_TTL: seconds (default 86400)
+    RESPONSE_CACHE_MAX_ENTRIES: size limit (default 1024 in memory, 10000 on disk)
+    backend_name and ttl, when given, take precedence over the environment
+    """
+    backend_name = (backend_name or os.getenv("RESPONSE_CACHE_BACKEND", "memory")).lower()
+    ttl = ttl if ttl is not None else float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+    max_entries = os.getenv("RESPONSE_CACHE_MAX_ENTRIES")
+    
+    if backend_name == "sqlite":
+        cache_dir = os.getenv("RESPONSE_CACHE_DIR", "./storage/cache")
+        backend = SQLiteCacheBackend(
+            os.path.join(cache_dir, f"{name}.sqlite3"),
+            int(max_entries) if max_entries else 10000
+        )
+    else:
+        backend = MemoryCacheBackend(int(max_entries) if max_entries else 1024)
+        
+    return ResponseCache(backend, ttl)
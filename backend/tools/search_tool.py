@@ -1,6 +1,38 @@
 import os
-from typing import Dict, Any, List
-from tavily import TavilyClient
+import re
+import time
+import asyncio
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from tavily import TavilyClient, AsyncTavilyClient
+
+from tools.response_cache import create_response_cache, make_cache_key
+
+# Results younger than this are served as-is; market/topic research changes slowly
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(6 * 3600)))
+# Past the TTL, results are still served for this long while a background refresh runs
+SEARCH_CACHE_STALE_TTL = float(os.getenv("SEARCH_CACHE_STALE_TTL", str(7 * 24 * 3600)))
+# Threads shared by background refreshes on the sync path
+SEARCH_REFRESH_WORKERS = int(os.getenv("SEARCH_REFRESH_WORKERS", "2"))
+
+# Words that don't change what a search is about
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "for", "to", "in", "on", "at", "by", "with", "about",
+    "is", "are", "be", "what", "whats", "how", "me", "my", "our", "please", "find", "show", "tell"
+}
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, accents, punctuation, whitespace and stopwords so equivalent queries share a key"""
+    folded = unicodedata.normalize("NFKD", query.lower())
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    # Any script's letters and digits; "c++", "c#" and "#hashtags" keep their symbols
+    words = re.findall(r"#?\w+[+#]*", folded)
+    meaningful = [word for word in words if word not in STOPWORDS]
+    return " ".join(meaningful or words) or query.strip().lower()
+
 
 class SearchTool:
     def __init__(self):
@@ -8,16 +40,105 @@ class SearchTool:
         if not api_key:
             raise ValueError("TAVILY_API_KEY not found in environment variables")
         self.client = TavilyClient(api_key=api_key)
+        self.async_client = AsyncTavilyClient(api_key=api_key)
         
+        # SQLite by default so every worker shares one set of results
+        self.cache = create_response_cache(
+            "web_search",
+            backend_name=os.getenv("SEARCH_CACHE_BACKEND", "sqlite"),
+            ttl=SEARCH_CACHE_TTL + SEARCH_CACHE_STALE_TTL
+        )
+        self.stale_served = 0
+        self.refreshes = 0
+        self._refreshing = set()
+        self._background = set()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=SEARCH_REFRESH_WORKERS, thread_name_prefix="search-refresh")
+        self._lock = threading.Lock()
+        # Set by the orchestrator so background refreshes share the provider's limits and breaker
+        self.guard = None
+    
+    def _cache_key(self, tool_input: Dict[str, Any]) -> Optional[str]:
+        if tool_input.get("cache") is False:
+            return None
+        return make_cache_key(
+            "web_search",
+            normalize_query(tool_input.get("q", "")),
+            tool_input.get("max_results", 5),
+            "basic"
+        )
+    
+    def _lookup(self, cache_key: Optional[str]):
+        """(cached result, is_stale), or (None, False) on a miss"""
+        if cache_key is None:
+            return None, False
+        entry = self.cache.get_entry(cache_key)
+        if entry is None:
+            return None, False
+            
+        result = {**entry.value, "cached": True}
+        stale = time.time() - entry.stored_at > SEARCH_CACHE_TTL
+        if stale:
+            self.stale_served += 1
+        return result, stale
+    
+    def _claim_refresh(self, cache_key: str) -> bool:
+        """Only one background refresh per key at a time in this worker"""
+        with self._lock:
+            if cache_key in self._refreshing:
+                return False
+            self._refreshing.add(cache_key)
+            self.refreshes += 1
+            return True
+    
+    def _release_refresh(self, cache_key: str):
+        with self._lock:
+            self._refreshing.discard(cache_key)
+    
+    def _can_refresh(self, cache_key: str) -> bool:
+        """Skip the refresh while the provider's circuit is open; the stale copy is served either way"""
+        if self.guard is not None and self.guard.reject(self.guard.provider_for("web_search")):
+            return False
+        return self._claim_refresh(cache_key)
+    
+    def _store(self, cache_key: Optional[str], result: Dict[str, Any]):
+        if cache_key is not None and result.get("success"):
+            self.cache.set(cache_key, result)
+    
     def web_search(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         """
         Perform web search using Tavily
         Expected input: {
             "q": str (query),
             "location": str (optional),
-            "max_results": int (default 5)
+            "max_results": int (default 5),
+            "cache": bool (optional, False forces a fresh search)
         }
         """
+        cache_key = self._cache_key(tool_input)
+        cached, stale = self._lookup(cache_key)
+        if cached is not None:
+            if stale and self._can_refresh(cache_key):
+                self._refresh_pool.submit(self._refresh, cache_key, tool_input)
+            return cached
+            
+        result = self._search(tool_input)
+        self._store(cache_key, result)
+        return result
+    
+    def _refresh(self, cache_key: str, tool_input: Dict[str, Any]):
+        try:
+            if self.guard is None:
+                self._store(cache_key, self._search(tool_input))
+                return
+            provider = self.guard.provider_for("web_search")
+            time.sleep(self.guard.acquire(provider, 0))
+            result = self._search(tool_input)
+            self.guard.record(provider, 0, result)
+            self._store(cache_key, result)
+        finally:
+            self._release_refresh(cache_key)
+    
+    def _search(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         try:
             query = tool_input.get("q", "")
             max_results = tool_input.get("max_results", 5)
@@ -28,20 +149,56 @@ class SearchTool:
                 search_depth="basic"
             )
             
-            results = []
-            for item in response.get("results", []):
-                results.append({
-                    "title": item.get("title", ""),
-                    "url": item.get("url", ""),
-                    "content": item.get("content", ""),
-                    "score": item.get("score", 0)
-                })
+            return self._format_response(response, query)
             
+        except Exception as e:
             return {
-                "success": True,
-                "results": results,
-                "query": query
+                "success": False,
+                "error": str(e),
+                "results": []
             }
+    
+    async def web_search_async(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Non-blocking variant of web_search"""
+        cache_key = self._cache_key(tool_input)
+        cached, stale = self._lookup(cache_key)
+        if cached is not None:
+            if stale and self._can_refresh(cache_key):
+                # Serve the stale copy now; the caller doesn't wait for the refresh
+                task = asyncio.get_running_loop().create_task(self._refresh_async(cache_key, tool_input))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            return cached
+            
+        result = await self._search_async(tool_input)
+        self._store(cache_key, result)
+        return result
+    
+    async def _refresh_async(self, cache_key: str, tool_input: Dict[str, Any]):
+        try:
+            if self.guard is None:
+                self._store(cache_key, await self._search_async(tool_input))
+                return
+            provider = self.guard.provider_for("web_search")
+            await asyncio.sleep(self.guard.acquire(provider, 0))
+            result = await self._search_async(tool_input)
+            self.guard.record(provider, 0, result)
+            self._store(cache_key, result)
+        finally:
+            self._release_refresh(cache_key)
+    
+    async def _search_async(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            query = tool_input.get("q", "")
+            max_results = tool_input.get("max_results", 5)
+            
+            response = await self.async_client.search(
+                query=query,
+                max_results=max_results,
+                search_depth="basic"
+            )
+            
+            return self._format_response(response, query)
             
         except Exception as e:
             return {
@@ -49,3 +206,22 @@ class SearchTool:
                 "error": str(e),
                 "results": []
             }
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), "stale_served": self.stale_served, "refreshes": self.refreshes}
+    
+    def _format_response(self, response: Dict[str, Any], query: str) -> Dict[str, Any]:
+        results = []
+        for item in response.get("results", []):
+            results.append({
+                "title": item.get("title", ""),
+                "url": item.get("url", ""),
+                "content": item.get("content", ""),
+                "score": item.get("score", 0)
+            })
+            
+        return {
+            "success": True,
+            "results": results,
+            "query": query
+        }
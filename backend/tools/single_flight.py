@@ -0,0 +1,89 @@
+import copy
+import asyncio
+import threading
+from typing import Dict, Any, Callable, Awaitable, Optional
+
+from tools.response_cache import make_cache_key
+
+# Deterministic-enough tools whose identical concurrent calls can share one upstream request.
+# Images are excluded: identical prompts are sent on purpose to get different variants
+COALESCED_TOOLS = {"llm_text", "web_search", "compute_embedding"}
+
+
+def coalesce_key(tool: str, tool_input: Dict[str, Any]) -> Optional[str]:
+    """Content key for a tool call, or None if it must always run on its own"""
+    if tool not in COALESCED_TOOLS or tool_input.get("cache") is False:
+        return None
+    return make_cache_key(tool, tool_input)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls: the first caller for a key runs
+    it, everyone arriving while it is in flight gets a copy of its result.
+    Nothing is kept once the call finishes; the response cache covers
+    repeats after that.
+    """
+    
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._threads: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+    
+    async def run_async(self, key: str, call: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None and task.get_loop() is loop:
+                self.coalesced += 1
+            else:
+                task = loop.create_task(call())
+                self._tasks[key] = task
+                task.add_done_callback(lambda done: self._forget_task(key, done))
+                self.leaders += 1
+                
+        # Shielded so one waiter disconnecting doesn't cancel the call for the others.
+        # Every caller gets its own copy, since callers store and mutate results
+        return copy.deepcopy(await asyncio.shield(task))
+    
+    def _forget_task(self, key: str, task: asyncio.Task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+    
+    def run(self, key: str, call: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Blocking variant of run_async for the sync tool path"""
+        with self._lock:
+            flight = self._threads.get(key)
+            if flight is None:
+                flight = {"done": threading.Event(), "result": None}
+                self._threads[key] = flight
+                self.leaders += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+                
+        if not leader:
+            flight["done"].wait()
+            return copy.deepcopy(flight["result"])
+            
+        try:
+            flight["result"] = call()
+        except Exception as e:
+            flight["result"] = {"success": False, "error": str(e)}
+        finally:
+            with self._lock:
+                del self._threads[key]
+            flight["done"].set()
+        return copy.deepcopy(flight["result"])
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._tasks) + len(self._threads),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced
+            }
@@ -2,27 +2,102 @@ import axios from 'axios';
 
 const API_BASE_URL = 'http://localhost:8000';
 
+// Asset URLs are stored origin-relative (/assets/...); load them from the API's origin
+export const assetUrl = (url) => (url && url.startsWith('/') ? `${API_BASE_URL}${url}` : url);
+
 export const api = {
   generateCampaign: async (brief) => {
     const response = await axios.post(`${API_BASE_URL}/api/generate-campaign`, { brief });
     return response.data;
   },
 
+  // Streams generation progress; onEvent(event, data) is called for every
+  // server-sent event and the finished campaign is returned.
+  generateCampaignStream: async (brief, onEvent) => {
+    const response = await fetch(`${API_BASE_URL}/api/generate-campaign/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ brief })
+    });
+    if (!response.ok) {
+      throw new Error(`Request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let campaign = null;
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      const messages = buffer.split('\n\n');
+      buffer = messages.pop();
+
+      for (const message of messages) {
+        let event = 'message';
+        let data = '';
+        for (const line of message.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (!data) continue; // keep-alive comment
+
+        const payload = JSON.parse(data);
+        if (event === 'error') throw new Error(payload.detail || 'Generation failed');
+        if (event === 'complete') campaign = payload.campaign;
+        onEvent?.(event, payload);
+      }
+    }
+
+    return { success: campaign !== null, campaign };
+  },
+
+  submitCampaignJob: async (brief) => {
+    const response = await axios.post(`${API_BASE_URL}/api/jobs/campaign`, { brief });
+    return response.data;
+  },
+
+  getJob: async (jobId) => {
+    const response = await axios.get(`${API_BASE_URL}/api/jobs/${jobId}`);
+    return response.data;
+  },
+
+  cancelJob: async (jobId) => {
+    const response = await axios.post(`${API_BASE_URL}/api/jobs/${jobId}/cancel`);
+    return response.data;
+  },
+
   getCampaign: async (campaignId) => {
     const response = await axios.get(`${API_BASE_URL}/api/campaign/${campaignId}`);
     return response.data;
   },
 
-  regenerateAsset: async (assetId, modifyInstructions = null) => {
+  regenerateAsset: async (assetId, modifyInstructions = null, campaignId = null) => {
     const response = await axios.post(`${API_BASE_URL}/api/regenerate-asset`, {
       asset_id: assetId,
-      modify_instructions: modifyInstructions
+      modify_instructions: modifyInstructions,
+      campaign_id: campaignId
+    });
+    return response.data;
+  },
+
+  // selection: { asset_ids } or { asset_type }, plus optional modify_instructions
+  // and per-asset instructions { [assetId]: text }
+  regenerateAssets: async (campaignId, selection) => {
+    const response = await axios.post(`${API_BASE_URL}/api/regenerate-assets`, {
+      campaign_id: campaignId,
+      ...selection
     });
     return response.data;
   },
 
-  listCampaigns: async () => {
-    const response = await axios.get(`${API_BASE_URL}/api/campaigns`);
+  // One page. params: { limit, cursor, order, status, q, fields }; pass
+  // next_cursor back as cursor. The first page also carries total, the match count.
+  listCampaigns: async (params = {}) => {
+    const response = await axios.get(`${API_BASE_URL}/api/campaigns`, { params });
     return response.data;
   },
 
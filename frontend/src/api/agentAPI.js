@@ -378,15 +378,61 @@ export const agentAPI = {
     throw new Error(`Unknown agent type: ${agentType}`);
   },
 
-  // Run full workflow (optional - for backend orchestration)
-  runWorkflow: async (workflowData) => {
-    try {
-      const response = await axios.post(`${API_BASE_URL}/api/workflow/run`, workflowData);
-      return response.data;
-    } catch (error) {
-      console.error('Workflow execution failed:', error);
-      throw error;
+  // Workflows run on the backend when it's enabled; mocks run node by node in the browser
+  serverWorkflows: USE_REAL_API,
+
+  // Run a whole workflow graph on the backend. Independent nodes run in parallel
+  // and outputs are passed between nodes server-side; onEvent(event, data) is
+  // called for every node_started/node_finished/node_failed/node_skipped event.
+  // Resolves with the per-node results of the complete event.
+  runWorkflow: async ({ nodes, edges }, onEvent) => {
+    const response = await fetch(`${API_BASE_URL}/api/workflow/run`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        nodes: nodes.map(node => ({
+          id: node.id,
+          data: { agentType: node.data.agentType, input: node.data.input || '', label: node.data.label }
+        })),
+        edges: edges.map(edge => ({ source: edge.source, target: edge.target }))
+      })
+    });
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.detail || `Workflow failed with status ${response.status}`);
     }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let results = null;
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      const messages = buffer.split('\n\n');
+      buffer = messages.pop();
+
+      for (const message of messages) {
+        let event = 'message';
+        let data = '';
+        for (const line of message.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (!data) continue; // keep-alive comment
+
+        const payload = JSON.parse(data);
+        if (event === 'error') throw new Error(payload.detail || 'Workflow execution failed');
+        if (event === 'complete') results = payload;
+        onEvent?.(event, payload);
+      }
+    }
+
+    if (!results) throw new Error('Workflow stream ended before completing');
+    return results;
   },
 
   // Save workflow to backend (optional)
@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import { RefreshCw, Edit2, Image, FileText, Video, MessageCircle } from 'lucide-react';
+import { assetUrl } from '../api';
 
 function AssetCard({ asset, onRegenerate }) {
   const [isEditing, setIsEditing] = useState(false);
@@ -59,7 +60,14 @@ function AssetCard({ asset, onRegenerate }) {
           <div className="aspect-square bg-gray-100 rounded-lg overflow-hidden">
             {asset.url ? (
               <img
-                src={asset.url}
+                src={assetUrl(asset.url)}
+                srcSet={asset.variants?.length
+                  ? asset.variants
+                      .filter((variant) => variant.format === asset.variants[0].format)
+                      .map((variant) => `${assetUrl(variant.url)} ${variant.width}w`)
+                      .join(', ')
+                  : undefined}
+                sizes="(max-width: 768px) 100vw, 33vw"
                 alt={asset.id}
                 className="w-full h-full object-cover"
               />
@@ -18,7 +18,22 @@ function BriefInput({ onCampaignGenerated, loading, setLoading }) {
     setError('');
 
     try {
-      const result = await api.generateCampaign(brief);
+      // Show the draft as soon as the manifest exists and fill in assets as they finish
+      let draft = null;
+      const result = await api.generateCampaignStream(brief, (event, data) => {
+        if (event === 'manifest') {
+          draft = data.campaign;
+          onCampaignGenerated(draft);
+        } else if (event === 'asset_ready' && draft) {
+          draft = {
+            ...draft,
+            asset_plan: draft.asset_plan.map((asset) =>
+              asset.id === data.asset.id ? data.asset : asset
+            )
+          };
+          onCampaignGenerated(draft);
+        }
+      });
       
       if (result.success) {
         onCampaignGenerated(result.campaign);
@@ -26,7 +41,7 @@ function BriefInput({ onCampaignGenerated, loading, setLoading }) {
         setError('Failed to generate campaign');
       }
     } catch (err) {
-      setError(err.response?.data?.detail || 'An error occurred');
+      setError(err.response?.data?.detail || err.message || 'An error occurred');
     } finally {
       setLoading(false);
     }
@@ -10,6 +10,8 @@ function CampaignCanvas({ campaign, onCampaignUpdate, onReset }) {
   const assets = campaign.asset_plan || [];
   const calendar = campaign.posting_calendar || [];
   const influencers = campaign.influencers || [];
+  // Set when the plan was reused from a near-duplicate earlier brief
+  const seed = campaign.metadata?.seed;
 
   return (
     <div className="space-y-6">
@@ -25,6 +27,13 @@ function CampaignCanvas({ campaign, onCampaignUpdate, onReset }) {
         <ExportButton campaignId={campaign.campaign_id} />
       </div>
 
+      {seed && (
+        <div className="rounded-lg border border-yellow-300/40 bg-yellow-300/10 px-4 py-3 text-white/90">
+          Draft based on a similar earlier brief ({Math.round(seed.similarity * 100)}% match): "{seed.matched_brief}".
+          Review the strategy, assets and dates before publishing.
+        </div>
+      )}
+
       {/* Strategy Section - Glass morphism */}
       <div 
         className="rounded-3xl backdrop-blur-md border shadow-2xl p-6"
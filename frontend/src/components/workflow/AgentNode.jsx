@@ -4,6 +4,7 @@ import { Play, Loader2, CheckCircle, XCircle, Trash2, RotateCw } from 'lucide-re
 import useWorkflowStore from '../../store/workflowStore';
 import { formatAgentOutput, markdownToHtml } from '../../utils/formatOutput';
 import { agentAPI } from '../../api/agentAPI';
+import { assetUrl } from '../../api';
 
 const agentStyles = {
   strategy: {
@@ -216,7 +217,7 @@ function AgentNode({ data, id }) {
                       }}
                     >
                       <img
-                        src={img.url}
+                        src={assetUrl(img.thumbnail || img.url)}
                         alt={`Generated ${idx + 1}`}
                         className="w-full h-20 object-cover"
                       />
@@ -202,6 +202,47 @@ function WorkflowBuilderInner() {
 
       await new Promise(resolve => setTimeout(resolve, 500));
 
+      // The backend runs the whole graph: independent branches in parallel, no round trip per node
+      if (agentAPI.serverWorkflows) {
+        const labels = Object.fromEntries(executionOrder.map(node => [node.id, node.data.label]));
+        const { success, results, duration } = await agentAPI.runWorkflow(
+          {
+            nodes: executionOrder,
+            edges: currentEdges.filter(edge => edge.source in labels && edge.target in labels)
+          },
+          (event, data) => {
+            const label = labels[data.node_id];
+            if (event === 'node_started') {
+              console.log(`▶️  ${label} started (${data.input_chars} characters of input)`);
+              updateNode(data.node_id, { status: 'running', output: '⏳ Processing...' });
+            } else if (event === 'node_finished') {
+              console.log(`✅ ${label} completed in ${data.duration}s`);
+              updateNode(data.node_id, {
+                status: 'success',
+                output: data.output,
+                lastRun: new Date().toISOString(),
+              });
+            } else if (event === 'node_failed') {
+              console.error(`❌ ${label} FAILED: ${data.error}`);
+              updateNode(data.node_id, { status: 'error', output: `Error: ${data.error}` });
+            } else if (event === 'node_skipped') {
+              console.log(`⏭️  ${label} skipped: ${data.reason}`);
+            }
+          }
+        );
+
+        if (!success) {
+          const failures = Object.values(results)
+            .filter(result => result.status === 'error')
+            .map(result => `${labels[result.node_id]}: ${result.error}`);
+          throw new Error(failures.join('\n') || 'Some agents did not run');
+        }
+
+        console.log(`\n✨ WORKFLOW COMPLETED SUCCESSFULLY in ${duration}s`);
+        alert(`✨ Workflow completed successfully!\n\n• Executed ${executionOrder.length} agent(s)\n• Independent agents ran in parallel on the server\n• Check console for details`);
+        return;
+      }
+
       // Execute each node in order
       for (let i = 0; i < executionOrder.length; i++) {
         const node = executionOrder[i];